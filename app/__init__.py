@@ -1,19 +1,26 @@
 import logging
 
+import click
 from config import Config
 from flask import Flask
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
 app = Flask(__name__)
 app.config.from_object(Config)
 db = SQLAlchemy(app)
 login = LoginManager(app)
-migrate = Migrate(app, db)
 bootstrap = Bootstrap(app)
 
+# Flask-Migrate imports Alembic, which only the `flask db` commands use, so
+# it is set up when the app is loaded by the flask command and not in every
+# gunicorn worker
+if click.get_current_context(silent=True) is not None:
+    from flask_migrate import Migrate
+
+    migrate = Migrate(app, db)
+
 login.login_view = "login"
 login.session_protection = "strong"
 
@@ -22,4 +29,8 @@ if __name__ != "__main__":
     app.logger.handlers = gunicorn_logger.handlers
     app.logger.setLevel(gunicorn_logger.level)
 
-from app import models, routes
+from app import (archive, cache, cli, database, events, export, history, ids,
+                 importer, metrics, models, passwords, reports, routes, search)
+from app.api import bp as api_bp
+
+app.register_blueprint(api_bp)
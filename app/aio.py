@@ -0,0 +1,77 @@
+"""
+aio provides async database access for the ASGI entry point in app.asgi. It
+opens an async SQLAlchemy engine on the same database as the app, through
+aiosqlite for SQLite and asyncpg for PostgreSQL.
+"""
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app import app
+from app.cache import user_cache, user_statement
+from app.models import User
+from app.pagination import keyset_page, keyset_query
+
+# Async driver of each database backend
+drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+_engines = {}
+
+
+def async_url(url):
+    """Returns url with its driver replaced by the async driver"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(f"No async driver for '{backend}' databases.")
+    if backend == "sqlite" and url.database in (None, "", ":memory:"):
+        raise ValueError("An in-memory SQLite database cannot be shared with an async engine.")
+    return url.set(drivername=drivers[backend])
+
+
+def get_engine():
+    """Returns the async engine for SQLALCHEMY_DATABASE_URI"""
+    url = app.config["SQLALCHEMY_DATABASE_URI"]
+    if url not in _engines:
+        _engines[url] = create_async_engine(
+            async_url(url), **app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+        )
+    return _engines[url]
+
+
+async def dispose():
+    """Closes the connections of every async engine"""
+    while _engines:
+        _, engine = _engines.popitem()
+        await engine.dispose()
+
+
+def session():
+    """
+    Returns a new AsyncSession. Its objects are not expired on commit so
+    they can be rendered after the session is closed.
+    """
+    return AsyncSession(get_engine(), expire_on_commit=False)
+
+
+async def keyset_paginate(session, query, sort_attr, pk_attr, **kwargs):
+    """
+    The async version of pagination.keyset_paginate for a select() of
+    columns, see app.projection
+    """
+    statement = keyset_query(query, sort_attr, pk_attr, **kwargs)
+    rows = (await session.execute(statement)).all()
+    kwargs.pop("descending", None)
+    return keyset_page(rows, sort_attr, pk_attr, **kwargs)
+
+
+async def load_user(session, id):
+    """
+    Puts the User with the given id in the user cache if they are not there
+    already, so that flask-login finds them without a blocking query
+    """
+    if id in user_cache:
+        return
+    row = (await session.execute(user_statement(id))).first()
+    if row:
+        user_cache.set(id, User(**row._asdict()))
@@ -0,0 +1,20 @@
+"""api provides the versioned JSON API"""
+
+from flask import Blueprint, jsonify
+
+bp = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+def page_response(page):
+    """Returns a JSON response for a pagination.Page of models"""
+    return jsonify(
+        {
+            "items": [item.to_dict() for item in page],
+            "next": page.next_cursor,
+            "prev": page.prev_cursor,
+        }
+    )
+
+
+from app.api import (assignments, auth, errors, history, keys, reports, tokens,
+                     users)
@@ -0,0 +1,154 @@
+"""assignments contains the API endpoints for assignments"""
+
+from flask import jsonify, request
+from werkzeug.datastructures import MultiDict
+
+from app import app, db
+from app.api import bp, page_response
+from app.api.auth import token_required
+from app.api.errors import bad_request
+from app.forms import CheckInForm, CheckOutForm
+from app.holdings import check_in, check_out
+from app.models import Assignment, Key, User
+from app.routes import assignment_sorts, filter_assignments, paginate_listing
+
+
+def validate_items(form_class):
+    """
+    Validates each item of a JSON {"items": [...]} request body with
+    form_class. Returns a tuple of (results, forms, error response) where
+    results has a result dict for every item and forms maps the index of
+    every valid item to its validated form.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return None, None, bad_request('Expected a JSON object with an "items" list.')
+    if len(items) > app.config["API_MAX_BULK_ITEMS"]:
+        return None, None, bad_request(
+            f'At most {app.config["API_MAX_BULK_ITEMS"]} items can be sent at once.'
+        )
+
+    results, forms = [], {}
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            item = {}
+        formdata = MultiDict({k: str(v) for k, v in item.items() if v is not None})
+        form = form_class(formdata=formdata, meta={"csrf": False})
+        result = {"index": index, "user": item.get("user"), "key": item.get("key")}
+        if form.validate():
+            forms[index] = form
+            result.update(user=form.user.data, key=form.key.data)
+        else:
+            result.update(status="invalid", errors=form.errors)
+        results.append(result)
+    return results, forms, None
+
+
+def reject_unknown(results, forms, active_only=False):
+    """
+    Marks items referring to users or keys which do not exist as invalid.
+    Only one query is run for each of users and keys.
+    """
+    usernames = {form.user.data for form in forms.values()}
+    key_names = {form.key.data for form in forms.values()}
+    known_users = {
+        u for (u,) in db.session.query(User.username).filter(User.username.in_(usernames))
+    }
+    key_query = db.session.query(Key.name).filter(Key.name.in_(key_names))
+    if active_only:
+        key_query = key_query.filter(Key.status == "Active")
+    known_keys = {k for (k,) in key_query}
+
+    for index, form in list(forms.items()):
+        errors = {}
+        if form.user.data not in known_users:
+            errors["user"] = [f"User '{form.user.data}' does not exist."]
+        if form.key.data not in known_keys:
+            errors["key"] = [f"Key '{form.key.data}' is not an active key."]
+        if errors:
+            results[index].update(status="invalid", errors=errors)
+            del forms[index]
+
+
+def bulk_response(results, statuses):
+    """
+    Fills in the status of every valid item from a {(user, key): status}
+    dict and returns the JSON response with a count of each status.
+    """
+    summary = {}
+    for result in results:
+        if "status" not in result:
+            result["status"] = statuses[result["user"], result["key"]]
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return jsonify({"results": results, "summary": summary})
+
+
+@bp.route("/assignments", methods=["GET"])
+@token_required
+def get_assignments():
+    query = filter_assignments(Assignment.query, request.args)
+    try:
+        page = paginate_listing(
+            query, assignment_sorts, Assignment.id, request.args, "date_out", "desc"
+        )
+    except ValueError as e:
+        return bad_request(str(e))
+    return page_response(page)
+
+
+@bp.route("/assignments/<int:id>", methods=["GET"])
+@token_required
+def get_assignment(id):
+    return jsonify(Assignment.query.get_or_404(id).to_dict())
+
+
+@bp.route("/assignments/checkout", methods=["POST"])
+@token_required
+def checkout():
+    """
+    Checks out keys in bulk. Expects {"items": [{"user": ..., "key": ...,
+    "date_out": "YYYY-MM-DD"}, ...]} and returns the result of each item.
+    All valid items are applied in one transaction.
+    """
+    results, forms, error = validate_items(CheckOutForm)
+    if error:
+        return error
+    reject_unknown(results, forms, active_only=True)
+
+    assigned, already_assigned = check_out(
+        (f.user.data, f.key.data, f.date_out.data) for f in forms.values()
+    )
+    db.session.commit()
+
+    statuses = dict.fromkeys(assigned, "assigned")
+    statuses.update(dict.fromkeys(already_assigned, "already_assigned"))
+    return bulk_response(results, statuses)
+
+
+@bp.route("/assignments/checkin", methods=["POST"])
+@token_required
+def checkin():
+    """
+    Checks in keys in bulk. Expects {"items": [{"user": ..., "key": ...,
+    "date_in": "YYYY-MM-DD"}, ...]} and returns the result of each item.
+    Items dated before the key was checked out are invalid. All valid items
+    are applied in one transaction.
+    """
+    results, forms, error = validate_items(CheckInForm)
+    if error:
+        return error
+
+    checked_in, not_checked_out, too_early = check_in(
+        (f.user.data, f.key.data, f.date_in.data) for f in forms.values()
+    )
+    db.session.commit()
+
+    too_early = set(too_early)
+    for result in results:
+        if (result["user"], result["key"]) in too_early and "status" not in result:
+            result.update(status="invalid", errors={"date_in": ["date_in is before date_out."]})
+
+    statuses = dict.fromkeys(checked_in, "checked_in")
+    statuses.update(dict.fromkeys(not_checked_out, "not_checked_out"))
+    return bulk_response(results, statuses)
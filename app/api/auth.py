@@ -0,0 +1,28 @@
+"""auth handles token authentication for the API"""
+
+from functools import wraps
+
+from flask import g, request
+
+from app.api.errors import error_response
+from app.models import User
+
+
+def token_required(f):
+    """
+    Decorator requiring a valid "Authorization: Bearer <token>" header. The
+    authenticated user is stored in g.api_user.
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        user = None
+        if scheme.lower() == "bearer" and token:
+            user = User.verify_api_token(token)
+        if user is None or not user.can_login:
+            return error_response(401, "A valid API token is required.")
+        g.api_user = user
+        return f(*args, **kwargs)
+
+    return decorated
@@ -0,0 +1,38 @@
+"""errors contains the JSON error responses for the API"""
+
+from flask import jsonify
+from werkzeug.http import HTTP_STATUS_CODES
+
+from app.api import bp
+from app.passwords import HashingBusy
+
+
+def error_response(status_code, message=None, **extra):
+    payload = {"error": HTTP_STATUS_CODES.get(status_code, "Unknown error")}
+    if message:
+        payload["message"] = message
+    payload.update(extra)
+    response = jsonify(payload)
+    response.status_code = status_code
+    return response
+
+
+def bad_request(message, **extra):
+    return error_response(400, message, **extra)
+
+
+@bp.errorhandler(404)
+def not_found(error):
+    return error_response(404)
+
+
+@bp.errorhandler(405)
+def method_not_allowed(error):
+    return error_response(405)
+
+
+@bp.errorhandler(HashingBusy)
+def hashing_busy(error):
+    response = error_response(503, "Too many logins at once, try again shortly.")
+    response.headers["Retry-After"] = "1"
+    return response
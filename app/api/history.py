@@ -0,0 +1,56 @@
+"""history contains the API endpoints for point-in-time queries"""
+
+from datetime import date
+
+from flask import jsonify, request
+
+from app.api import bp
+from app.api.auth import token_required
+from app.api.errors import bad_request
+from app.history import holders_at, keys_held
+from app.routes import parse_date
+
+
+def get_date(name, default):
+    value = request.args.get(name)
+    if value is None:
+        return default
+    parsed = parse_date(value)
+    if parsed is None:
+        raise ValueError(f"Invalid date '{value}' for {name}.")
+    return parsed
+
+
+@bp.route("/history/holders", methods=["GET"])
+@token_required
+def get_holders():
+    """
+    Assignments of the key argument which were held on the date given by
+    the at argument (default today)
+    """
+    key = request.args.get("key")
+    if not key:
+        return bad_request("key is required.")
+    try:
+        when = get_date("at", date.today())
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify({"items": [a.to_dict() for a in holders_at(key, when)]})
+
+
+@bp.route("/history/keys", methods=["GET"])
+@token_required
+def get_keys_held():
+    """
+    Assignments of the user argument which were held at any time between
+    the from and to arguments (default all time up to today)
+    """
+    user = request.args.get("user")
+    if not user:
+        return bad_request("user is required.")
+    try:
+        start = get_date("from", date.min)
+        end = get_date("to", date.today())
+    except ValueError as e:
+        return bad_request(str(e))
+    return jsonify({"items": [a.to_dict() for a in keys_held(user, start, end)]})
@@ -0,0 +1,45 @@
+"""keys contains the API endpoints for keys"""
+
+from flask import jsonify, request
+
+from app import db
+from app.api import bp, page_response
+from app.api.auth import token_required
+from app.api.errors import bad_request
+from app.forms import NewKeyForm
+from app.models import Key
+from app.routes import key_sorts, paginate_listing
+
+
+@bp.route("/keys", methods=["GET"])
+@token_required
+def get_keys():
+    try:
+        page = paginate_listing(Key.query, key_sorts, Key.name, request.args, "name")
+    except ValueError as e:
+        return bad_request(str(e))
+    return page_response(page)
+
+
+@bp.route("/keys/<name>", methods=["GET"])
+@token_required
+def get_key(name):
+    return jsonify(Key.query.filter_by(name=name).first_or_404().to_dict())
+
+
+@bp.route("/keys", methods=["POST"])
+@token_required
+def create_key():
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, dict):
+        return bad_request("Expected a JSON object.")
+    form = NewKeyForm(meta={"csrf": False})
+    if not form.validate():
+        return bad_request("Invalid key.", errors=form.errors)
+
+    key = Key(name=form.name.data, description=form.description.data)
+    db.session.add(key)
+    db.session.commit()
+    response = jsonify(key.to_dict())
+    response.status_code = 201
+    return response
@@ -0,0 +1,81 @@
+"""reports contains the API endpoints for the reports"""
+
+from flask import jsonify, request
+
+from app.api import bp
+from app.api.auth import token_required
+from app.reports import (average_durations, get_days, monthly_checkouts,
+                         overdue_keys, user_counts)
+
+
+def get_limit():
+    try:
+        return min(max(int(request.args.get("limit", 50)), 1), 500)
+    except ValueError:
+        return 50
+
+
+@bp.route("/reports/durations", methods=["GET"])
+@token_required
+def get_durations():
+    """Keys with the longest average checkout duration"""
+    rows = average_durations(get_limit())
+    return jsonify(
+        {
+            "items": [
+                {"key": key, "returns": returns, "average_days": average}
+                for key, returns, average in rows
+            ]
+        }
+    )
+
+
+@bp.route("/reports/overdue", methods=["GET"])
+@token_required
+def get_overdue():
+    """Keys checked out for longer than the days argument (default 30)"""
+    days = get_days(request.args)
+    rows = overdue_keys(days, get_limit())
+    return jsonify(
+        {
+            "days": days,
+            "items": [
+                {
+                    "user": user,
+                    "key": key,
+                    "date_out": date_out.isoformat(),
+                    "days_out": days_out,
+                }
+                for user, key, date_out, days_out in rows
+            ],
+        }
+    )
+
+
+@bp.route("/reports/monthly", methods=["GET"])
+@token_required
+def get_monthly():
+    """Check-outs and check-ins per month"""
+    return jsonify(
+        {
+            "items": [
+                {"month": month, "checkouts": checkouts, "checkins": checkins}
+                for month, checkouts, checkins in monthly_checkouts()
+            ]
+        }
+    )
+
+
+@bp.route("/reports/users", methods=["GET"])
+@token_required
+def get_user_counts():
+    """Users with the most check-outs"""
+    rows = user_counts(get_limit())
+    return jsonify(
+        {
+            "items": [
+                {"user": user, "checkouts": checkouts, "returns": returns}
+                for user, checkouts, returns in rows
+            ]
+        }
+    )
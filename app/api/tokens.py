@@ -0,0 +1,32 @@
+"""tokens handles issuing API tokens"""
+
+from flask import jsonify, request
+
+from app import app, db
+from app.api import bp
+from app.api.errors import bad_request, error_response
+from app.forms import LoginForm
+from app.models import User
+from app.routes import get_request_details
+
+
+@bp.route("/tokens", methods=["POST"])
+def get_token():
+    """
+    Exchanges a JSON {"username": ..., "password": ...} for an API token
+    """
+    form = LoginForm(meta={"csrf": False})
+    if not form.validate():
+        return bad_request("Invalid request.", errors=form.errors)
+
+    user = User.query.filter_by(username=form.username.data).first()
+    if user is None or not user.can_login or not user.check_password(form.password.data):
+        app.logger.warning(
+            f"Failed API token request for user {form.username.data} from {get_request_details(request)}"
+        )
+        return error_response(401, "Invalid login credentials.")
+
+    # Saves the password hash if check_password upgraded it
+    db.session.commit()
+    expires_in = app.config["API_TOKEN_EXPIRES"]
+    return jsonify({"token": user.get_api_token(expires_in), "expires_in": expires_in})
@@ -0,0 +1,56 @@
+"""users contains the API endpoints for users"""
+
+from flask import jsonify, request
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.api import bp, page_response
+from app.api.auth import token_required
+from app.api.errors import bad_request
+from app.forms import NewUserForm
+from app.models import User
+from app.routes import paginate_listing, user_sorts
+
+
+@bp.route("/users", methods=["GET"])
+@token_required
+def get_users():
+    try:
+        page = paginate_listing(User.query, user_sorts, User.id, request.args, "username")
+    except ValueError as e:
+        return bad_request(str(e))
+    return page_response(page)
+
+
+@bp.route("/users/<int:id>", methods=["GET"])
+@token_required
+def get_user(id):
+    return jsonify(User.query.get_or_404(id).to_dict())
+
+
+@bp.route("/users", methods=["POST"])
+@token_required
+def create_user():
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return bad_request("Expected a JSON object.")
+    # API clients do not need to repeat the password
+    data.setdefault("password2", data.get("password"))
+    form = NewUserForm(formdata=MultiDict(data), meta={"csrf": False})
+    if not form.validate():
+        return bad_request("Invalid user.", errors=form.errors)
+
+    user = User(
+        username=form.username.data,
+        email=form.email.data or None,
+        display_name=form.display_name.data,
+        can_login=form.can_login.data,
+    )
+    user.set_password(form.password.data)
+    db.session.add(user)
+    db.session.commit()
+    response = jsonify(user.to_dict())
+    response.status_code = 201
+    return response
@@ -0,0 +1,80 @@
+"""
+archive moves closed assignments out of the assignments table into the
+assignments_archive table once they have been closed for ARCHIVE_AFTER_DAYS
+days, so the live table only holds the open and recent assignments the pages
+work with. The rows are moved ARCHIVE_BATCH_SIZE at a time, each batch in
+its own short transaction.
+
+The listing, history, export and rollup queries read both tables.
+history_union builds a UNION ALL of a select() over each table, and
+search_history loads the matching rows of both as objects.
+"""
+
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select, union_all
+
+from app import app, db
+from app.models import ArchivedAssignment, Assignment
+
+history_models = (Assignment, ArchivedAssignment)
+columns = ("id", "user_id", "key_id", "user", "key", "date_out", "date_in")
+
+
+def history_union(build):
+    """
+    Returns the UNION ALL of build(model) for the live and archived
+    assignment models. build returns a select() of the same columns of the
+    given model, filtered on that model's columns so each table is searched
+    through its own indexes.
+    """
+    return union_all(*(build(model) for model in history_models))
+
+
+def search_history(criteria):
+    """
+    Returns the live and archived assignments matching criteria(model), a
+    list of filters on the given model, ordered by date_out
+    """
+    results = []
+    for model in history_models:
+        results += model.query.filter(*criteria(model)).all()
+    return sorted(results, key=lambda a: (a.date_out, a.id))
+
+
+def archive_assignments(days=None, batch_size=None):
+    """
+    Moves the assignments closed more than days (default ARCHIVE_AFTER_DAYS)
+    ago to the archive in batches of batch_size (default ARCHIVE_BATCH_SIZE),
+    committing after each batch and pausing ARCHIVE_BATCH_PAUSE seconds
+    between them so other writers get the database. Returns the number of
+    assignments moved.
+    """
+    if days is None:
+        days = app.config["ARCHIVE_AFTER_DAYS"]
+    if batch_size is None:
+        batch_size = app.config["ARCHIVE_BATCH_SIZE"]
+    cutoff = date.today() - timedelta(days=days)
+    live = Assignment.__table__
+    moved = 0
+    while True:
+        batch = db.session.execute(
+            select(live.c.id)
+            .where(live.c.date_in < cutoff)
+            .order_by(live.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            return moved
+        # The condition is applied again under the write lock, in case a
+        # row has been edited since the batch was read
+        rows = (live.c.id.between(batch[0], batch[-1]), live.c.date_in < cutoff)
+        db.session.execute(
+            ArchivedAssignment.__table__.insert().from_select(
+                columns, select(*(live.c[c] for c in columns)).where(*rows)
+            )
+        )
+        moved += db.session.execute(live.delete().where(*rows)).rowcount
+        db.session.commit()
+        time.sleep(app.config["ARCHIVE_BATCH_PAUSE"])
@@ -0,0 +1,346 @@
+"""
+asgi serves the app to an ASGI server such as uvicorn:
+
+    uvicorn keymaster_asgi:application --workers 4
+
+The read heavy listing pages (index, assignments, keys and users) are async
+views which query the database through app.aio, so a single worker serves
+many of them at once. The /events streams of the dashboards poll the change
+log on the event loop too, so they do not hold a thread. Every other request
+is passed to the Flask app on a pool of ASGI_THREADS threads, so a slow
+export or login only holds up one of those threads and not the whole worker.
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask import Response, redirect, render_template, request, session, url_for
+from flask.signals import request_started
+from flask_login import current_user
+from sqlalchemy import select
+
+from app import aio, app, login
+from app.events import (KEEP_ALIVE, events_after, format_event, latest_event_statement,
+                        oldest_event_statement, reload_event, requested_event_id,
+                        stream_headers)
+from app.models import Key, User
+from app.projection import columns
+from app.routes import (assignment_listing, group_assignments, key_columns, key_sorts,
+                        listing_options, open_assignments_statement, user_columns,
+                        user_sorts)
+
+executor = ThreadPoolExecutor(app.config["ASGI_THREADS"], thread_name_prefix="asgi")
+
+# Async views by path. They take an AsyncSession and return anything a Flask
+# view can return.
+views = {}
+
+
+def route(*paths):
+    def decorator(f):
+        for path in paths:
+            views[path] = f
+        return f
+
+    return decorator
+
+
+@route("/", "/index")
+async def index(db):
+    sort_method = request.args.get("sort")
+    if sort_method not in ("by_user", "by_key"):
+        return redirect(url_for("index", sort="by_user"))
+
+    by_user = sort_method == "by_user"
+    last_event_id = (await db.execute(latest_event_statement)).scalar() or 0
+    result = await db.execute(open_assignments_statement(by_user))
+    if by_user:
+        headings = ["User", "Assigned Keys"]
+    else:
+        headings = ["Key", "Users Assigned"]
+    return render_template(
+        "index.html",
+        headings=headings,
+        rows=group_assignments(result, by_user),
+        group="user" if by_user else "key",
+        last_event_id=last_event_id,
+    )
+
+
+@route("/keys")
+async def keys(db):
+    options = listing_options(key_sorts, Key.name, request.args, "name")
+    try:
+        page = await aio.keyset_paginate(
+            db, select(*columns(Key, key_columns)[1]), **options
+        )
+    except ValueError:
+        return render_template("404.html"), 404
+    return render_template("keys.html", keys=page, page=page)
+
+
+@route("/assignments")
+async def assignments(db):
+    try:
+        rows, sorts = assignment_listing(request.args)
+        options = listing_options(sorts, rows.c.id, request.args, "date_out", "desc")
+        page = await aio.keyset_paginate(db, select(rows), **options)
+    except ValueError:
+        return render_template("404.html"), 404
+    result = await db.execute(
+        select(User.username, User.display_name).where(
+            User.username.in_({a.user for a in page}), User.display_name.isnot(None)
+        )
+    )
+    return render_template(
+        "assignments.html", assignments=page, users=dict(result.all()), page=page
+    )
+
+
+@route("/users")
+async def users(db):
+    options = listing_options(user_sorts, User.id, request.args, "username")
+    try:
+        page = await aio.keyset_paginate(
+            db, select(*columns(User, user_columns)[1]), **options
+        )
+    except ValueError:
+        return render_template("404.html"), 404
+    return render_template("users.html", users=page, page=page)
+
+
+async def poll_events(db):
+    """
+    Yields the messages of an /events stream, the same as events.events but
+    sleeping between the polls on the event loop
+    """
+    last_id = requested_event_id()
+    latest = (await db.execute(latest_event_statement)).scalar() or 0
+    if last_id is None:
+        last_id = latest
+    oldest = (await db.execute(oldest_event_statement)).scalar()
+    if oldest is not None and oldest > last_id + 1:
+        yield reload_event(latest)
+        return
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + app.config["EVENTS_STREAM_SECONDS"]
+    last_sent = loop.time()
+    while True:
+        for event in (await db.execute(events_after(last_id))).scalars():
+            last_id = event.id
+            last_sent = loop.time()
+            yield format_event(event)
+        await db.rollback()
+        if loop.time() >= deadline:
+            return
+        if loop.time() - last_sent >= KEEP_ALIVE:
+            last_sent = loop.time()
+            yield ": keep-alive\n\n"
+        await asyncio.sleep(app.config["EVENTS_POLL_INTERVAL"])
+
+
+async def stream_events(environ, send):
+    """
+    Serves /events like dispatch serves a view, sending each message of
+    poll_events as it is made
+    """
+    ctx = app.request_context(environ)
+    error = None
+    ctx.push()
+    try:
+        async with aio.session() as db:
+            stream = None
+            try:
+                try:
+                    request_started.send(app)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await login_required(db)
+                    if rv is None:
+                        stream = poll_events(db)
+                        rv = Response(mimetype="text/event-stream", headers=stream_headers)
+                except Exception as e:
+                    stream = None
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                stream = None
+                response = app.handle_exception(e)
+
+            await send_start(send, response.status_code, response.headers.to_wsgi_list())
+            if stream is None:
+                await send({"type": "http.response.body", "body": response.get_data()})
+                return
+            async for message in stream:
+                await send(
+                    {"type": "http.response.body", "body": message.encode(), "more_body": True}
+                )
+            await send({"type": "http.response.body", "body": b""})
+    finally:
+        ctx.auto_pop(error)
+
+
+async def login_required(db):
+    """
+    Returns the login redirect if the request is not authenticated. The user
+    is read into the user cache first, so flask-login does not block the
+    event loop on a query.
+    """
+    if app.config.get("LOGIN_DISABLED"):
+        return None
+    user_id = session.get("_user_id")
+    if user_id is not None:
+        await aio.load_user(db, int(user_id))
+    if not current_user.is_authenticated:
+        return login.unauthorized()
+    return None
+
+
+def build_environ(scope, body):
+    """Returns the WSGI environ of an ASGI http scope"""
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        host, port = scope["client"]
+        environ["REMOTE_ADDR"], environ["REMOTE_PORT"] = host, str(port)
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin-1"), value.decode("latin-1")
+        if name == "content-type":
+            key = "CONTENT_TYPE"
+        elif name == "content-length":
+            key = "CONTENT_LENGTH"
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body has already been read in full, whatever its transfer encoding
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def dispatch(view, environ):
+    """
+    Runs an async view the way Flask runs a view, with the request hooks,
+    error handlers and session handling, and returns the Flask response
+    """
+    ctx = app.request_context(environ)
+    error = None
+    ctx.push()
+    try:
+        try:
+            try:
+                request_started.send(app)
+                rv = app.preprocess_request()
+                if rv is None:
+                    async with aio.session() as db:
+                        rv = await login_required(db) or await view(db)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            error = e
+            response = app.handle_exception(e)
+        return response.status_code, response.headers.to_wsgi_list(), response.get_data()
+    finally:
+        ctx.auto_pop(error)
+
+
+def run_wsgi(environ, send, loop):
+    """
+    Runs a request through the Flask app on the calling thread, sending the
+    response from the event loop. The whole request stays on one thread, as
+    streamed responses keep the request context of the thread they started
+    on. Each chunk of a streamed response, such as an export, is sent as it
+    is made.
+    """
+
+    def call(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(" ", 1)[0]), headers]
+
+    body = app(environ, start_response)
+    try:
+        call(send_start(send, *started))
+        for chunk in body:
+            if chunk:
+                call(send({"type": "http.response.body", "body": chunk, "more_body": True}))
+        call(send({"type": "http.response.body", "body": b""}))
+    finally:
+        if hasattr(body, "close"):
+            body.close()
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def send_start(send, status, headers):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ],
+        }
+    )
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await aio.dispose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'.")
+
+    environ = build_environ(scope, await read_body(receive))
+    if scope["path"] == "/events" and scope["method"] == "GET":
+        return await stream_events(environ, send)
+    view = views.get(scope["path"]) if scope["method"] in ("GET", "HEAD") else None
+    if view is not None:
+        status, headers, body = await dispatch(view, environ)
+        await send_start(send, status, headers)
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(executor, run_wsgi, environ, send, loop)
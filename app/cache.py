@@ -0,0 +1,352 @@
+"""
+cache holds slow to build values, such as form choice lists, across
+requests. Cached values are tagged with the version counters of the tables
+they are built from. The counters live in the data_versions table and are
+bumped in the same transaction as every write to those tables, so a value
+cached by one gunicorn worker is invalidated by writes made in any worker.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import Response, g, jsonify, make_response, request, session
+from flask_login import login_required
+from sqlalchemy import event, select
+
+from app import app, db, login
+from app.models import Assignment, DataVersion, Holding, Key, User
+
+# Tables whose writes invalidate cached values. current_holdings only changes
+# along with the assignments so they share a counter.
+versioned_models = {
+    User: "users",
+    Key: "keys",
+    Assignment: "assignments",
+    Holding: "assignments",
+}
+versioned_tables = {model.__tablename__: name for model, name in versioned_models.items()}
+
+
+def current_versions():
+    """
+    Returns the {table: version} counters. They are read with one query and
+    then reused for the rest of the request.
+    """
+    if "data_versions" not in g:
+        g.data_versions = dict(db.session.query(DataVersion.name, DataVersion.version))
+    return g.data_versions
+
+
+@app.before_request
+def reset_versions():
+    """The counters are only reused within a single request"""
+    g.pop("data_versions", None)
+
+
+def bump_versions(*names, session=None):
+    """
+    Increments the version counter of each table in names. This is done in
+    the current transaction so it is committed along with the write.
+    """
+    session = session or db.session
+    table = DataVersion.__table__
+    for name in names:
+        result = session.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1)
+        )
+        if not result.rowcount:
+            session.execute(table.insert().values(name=name, version=1))
+    g.pop("data_versions", None)
+
+
+@event.listens_for(db.session, "before_flush")
+def bump_versions_on_write(session, flush_context, instances):
+    names = {
+        versioned_models[type(obj)]
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if type(obj) in versioned_models and (obj not in session.dirty or session.is_modified(obj))
+    }
+    if names:
+        bump_versions(*sorted(names), session=session)
+
+
+@event.listens_for(db.session, "do_orm_execute")
+def collect_bulk_writes(orm_execute_state):
+    """
+    Notes the versioned tables written by bulk statements, which are not
+    seen by before_flush. Their counters are bumped when the session commits.
+    """
+    state = orm_execute_state
+    if state.is_insert or state.is_update or state.is_delete:
+        name = versioned_tables.get(state.statement.table.name)
+        if name:
+            state.session.info.setdefault("bulk_writes", set()).add(name)
+
+
+@event.listens_for(db.session, "before_commit")
+def bump_versions_on_commit(session):
+    names = session.info.pop("bulk_writes", None)
+    if names:
+        bump_versions(*sorted(names), session=session)
+
+
+@event.listens_for(db.session, "after_rollback")
+def forget_bulk_writes(session):
+    session.info.pop("bulk_writes", None)
+
+
+class VersionedCache:
+    """
+    A per-process LRU cache of values which are only valid for a given
+    version of the tables they depend on.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, name, tables, loader):
+        """
+        Returns the cached value for name, calling loader() to build it if
+        it is missing or any of tables have changed since it was cached.
+        """
+        versions = current_versions()
+        version = tuple(versions.get(table, 0) for table in tables)
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[0] == version:
+                self.hits += 1
+                self._entries.move_to_end(name)
+                return entry[1]
+            self.misses += 1
+            if entry:
+                self.invalidations += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[name] = (version, value)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "pid": os.getpid(),
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class TTLCache:
+    """
+    A per-process LRU cache of values which expire ttl seconds after they
+    are loaded, for values which may be a little stale in other workers.
+    """
+
+    def __init__(self, ttl=30, max_entries=128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, name, loader):
+        """
+        Returns the cached value for name, calling loader() to build it if
+        it is missing or expired. None is never cached.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry and entry[0] > now:
+                self.hits += 1
+                self._entries.move_to_end(name)
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        if value is not None:
+            self.set(name, value, now)
+        return value
+
+    def set(self, name, value, now=None):
+        expires = (now or time.monotonic()) + self.ttl
+        with self._lock:
+            self._entries[name] = (expires, value)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, name):
+        entry = self._entries.get(name)
+        return bool(entry) and entry[0] > time.monotonic()
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names:
+                if self._entries.pop(name, None):
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+cache = VersionedCache(app.config["CACHE_MAX_ENTRIES"])
+# Rendered listing pages by URL, see cached_page
+page_cache = VersionedCache(app.config["PAGE_CACHE_MAX_ENTRIES"])
+# Logged in users by id. Writes to a user drop it from this worker's cache
+# when they are committed. Other workers see the change within
+# USER_CACHE_TTL seconds.
+user_cache = TTLCache(app.config["USER_CACHE_TTL"], app.config["CACHE_MAX_ENTRIES"])
+
+
+def load_cached_user(id):
+    """
+    Returns the User with the given id if they can log in, read from the
+    database at most once every USER_CACHE_TTL seconds. The cached User is
+    a copy which is not in any session, so it can be shared by requests
+    without detaching an instance the current request may be changing.
+    """
+
+    def loader():
+        row = db.session.execute(user_statement(id)).first()
+        return User(**row._asdict()) if row else None
+
+    return user_cache.get(id, loader)
+
+
+def user_statement(id):
+    """Returns the select() of the user row for load_cached_user"""
+    return select(*User.__table__.columns).where(
+        User.id == id, User.can_login.is_(True)
+    )
+
+
+@login.user_loader
+def load_user(id):
+    return load_cached_user(int(id))
+
+
+@event.listens_for(db.session, "before_flush")
+def collect_changed_users(session, flush_context, instances):
+    ids = session.info.setdefault("changed_users", set())
+    ids.update(
+        obj.id
+        for obj in chain(session.dirty, session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+    )
+
+
+@event.listens_for(db.session, "after_commit")
+def invalidate_changed_users(session):
+    user_cache.invalidate(*session.info.pop("changed_users", ()))
+
+
+@event.listens_for(db.session, "after_rollback")
+def forget_changed_users(session):
+    session.info.pop("changed_users", None)
+
+
+# Part of every page ETag, so that browsers do not keep pages rendered by the
+# templates of an earlier deploy
+template_version = int(
+    max(
+        os.path.getmtime(os.path.join(root, name))
+        for root, _, names in os.walk(os.path.join(app.root_path, app.template_folder))
+        for name in names
+    )
+)
+
+
+def cached_page(*tables, stream=False):
+    """
+    Decorator for GET views whose page only depends on the request URL and
+    the given tables. The page's ETag is made from the tables' version
+    counters, so a request whose If-None-Match still matches gets a 304
+    without running the view. Otherwise the page is served from page_cache
+    until one of the tables changes.
+
+    Views with stream set render their page as it is sent when STREAM_PAGES
+    is on, see app.streaming. Those pages are never held whole, so they only
+    get the ETag and are not kept in page_cache.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # Pending flash messages are rendered into the page
+            if request.method != "GET" or session.get("_flashes"):
+                return f(*args, **kwargs)
+
+            versions = current_versions()
+            etag = "-".join(
+                str(version)
+                for version in (template_version, *(versions.get(t, 0) for t in tables))
+            )
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            elif stream and app.config["STREAM_PAGES"]:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+
+                def render():
+                    response = make_response(f(*args, **kwargs))
+                    return (
+                        response.get_data(),
+                        response.status_code,
+                        response.headers.to_wsgi_list(),
+                    )
+
+                body, status, headers = page_cache.get(request.full_path, tables, render)
+                response = Response(body, status, headers)
+                if status != 200:
+                    return response
+
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return decorated
+
+    return decorator
+
+
+@app.route("/cache/stats")
+@login_required
+def cache_stats():
+    """
+    Cache statistics of the worker which handled the request
+    """
+    return jsonify(
+        dict(cache.stats(), pages=page_cache.stats(), users=user_cache.stats())
+    )
@@ -0,0 +1,119 @@
+"""cli contains the flask command line commands for the app"""
+
+import click
+
+from app import app, db
+from app.archive import archive_assignments
+from app.export import generate_export, mimetypes
+from app.holdings import rebuild_holdings, verify_holdings
+from app.ids import backfill_ids
+from app.importer import import_csv, importers
+from app.models import Assignment, Holding
+from app.rollups import rebuild_rollups, verify_rollups
+
+
+@app.cli.group()
+def holdings():
+    """Manage the current holdings projection."""
+
+
+@holdings.command()
+def rebuild():
+    """Rebuild current holdings from the assignments table."""
+    rebuild_holdings()
+    click.echo("Current holdings rebuilt.")
+
+
+@holdings.command()
+def verify():
+    """Check current holdings against the assignments table."""
+    missing, extra = verify_holdings()
+    for user, key, date_out in sorted(missing, key=str):
+        click.echo(f"Missing: {user} {key} {date_out}")
+    for user, key, date_out in sorted(extra, key=str):
+        click.echo(f"Extra: {user} {key} {date_out}")
+    if missing or extra:
+        raise SystemExit(1)
+    click.echo("Current holdings are in sync.")
+
+
+@app.cli.group()
+def ids():
+    """Manage the user and key ids of the assignments."""
+
+
+@ids.command()
+@click.option("--batch-size", default=10000, show_default=True)
+def backfill(batch_size):
+    """Fill in the user and key ids of rows written before they existed."""
+    holdings = backfill_ids(Holding.__table__)
+    db.session.commit()
+    assignments = backfill_ids(Assignment.__table__, batch_size)
+    click.echo(f"Backfilled {assignments} assignments and {holdings} holdings.")
+
+
+@app.cli.group()
+def archive():
+    """Manage the archive of closed assignments."""
+
+
+@archive.command("run")
+@click.option("--days", type=int, help="Defaults to ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, help="Defaults to ARCHIVE_BATCH_SIZE.")
+def run_archive(days, batch_size):
+    """Move assignments closed more than --days ago to the archive."""
+    moved = archive_assignments(days, batch_size)
+    click.echo(f"Archived {moved} assignments.")
+
+
+@app.cli.group()
+def reports():
+    """Manage the rollup tables behind the reports."""
+
+
+@reports.command("rebuild")
+def rebuild_reports():
+    """Backfill the rollup tables from the assignments table."""
+    rebuild_rollups()
+    click.echo("Report rollups rebuilt.")
+
+
+@reports.command("verify")
+def verify_reports():
+    """Check the rollup tables against the assignments table."""
+    mismatches = verify_rollups()
+    for table, pk, want, got in mismatches:
+        click.echo(f"{table} {pk}: expected {want}, found {got}")
+    if mismatches:
+        raise SystemExit(1)
+    click.echo("Report rollups are in sync.")
+
+
+@app.cli.command("export")
+@click.option(
+    "--format", "fmt", type=click.Choice(list(mimetypes)), default="csv", show_default=True
+)
+@click.option("--output", "-o", type=click.File("w"), default="-", help="Defaults to stdout.")
+@click.option("--user", help="Only export assignments of this username.")
+@click.option("--key", help="Only export assignments of this key.")
+@click.option("--status", type=click.Choice(["open", "closed"]))
+@click.option("--date-from", help="Only export keys checked out on or after this date.")
+@click.option("--date-to", help="Only export keys checked out on or before this date.")
+def export(fmt, output, **filters):
+    """Export the assignment history as CSV or NDJSON."""
+    for chunk in generate_export(fmt, filters):
+        output.write(chunk)
+
+
+@app.cli.command("import")
+@click.argument("kind", type=click.Choice(list(importers)))
+@click.argument("file", type=click.File("r", encoding="utf-8-sig"))
+def import_(kind, file):
+    """Import keys, users or assignments from a CSV file."""
+    result = import_csv(kind, file)
+    db.session.commit()
+    for line, error in result.errors:
+        click.echo(f"Line {line}: {error}", err=True)
+    click.echo(f"Imported {result.imported} {kind}.")
+    if result.errors:
+        raise SystemExit(1)
@@ -0,0 +1,38 @@
+"""
+database tunes the connections of the SQLAlchemy engines. Every new SQLite
+connection gets the SQLITE_* pragmas from the config: WAL journaling lets
+readers carry on while a worker writes, and busy_timeout makes a writer wait
+for the lock instead of failing with "database is locked". Server databases
+are tuned with the pool settings in SQLALCHEMY_ENGINE_OPTIONS.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+# Config setting of each pragma
+sqlite_pragmas = {
+    "journal_mode": "SQLITE_JOURNAL_MODE",
+    "synchronous": "SQLITE_SYNCHRONOUS",
+    "busy_timeout": "SQLITE_BUSY_TIMEOUT",
+    "mmap_size": "SQLITE_MMAP_SIZE",
+    "cache_size": "SQLITE_CACHE_SIZE",
+}
+
+
+def is_sqlite(dbapi_connection):
+    """True for sqlite3 connections and the aiosqlite adapter connections"""
+    return "sqlite" in type(dbapi_connection).__module__
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not is_sqlite(dbapi_connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, setting in sqlite_pragmas.items():
+        value = app.config.get(setting)
+        if value:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
@@ -0,0 +1,200 @@
+"""
+events pushes changes to the open index dashboards as Server-Sent Events.
+The write paths append events to the change_log table in the same
+transaction as the change. The /events stream of every worker polls that
+table for the rows after the last one it sent, so a change made in any
+gunicorn worker reaches every dashboard without a message broker.
+
+Each event's data is a JSON object:
+
+- checkout: {"user", "name", "key"}, name being the user's display name
+- checkin: {"user", "key"}
+- key_status: {"key", "status"}
+- reload: {}, sent instead of large batches; the dashboard reloads itself
+"""
+
+import itertools
+import json
+import threading
+import time
+from datetime import datetime
+
+from flask import Response, request, stream_with_context
+from flask_login import login_required
+from sqlalchemy import func, select
+
+from app import app, db
+from app.models import ChangeEvent, User
+
+# Counts emits, so the change log is pruned every PRUNE_EVERY of them
+emits = itertools.count(1)
+PRUNE_EVERY = 100
+# Seconds between keep-alive comments on an idle stream
+KEEP_ALIVE = 15
+
+
+def emit(events):
+    """
+    Appends a list of (kind, data) events to the change log. This must be
+    called in the same transaction as the change. A list of more than
+    EVENTS_MAX_BATCH events is replaced by a single reload event.
+    """
+    if not events:
+        return
+    if len(events) > app.config["EVENTS_MAX_BATCH"]:
+        events = [("reload", {})]
+    now = datetime.utcnow()
+    db.session.execute(
+        ChangeEvent.__table__.insert(),
+        [{"created": now, "kind": kind, "data": json.dumps(data)} for kind, data in events],
+    )
+    if next(emits) % PRUNE_EVERY == 0:
+        prune()
+
+
+def prune():
+    """Keeps only the latest EVENTS_KEEP events"""
+    latest = db.session.query(func.max(ChangeEvent.id)).scalar_subquery()
+    db.session.query(ChangeEvent).filter(
+        ChangeEvent.id <= latest - app.config["EVENTS_KEEP"]
+    ).delete(synchronize_session=False)
+
+
+def emit_holdings(checked_out=(), checked_in=()):
+    """
+    Emits checkout and checkin events for lists of (user, key) pairs which
+    have been checked out and in
+    """
+    if len(checked_out) + len(checked_in) > app.config["EVENTS_MAX_BATCH"]:
+        return emit([("reload", {})])
+    names = {}
+    if checked_out:
+        names = dict(
+            db.session.query(User.username, User.display_name).filter(
+                User.username.in_({user for user, _ in checked_out})
+            )
+        )
+    emit(
+        [
+            ("checkout", {"user": user, "name": names.get(user) or user, "key": key})
+            for user, key in checked_out
+        ]
+        + [("checkin", {"user": user, "key": key}) for user, key in checked_in]
+    )
+
+
+latest_event_statement = select(func.max(ChangeEvent.id))
+
+
+def latest_event_id():
+    """The id of the latest event, for the dashboard to stream from"""
+    return db.session.execute(latest_event_statement).scalar() or 0
+
+
+def format_event(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {event.data}\n\n"
+
+
+def reload_event(id):
+    return f"id: {id}\nevent: reload\ndata: {{}}\n\n"
+
+
+def retry_field(seconds):
+    """Sets how long the browser waits before it reconnects"""
+    return f"retry: {int(seconds * 1000)}\n\n"
+
+
+def requested_event_id():
+    """
+    Returns the id of the last event the dashboard has, from the
+    Last-Event-ID header or the `after` argument, or None if it is invalid
+    """
+    try:
+        return int(request.headers.get("Last-Event-ID") or request.args.get("after", 0))
+    except ValueError:
+        return None
+
+
+def events_after(last_id):
+    """Returns the select() of the events after last_id"""
+    return select(ChangeEvent).where(ChangeEvent.id > last_id).order_by(ChangeEvent.id)
+
+
+oldest_event_statement = select(func.min(ChangeEvent.id))
+stream_headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class StreamLimit:
+    """Counts the open /events streams of a worker, up to a limit"""
+
+    def __init__(self):
+        self.open = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Returns True if another stream may be opened, and counts it"""
+        with self._lock:
+            if self.open >= app.config["EVENTS_MAX_STREAMS"]:
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+
+streams = StreamLimit()
+
+
+@app.route("/events")
+@login_required
+def events():
+    """
+    Server-Sent Events stream of the changes after the Last-Event-ID header
+    or the `after` argument. Each stream holds a worker thread, so a worker
+    serves at most EVENTS_MAX_STREAMS of them. Other dashboards are told to
+    retry after EVENTS_BUSY_RETRY seconds. The stream ends after
+    EVENTS_STREAM_SECONDS so that it does not hold the thread forever; the
+    browser then reconnects with the id of the last event it received. The
+    ASGI entry point serves this stream without a thread, see app.asgi.
+    """
+    last_id = requested_event_id()
+    if last_id is None:
+        last_id = latest_event_id()
+
+    def stream():
+        nonlocal last_id
+        # Counted once the stream starts, as a generator closed before then
+        # would not run its finally clause
+        if not streams.acquire():
+            yield retry_field(app.config["EVENTS_BUSY_RETRY"])
+            return
+        try:
+            oldest = db.session.execute(oldest_event_statement).scalar()
+            if oldest is not None and oldest > last_id + 1:
+                # Events the dashboard has missed have been pruned
+                yield reload_event(latest_event_id())
+                return
+
+            deadline = time.monotonic() + app.config["EVENTS_STREAM_SECONDS"]
+            last_sent = time.monotonic()
+            while True:
+                for event in db.session.execute(events_after(last_id)).scalars():
+                    last_id = event.id
+                    last_sent = time.monotonic()
+                    yield format_event(event)
+                # Ends the read transaction so the next poll sees new commits
+                db.session.rollback()
+                if time.monotonic() >= deadline:
+                    return
+                if time.monotonic() - last_sent >= KEEP_ALIVE:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                time.sleep(app.config["EVENTS_POLL_INTERVAL"])
+        finally:
+            streams.release()
+
+    return Response(
+        stream_with_context(stream()), mimetype="text/event-stream", headers=stream_headers
+    )
@@ -0,0 +1,99 @@
+"""export streams the assignment history as CSV or NDJSON"""
+
+import csv
+import io
+import json
+
+from flask import Response, render_template, request, stream_with_context
+from flask_login import login_required
+
+from sqlalchemy import select
+
+from app import app, db
+from app.archive import history_union
+from app.projection import columns, get_headings, iter_rows
+from app.routes import filter_assignments
+
+export_heading_map = {
+    "id": "ID",
+    "user": "User",
+    "key": "Key",
+    "date_out": "Date Out",
+    "date_in": "Date In",
+}
+
+mimetypes = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_query(args):
+    """
+    Returns the rows of the exported columns of the live and archived
+    assignments with the listing filters in args applied. Rows are fetched
+    in batches of EXPORT_BATCH_SIZE through a server-side cursor where the
+    backend supports one.
+    """
+    statement = history_union(
+        lambda model: filter_assignments(
+            select(*columns(model, export_heading_map)[1]),
+            args,
+            model,
+        )
+    )
+    statement = statement.order_by(statement.selected_columns.id)
+    return db.session.execute(
+        statement,
+        execution_options={
+            "stream_results": True,
+            "max_row_buffer": app.config["EXPORT_BATCH_SIZE"],
+        },
+    )
+
+
+def generate_csv(rows, headings):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headings)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % app.config["EXPORT_BATCH_SIZE"] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generate_ndjson(rows, attributes):
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(attributes, row)), default=str))
+        if len(lines) == app.config["EXPORT_BATCH_SIZE"]:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def generate_export(fmt, args):
+    """Yields the filtered assignment history in fmt ("csv" or "ndjson")"""
+    headings, attributes = get_headings(export_heading_map)
+    rows = iter_rows(export_query(args), attributes)
+    if fmt == "csv":
+        return generate_csv(rows, headings)
+    return generate_ndjson(rows, attributes)
+
+
+@app.route("/export/assignments.<fmt>")
+@login_required
+def export_assignments(fmt):
+    """
+    Streams the assignment history. Accepts the same filters as the
+    assignments page.
+    """
+    if fmt not in mimetypes:
+        return render_template("404.html"), 404
+    response = Response(
+        stream_with_context(generate_export(fmt, request.args)),
+        mimetype=mimetypes[fmt],
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=assignments.{fmt}"
+    return response
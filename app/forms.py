@@ -1,6 +1,7 @@
 """forms contains all of the forms in the app"""
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
 from wtforms import (
     StringField,
     PasswordField,
@@ -33,8 +34,8 @@ class NewKeyForm(FlaskForm):
     submit = SubmitField("Add Key")
     cancel = SubmitField("Cancel", render_kw={"formnovalidate": True})
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
     def validate_name(self, name):
         if Key.query.filter_by(name=name.data).first():
@@ -57,8 +58,12 @@ class AssignKeyForm(FlaskForm):
     """Form for assigning keys to a user"""
 
     # user = SelectField("User", validators=[DataRequired()])
-    user = SelectMultipleField("User", validators=[DataRequired()])
-    key = SelectMultipleField("Key", validators=[DataRequired()])
+    user = SelectMultipleField(
+        "User", validators=[DataRequired()], render_kw={"data-search": "users"}
+    )
+    key = SelectMultipleField(
+        "Key", validators=[DataRequired()], render_kw={"data-search": "keys"}
+    )
     date_out = DateField("Date Out", validators=[DataRequired()])
     submit = SubmitField("Assign Key")
     cancel = SubmitField("Cancel", render_kw={"formnovalidate": True})
@@ -67,8 +72,12 @@ class AssignKeyForm(FlaskForm):
 class EditAssignmentForm(FlaskForm):
     """Form for editing an existing assignment"""
 
-    user = SelectField("User", validators=[DataRequired()])
-    key = SelectField("Key", validators=[DataRequired()])
+    user = SelectField(
+        "User", validators=[DataRequired()], render_kw={"data-search": "users"}
+    )
+    key = SelectField(
+        "Key", validators=[DataRequired()], render_kw={"data-search": "keys"}
+    )
     date_out = DateField("Date Out", validators=[DataRequired()])
     date_in = DateField("Date In", validators=[Optional()])
     submit = SubmitField("Save Changes")
@@ -76,6 +85,22 @@ class EditAssignmentForm(FlaskForm):
     cancel = SubmitField("Cancel", render_kw={"formnovalidate": True})
 
 
+class CheckOutForm(FlaskForm):
+    """Form for checking a single key out to a user through the API"""
+
+    user = StringField("User", validators=[DataRequired()])
+    key = StringField("Key", validators=[DataRequired()])
+    date_out = DateField("Date Out", validators=[DataRequired()])
+
+
+class CheckInForm(FlaskForm):
+    """Form for checking a single key in from a user through the API"""
+
+    user = StringField("User", validators=[DataRequired()])
+    key = StringField("Key", validators=[DataRequired()])
+    date_in = DateField("Date In", validators=[DataRequired()])
+
+
 class NewUserForm(FlaskForm):
     """Form for creating new users"""
 
@@ -90,8 +115,8 @@ class NewUserForm(FlaskForm):
     submit = SubmitField("Create User")
     cancel = SubmitField("Cancel", render_kw={"formnovalidate": True})
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
     def validate_username(self, username):
         if User.query.filter_by(username=username.data).first():
@@ -133,6 +158,17 @@ class EditUserForm(FlaskForm):
                 raise ValidationError("Email address is already in use.")
 
 
+class ImportForm(FlaskForm):
+    """Form for importing a CSV file of keys, users or assignments"""
+
+    kind = SelectField(
+        "Import", choices=[("keys", "Keys"), ("users", "Users"), ("assignments", "Assignments")]
+    )
+    file = FileField("CSV File", validators=[FileRequired()])
+    submit = SubmitField("Import")
+    cancel = SubmitField("Cancel", render_kw={"formnovalidate": True})
+
+
 class ConfirmForm(FlaskForm):
     """Form for confirming changes"""
 
@@ -0,0 +1,74 @@
+"""
+history answers point-in-time questions about the assignment history, such
+as who held a key on a given day. A key is considered held from its
+date_out up to and including its date_in, or up to today if it is still
+checked out.
+
+The queries are range scans on the (key_id, date_out, date_in) and
+(user_id, date_out, date_in) indexes of the assignments and their archive,
+so they only read the history of the one key or user asked about.
+"""
+
+from datetime import date
+
+from flask import render_template, request
+from flask_login import login_required
+from sqlalchemy import or_
+
+from app import app
+from app.archive import search_history
+from app.ids import key_id_of, user_id_of
+from app.models import Assignment
+from app.routes import get_user_dict, parse_date
+
+
+def overlapping(start, end, model=Assignment):
+    """Filter for assignments which were held at any time in [start, end]"""
+    return (
+        model.date_out <= end,
+        or_(model.date_in.is_(None), model.date_in >= start),
+    )
+
+
+def holders_at(key, when):
+    """
+    Returns the live and archived assignments of key which were held on the
+    date when
+    """
+    return search_history(
+        lambda model: (model.key_id == key_id_of(key), *overlapping(when, when, model))
+    )
+
+
+def keys_held(user, start, end):
+    """
+    Returns the live and archived assignments of user which were held during
+    [start, end]
+    """
+    return search_history(
+        lambda model: (
+            model.user_id == user_id_of(user),
+            *overlapping(start, end, model),
+        )
+    )
+
+
+@app.route("/history")
+@login_required
+def history():
+    """
+    Point-in-time search of the assignment history
+    """
+    results = None
+    key = request.args.get("key")
+    user = request.args.get("user")
+    if key:
+        when = parse_date(request.args.get("at")) or date.today()
+        results = holders_at(key, when)
+    elif user:
+        start = parse_date(request.args.get("date_from")) or date.min
+        end = parse_date(request.args.get("date_to")) or date.today()
+        results = keys_held(user, start, end)
+
+    users = get_user_dict(a.user for a in results or [])
+    return render_template("history.html", results=results, users=users)
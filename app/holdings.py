@@ -0,0 +1,175 @@
+"""holdings maintains the current_holdings projection of open assignments"""
+
+from sqlalchemy import and_, bindparam, func, tuple_
+
+from app import db
+from app.events import emit, emit_holdings
+from app.ids import backfill_ids, with_ids
+from app.models import Assignment, Holding
+from app.rollups import update_rollups
+
+
+def open_pairs_query():
+    """Returns a query of (user, key, date_out) for every open assignment"""
+    return (
+        db.session.query(
+            Assignment.user, Assignment.key, func.min(Assignment.date_out)
+        )
+        .filter(Assignment.date_in.is_(None))
+        .group_by(Assignment.user, Assignment.key)
+    )
+
+
+def refresh_holdings(pairs):
+    """
+    Recomputes the holdings of the given (user, key) pairs from the open
+    assignments. This must be called in the same transaction as the changes
+    to the assignments so the projection is committed along with them.
+    Pairs which are held or released by the changes are emitted as checkout
+    and checkin events.
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return
+    db.session.flush()
+    held = Holding.query.filter(tuple_(Holding.user, Holding.key).in_(pairs))
+    was_held = set(held.with_entities(Holding.user, Holding.key))
+    held.delete(synchronize_session=False)
+    rows = open_pairs_query().filter(
+        tuple_(Assignment.user, Assignment.key).in_(pairs)
+    ).all()
+    db.session.bulk_insert_mappings(
+        Holding,
+        with_ids([{"user": u, "key": k, "date_out": d} for u, k, d in rows]),
+    )
+    is_held = {(u, k) for u, k, _ in rows}
+    emit_holdings(
+        checked_out=sorted(is_held - was_held),
+        checked_in=sorted(was_held - is_held),
+    )
+
+
+def check_out(items):
+    """
+    Checks out keys from an iterable of (user, key, date_out) items. Pairs
+    which are already checked out are skipped, as are repeated pairs. The
+    conflicts are found with a single query and the new assignments and
+    holdings are each written with one bulk insert.
+
+    Returns a tuple of (assigned, already_assigned) lists of (user, key)
+    pairs. The caller is responsible for committing the session.
+    """
+    dates = {}
+    for user, key, date_out in items:
+        dates.setdefault((user, key), date_out)
+    if not dates:
+        return [], [], []
+
+    users = {user for user, _ in dates}
+    keys = {key for _, key in dates}
+    held = set(
+        db.session.query(Holding.user, Holding.key).filter(
+            Holding.user.in_(users), Holding.key.in_(keys)
+        )
+    )
+    assigned = [pair for pair in dates if pair not in held]
+    already_assigned = [pair for pair in dates if pair in held]
+
+    if assigned:
+        rows = with_ids(
+            [{"user": u, "key": k, "date_out": dates[u, k]} for u, k in assigned]
+        )
+        db.session.execute(Assignment.__table__.insert(), rows)
+        db.session.execute(Holding.__table__.insert(), rows)
+        update_rollups(added=[(u, k, dates[u, k], None) for u, k in assigned])
+        emit_holdings(checked_out=assigned)
+    return assigned, already_assigned
+
+
+def check_out_keys(users, keys, date_out):
+    """Checks out every key in keys to every user in users. See check_out."""
+    return check_out((user, key, date_out) for user in users for key in keys)
+
+
+def check_in(items):
+    """
+    Checks in keys from an iterable of (user, key, date_in) items by closing
+    every open assignment of each pair. The open assignments are found with
+    a single query and closed with one bulk update.
+
+    Returns a tuple of (checked_in, not_checked_out, too_early) lists of
+    (user, key) pairs. Pairs with an open assignment checked out after their
+    date_in are too_early and left open. The caller is responsible for
+    committing the session.
+    """
+    dates = {}
+    for user, key, date_in in items:
+        dates.setdefault((user, key), date_in)
+    if not dates:
+        return [], [], []
+
+    users = {user for user, _ in dates}
+    keys = {key for _, key in dates}
+    open_assignments = [
+        (id, (user, key), date_out)
+        for id, user, key, date_out in db.session.query(
+            Assignment.id, Assignment.user, Assignment.key, Assignment.date_out
+        ).filter(
+            Assignment.user.in_(users),
+            Assignment.key.in_(keys),
+            Assignment.date_in.is_(None),
+        )
+        if (user, key) in dates
+    ]
+    too_early = {
+        pair for _, pair, date_out in open_assignments if date_out and dates[pair] < date_out
+    }
+    open_assignments = [a for a in open_assignments if a[1] not in too_early]
+    closed = {pair for _, pair, _ in open_assignments}
+    checked_in = [pair for pair in dates if pair in closed]
+    not_checked_out = [pair for pair in dates if pair not in closed and pair not in too_early]
+
+    if open_assignments:
+        db.session.execute(
+            Assignment.__table__.update()
+            .where(Assignment.id == bindparam("_id"))
+            .values(date_in=bindparam("date_in")),
+            [{"_id": id, "date_in": dates[pair]} for id, pair, _ in open_assignments],
+        )
+        db.session.execute(
+            Holding.__table__.delete().where(
+                and_(Holding.user == bindparam("_user"), Holding.key == bindparam("_key"))
+            ),
+            [{"_user": user, "_key": key} for user, key in checked_in],
+        )
+        update_rollups(
+            removed=[(*pair, date_out, None) for _, pair, date_out in open_assignments],
+            added=[
+                (*pair, date_out, dates[pair]) for _, pair, date_out in open_assignments
+            ],
+        )
+        emit_holdings(checked_in=checked_in)
+    return checked_in, not_checked_out, [pair for pair in dates if pair in too_early]
+
+
+def rebuild_holdings():
+    """Rebuilds the whole projection from the assignments table"""
+    Holding.query.delete()
+    db.session.execute(
+        Holding.__table__.insert().from_select(
+            ["user", "key", "date_out"], open_pairs_query()
+        )
+    )
+    backfill_ids(Holding.__table__)
+    emit([("reload", {})])
+    db.session.commit()
+
+
+def verify_holdings():
+    """
+    Compares the projection against the assignments table. Returns a tuple
+    of (missing, extra) sets of (user, key, date_out) rows.
+    """
+    want = set(open_pairs_query())
+    got = set(db.session.query(Holding.user, Holding.key, Holding.date_out))
+    return want - got, got - want
@@ -0,0 +1,116 @@
+"""
+ids keeps the integer user_id and key_id columns of the assignments and
+current_holdings tables in step with their user and key names. Joins and
+history lookups go through the ids and their compact integer indexes, while
+the names stay in the tables for the pages, exports and API.
+
+Assignments and holdings added or edited through the ORM get their ids in
+the INSERT or UPDATE itself. Rows written with bulk inserts are given their
+ids by with_ids, and rows from before the ids existed are filled in by
+`flask ids backfill`.
+"""
+
+from sqlalchemy import event, inspect, select
+
+from app import db
+from app.models import (ArchivedAssignment, Assignment, Holding, Key, User,
+                        UserRollup)
+
+
+def user_id_of(username):
+    """Scalar subquery of the id of the user with username"""
+    return select(User.id).where(User.username == username).scalar_subquery()
+
+
+def key_id_of(name):
+    """Scalar subquery of the id of the key with name"""
+    return select(Key.id).where(Key.name == name).scalar_subquery()
+
+
+def with_ids(rows):
+    """
+    Fills in the user_id and key_id of a list of row dicts with "user" and
+    "key" names for a bulk insert. The ids are read with one query each.
+    """
+    user_ids = dict(
+        db.session.query(User.username, User.id).filter(
+            User.username.in_({row["user"] for row in rows})
+        )
+    )
+    key_ids = dict(
+        db.session.query(Key.name, Key.id).filter(Key.name.in_({row["key"] for row in rows}))
+    )
+    for row in rows:
+        row["user_id"] = user_ids.get(row["user"])
+        row["key_id"] = key_ids.get(row["key"])
+    return rows
+
+
+@event.listens_for(Assignment, "before_insert")
+@event.listens_for(Assignment, "before_update")
+@event.listens_for(Holding, "before_insert")
+def set_ids(mapper, connection, target):
+    """
+    Sets the ids of a new or edited row from its names with subqueries in
+    the statement, so the users and keys may be added in the same flush
+    """
+    state = inspect(target)
+    if state.attrs.user.history.has_changes():
+        target.user_id = user_id_of(target.user)
+    if state.attrs.key.history.has_changes():
+        target.key_id = key_id_of(target.key)
+
+
+def rename_user(user, old_username):
+    """
+    Rewrites the username of a renamed user in the live and archived
+    assignments, holdings and rollups. The rows are found through user_id,
+    so none are left under the old name. The caller is responsible for
+    committing the session.
+    """
+    for table in (
+        Assignment.__table__,
+        ArchivedAssignment.__table__,
+        Holding.__table__,
+    ):
+        db.session.execute(
+            table.update().where(table.c.user_id == user.id).values(user=user.username)
+        )
+    db.session.execute(
+        UserRollup.__table__.update()
+        .where(UserRollup.user == old_username)
+        .values(user=user.username)
+    )
+
+
+def backfill_ids(table, batch_size=None):
+    """
+    Sets the user_id and key_id of the rows of table (assignments or
+    current_holdings) which have none. If batch_size is given, the
+    assignments are updated and committed batch_size rows at a time, in id
+    order, so writers are only held up for one batch at a time. Returns the
+    number of rows updated.
+    """
+    missing = table.c.user_id.is_(None) | table.c.key_id.is_(None)
+    ids = {"user_id": user_id_of(table.c.user), "key_id": key_id_of(table.c.key)}
+    if batch_size is None:
+        return db.session.execute(table.update().where(missing).values(ids)).rowcount
+
+    updated = 0
+    start = 0
+    while True:
+        batch = db.session.execute(
+            select(table.c.id)
+            .where(table.c.id > start, missing)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not batch:
+            return updated
+        updated += db.session.execute(
+            table.update()
+            .where(table.c.id.between(batch[0], batch[-1]), missing)
+            .values(ids)
+        ).rowcount
+        db.session.commit()
+        start = batch[-1]
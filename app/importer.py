@@ -0,0 +1,191 @@
+"""importer bulk loads keys, users and assignments from CSV files"""
+
+import csv
+import io
+
+from flask import flash, redirect, render_template, request, url_for
+from flask_login import login_required
+
+from app import app, db
+from app.forms import ImportForm
+from app.holdings import refresh_holdings
+from app.ids import with_ids
+from app.models import Assignment, Holding, Key, User
+from app.passwords import hash_password
+from app.rollups import update_rollups
+from app.routes import parse_date
+
+TRUE_VALUES = ("1", "true", "yes", "y")
+# Keeps the (user, key) IN clause of refresh_holdings under SQLite's
+# parameter limit
+PAIR_CHUNK_SIZE = 400
+
+
+class ImportResult:
+    """The number of rows imported and the (line, message) errors"""
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+
+
+def parse_key(record, seen):
+    """seen is the set of key names already in use"""
+    name = (record.get("name") or "").strip()
+    if not name:
+        raise ValueError("Key name is required.")
+    if name in seen:
+        raise ValueError(f"Key '{name}' already exists.")
+    status = (record.get("status") or "Active").strip().capitalize()
+    if status not in ("Active", "Inactive"):
+        raise ValueError(f"Invalid status '{status}'.")
+    seen.add(name)
+    return {"name": name, "description": record.get("description"), "status": status}
+
+
+def parse_user(record, seen):
+    """seen is a tuple of the sets of usernames and emails already in use"""
+    usernames, emails = seen
+    username = (record.get("username") or "").strip()
+    if not username:
+        raise ValueError("Username is required.")
+    if username in usernames:
+        raise ValueError(f"Username '{username}' is already in use.")
+    email = (record.get("email") or "").strip() or None
+    if email and email in emails:
+        raise ValueError(f"Email address '{email}' is already in use.")
+    usernames.add(username)
+    if email:
+        emails.add(email)
+    password = record.get("password")
+    return {
+        "username": username,
+        "email": email,
+        "display_name": record.get("display_name") or None,
+        "password_hash": hash_password(password) if password else None,
+        "can_login": (record.get("can_login") or "").strip().lower() in TRUE_VALUES,
+    }
+
+
+def parse_assignment(record, seen):
+    """
+    seen is a tuple of the sets of existing usernames, key names and the
+    (user, key) pairs which are checked out, either already or by an earlier
+    row of the file
+    """
+    usernames, keys, held = seen
+    user = (record.get("user") or "").strip()
+    key = (record.get("key") or "").strip()
+    if user not in usernames:
+        raise ValueError(f"User '{user}' does not exist.")
+    if key not in keys:
+        raise ValueError(f"Key '{key}' does not exist.")
+    date_out = parse_date(record.get("date_out"))
+    if not date_out:
+        raise ValueError(f"Invalid date_out '{record.get('date_out')}'.")
+    date_in = None
+    if record.get("date_in"):
+        date_in = parse_date(record["date_in"])
+        if not date_in:
+            raise ValueError(f"Invalid date_in '{record['date_in']}'.")
+        if date_in < date_out:
+            raise ValueError("date_in is before date_out.")
+    elif (user, key) in held:
+        raise ValueError(f"Key '{key}' is already assigned to '{user}'.")
+    else:
+        held.add((user, key))
+    return {"user": user, "key": key, "date_out": date_out, "date_in": date_in}
+
+
+def load_seen(kind):
+    """Pre-loads the values rows of kind are validated against"""
+    if kind == "keys":
+        return {k for (k,) in db.session.query(Key.name)}
+    usernames = {u for (u,) in db.session.query(User.username)}
+    if kind == "users":
+        return usernames, {e for (e,) in db.session.query(User.email) if e}
+    held = set(db.session.query(Holding.user, Holding.key))
+    return usernames, {k for (k,) in db.session.query(Key.name)}, held
+
+
+importers = {
+    "keys": (Key, parse_key),
+    "users": (User, parse_user),
+    "assignments": (Assignment, parse_assignment),
+}
+
+
+def import_csv(kind, file):
+    """
+    Imports the rows of kind ("keys", "users" or "assignments") from the
+    CSV text file. The file is read as a stream and the rows are inserted in
+    chunks of IMPORT_CHUNK_SIZE. Rows are validated against values loaded up
+    front instead of querying for each row, and invalid rows are reported in
+    the result rather than aborting the import. The caller is responsible for
+    committing the session, so the import runs in one transaction.
+    """
+    model, parse = importers[kind]
+    seen = load_seen(kind)
+    chunk_size = app.config["IMPORT_CHUNK_SIZE"]
+    result = ImportResult()
+    open_pairs = set()
+    chunk = []
+
+    def flush():
+        if kind == "assignments":
+            with_ids(chunk)
+        db.session.execute(model.__table__.insert(), chunk)
+        if kind == "assignments":
+            update_rollups(
+                added=[(r["user"], r["key"], r["date_out"], r["date_in"]) for r in chunk]
+            )
+        result.imported += len(chunk)
+        chunk.clear()
+
+    # Line 1 is the header
+    for line, record in enumerate(csv.DictReader(file), start=2):
+        try:
+            row = parse(record, seen)
+        except ValueError as e:
+            result.errors.append((line, str(e)))
+            continue
+        chunk.append(row)
+        if kind == "assignments" and row["date_in"] is None:
+            open_pairs.add((row["user"], row["key"]))
+        if len(chunk) == chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    open_pairs = list(open_pairs)
+    for i in range(0, len(open_pairs), PAIR_CHUNK_SIZE):
+        refresh_holdings(open_pairs[i : i + PAIR_CHUNK_SIZE])
+    return result
+
+
+@app.route("/import", methods=["GET", "POST"])
+@login_required
+def import_data():
+    """
+    Page for importing keys, users or assignments from a CSV file
+    """
+    form = ImportForm()
+
+    if request.method == "POST":
+        if form.cancel.data:
+            return redirect(url_for("index"))
+
+    if form.validate_on_submit():
+        file = io.TextIOWrapper(form.file.data.stream, encoding="utf-8-sig")
+        result = import_csv(form.kind.data, file)
+        db.session.commit()
+        flash(f"Imported {result.imported} {form.kind.data}.")
+        if result.errors:
+            flash(
+                f"{len(result.errors)} line(s) could not be imported: "
+                + "; ".join(f"line {line}: {error}" for line, error in result.errors[:10]),
+                "danger",
+            )
+        return redirect(url_for(form.kind.data))
+
+    return render_template("quick_form.html", form=form, title="Import")
@@ -0,0 +1,229 @@
+"""
+metrics records per-endpoint request timings and SQL usage and serves them
+in the Prometheus text format on /metrics.
+
+Every gunicorn worker aggregates its own metrics in memory and writes them
+to a file named after its pid in METRICS_DIR at most once a second. /metrics
+adds up the files of all workers, so whichever worker serves the scrape
+reports the totals for the whole service. The gunicorn hooks in
+gunicorn.conf.py clear METRICS_DIR when the service starts and fold the file
+of an exited worker into dead.json, so its counts are kept.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import app
+
+# Upper bounds of the request duration histogram buckets in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+metric_help = {
+    "keymaster_requests_total": ("counter", "Requests handled."),
+    "keymaster_request_duration_seconds": ("histogram", "Request wall time."),
+    "keymaster_sql_queries_total": ("counter", "SQL statements executed."),
+    "keymaster_sql_duration_seconds_total": ("counter", "Time spent in SQL."),
+    "keymaster_template_render_seconds_total": (
+        "counter",
+        "Time spent rendering templates.",
+    ),
+    "keymaster_response_bytes_total": ("counter", "Response body bytes."),
+}
+
+
+class MetricsStore:
+    """The metrics of this process, keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._last_write = 0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            buckets, total, count = self.histograms.get(
+                key, ([0] * (len(DURATION_BUCKETS) + 1), 0, 0)
+            )
+            buckets[bisect_left(DURATION_BUCKETS, value)] += 1
+            self.histograms[key] = (buckets, total + value, count + 1)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "histograms": [
+                    [n, list(l), list(b), t, c]
+                    for (n, l), (b, t, c) in self.histograms.items()
+                ],
+            }
+
+    def write(self, directory, force=False):
+        """Writes this process's metrics to directory, at most once a second"""
+        now = time.monotonic()
+        if not force and now - self._last_write < 1:
+            return
+        self._last_write = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{os.getpid()}.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + ".tmp", path)
+
+
+store = MetricsStore()
+
+
+def load_all(directory):
+    """Returns the summed counters and histograms of every worker"""
+    store.write(directory, force=True)
+    counters, histograms = {}, {}
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data["counters"]:
+            key = (name, tuple(tuple(l) for l in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in data["histograms"]:
+            key = (name, tuple(tuple(l) for l in labels))
+            prev = histograms.get(key, ([0] * len(buckets), 0, 0))
+            histograms[key] = (
+                [a + b for a, b in zip(prev[0], buckets)],
+                prev[1] + total,
+                prev[2] + count,
+            )
+    return counters, histograms
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = [
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    ]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def format_metrics(counters, histograms):
+    """Returns the metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, (kind, help) in metric_help.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(DURATION_BUCKETS + ("+Inf",), buckets):
+                    cumulative += bucket
+                    le = format_labels(labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total}")
+                lines.append(f"{name}_count{format_labels(labels)} {count}")
+        else:
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class TimedTemplate(Template):
+    """A template which adds its render time to the current request's metrics"""
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_request_context() and "metrics_start" in g:
+                g.template_time += time.perf_counter() - start
+
+
+app.jinja_env.template_class = TimedTemplate
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    if has_request_context() and "metrics_start" in g:
+        g.sql_count += 1
+        g.sql_time += elapsed
+        g.sql_statements.append((elapsed, statement))
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.sql_count = 0
+    g.sql_time = 0
+    g.template_time = 0
+    g.sql_statements = []
+
+
+@app.after_request
+def record_request_metrics(response):
+    if "metrics_start" not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_start
+    endpoint = request.endpoint or "unknown"
+    labels = {"endpoint": endpoint}
+
+    store.inc(
+        "keymaster_requests_total",
+        {**labels, "method": request.method, "status": response.status_code},
+    )
+    store.observe("keymaster_request_duration_seconds", labels, elapsed)
+    store.inc("keymaster_sql_queries_total", labels, g.sql_count)
+    store.inc("keymaster_sql_duration_seconds_total", labels, g.sql_time)
+    store.inc("keymaster_template_render_seconds_total", labels, g.template_time)
+    if not response.is_streamed:
+        store.inc("keymaster_response_bytes_total", labels, response.content_length or 0)
+    store.write(app.config["METRICS_DIR"])
+
+    if elapsed > app.config["SLOW_REQUEST_THRESHOLD"]:
+        slowest = sorted(g.sql_statements, key=lambda s: s[0], reverse=True)[:3]
+        app.logger.warning(
+            f"Slow request {request.method} {request.full_path} took {elapsed:.3f}s "
+            f"({g.sql_count} queries in {g.sql_time:.3f}s, "
+            f"templates {g.template_time:.3f}s). Slowest statements: "
+            + "; ".join(f"{t:.3f}s {' '.join(s.split())}" for t, s in slowest)
+        )
+    return response
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Metrics of all workers in the Prometheus text format
+    """
+    counters, histograms = load_all(app.config["METRICS_DIR"])
+    return Response(
+        format_metrics(counters, histograms),
+        mimetype="text/plain; version=0.0.4",
+    )
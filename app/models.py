@@ -1,11 +1,10 @@
 from flask import current_app
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from hashlib import sha256
 from time import time
-import jwt
 
-from app import app, db, login
+from app import app, db
+from app.passwords import hash_password, needs_rehash, verify_password
 
 
 class User(UserMixin, db.Model):
@@ -15,19 +14,30 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(64), index=True, unique=True)
     email = db.Column(db.String(120), unique=True, nullable=True)
     display_name = db.Column(db.String(120))
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     can_login = db.Column(db.Boolean, default=False)
 
     def __repr__(self):
         return f"<User {self.username}>"
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """
+        Checks password and, if the stored hash was made with another method
+        or cost, replaces it with a hash made with the configured ones. The
+        caller commits the new hash.
+        """
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.password_hash = hash_password(password)
+        return True
 
     def get_reset_password_token(self, expires_in=600):
+        import jwt
+
         return jwt.encode(
             {"reset_password": self.id, "exp": time() + expires_in},
             current_app.config["SECRET_KEY"],
@@ -36,6 +46,8 @@ class User(UserMixin, db.Model):
 
     @staticmethod
     def verify_reset_password_token(token):
+        import jwt
+
         try:
             id = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])[
                 "reset_password"
@@ -44,31 +56,213 @@ class User(UserMixin, db.Model):
             return
         return User.query.get(id)
 
+    def get_api_token(self, expires_in=3600):
+        import jwt
+
+        return jwt.encode(
+            {"api_user": self.id, "exp": time() + expires_in},
+            current_app.config["SECRET_KEY"],
+            algorithm="HS256",
+        )
+
+    @staticmethod
+    def verify_api_token(token):
+        import jwt
+
+        try:
+            id = jwt.decode(token, app.config["SECRET_KEY"], algorithms=["HS256"])[
+                "api_user"
+            ]
+        except:
+            return
+        return User.query.get(id)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "username": self.username,
+            "email": self.email,
+            "display_name": self.display_name,
+            "can_login": self.can_login,
+        }
+
 
 class Key(db.Model):
     """The keys table tracks individual keys."""
 
     __tablename__ = "keys"
 
-    name = db.Column(db.String, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, unique=True, nullable=False)
     description = db.Column(db.String)
     status = db.Column(db.String, default="Active")
 
     def __repr__(self):
         return f"<Key {self.name}>"
 
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "status": self.status,
+        }
+
 
 class Assignment(db.Model):
-    """The assignments table tracks when keys are checked out and in to users."""
+    """
+    The assignments table tracks when keys are checked out and in to users.
+    The user and key are referenced by user_id and key_id. The user and key
+    columns hold their names for the pages, exports and API, and are kept in
+    step with the ids by app.ids.
+    """
 
     __tablename__ = "assignments"
     id = db.Column(db.Integer, primary_key=True)
-    user = db.Column(db.String, db.ForeignKey("users.username"))
-    key = db.Column(db.String, db.ForeignKey("keys.name"))
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    key_id = db.Column(db.Integer, db.ForeignKey("keys.id"))
+    user = db.Column(db.String)
+    key = db.Column(db.String)
     date_out = db.Column(db.Date)
     date_in = db.Column(db.Date, nullable=True)
+    # Also make a flush insert new users and keys before the rows naming them
+    user_record = db.relationship(User)
+    key_record = db.relationship(Key)
+
+    __table_args__ = (
+        db.Index("ix_assignments_key_id_date_in", "key_id", "date_in"),
+        db.Index("ix_assignments_user_id_date_in", "user_id", "date_in"),
+        # Range scans for point-in-time queries
+        db.Index("ix_assignments_key_id_period", "key_id", "date_out", "date_in"),
+        db.Index("ix_assignments_user_id_period", "user_id", "date_out", "date_in"),
+        # Partial index covering only the open assignments
+        db.Index(
+            "ix_assignments_open",
+            "user",
+            "key",
+            sqlite_where=date_in.is_(None),
+            postgresql_where=date_in.is_(None),
+        ),
+        # SQLite would otherwise reuse the ids of the archived assignments
+        {"sqlite_autoincrement": True},
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "user": self.user,
+            "key": self.key,
+            "date_out": self.date_out.isoformat() if self.date_out else None,
+            "date_in": self.date_in.isoformat() if self.date_in else None,
+        }
+
+    archived = False
+
+
+class ArchivedAssignment(db.Model):
+    """
+    The assignments_archive table holds closed assignments moved out of the
+    assignments table by app.archive. It has the same columns, and only the
+    indexes for the point-in-time queries.
+    """
+
+    __tablename__ = "assignments_archive"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    key_id = db.Column(db.Integer, db.ForeignKey("keys.id"))
+    user = db.Column(db.String)
+    key = db.Column(db.String)
+    date_out = db.Column(db.Date)
+    date_in = db.Column(db.Date)
+
+    __table_args__ = (
+        db.Index("ix_assignments_archive_key_id_period", "key_id", "date_out", "date_in"),
+        db.Index(
+            "ix_assignments_archive_user_id_period", "user_id", "date_out", "date_in"
+        ),
+    )
+
+    to_dict = Assignment.to_dict
+    archived = True
+
+
+class Holding(db.Model):
+    """
+    The current_holdings table has one row per (user, key) pair that is
+    currently checked out. It is a projection of the open assignments which is
+    kept in sync by app.holdings.
+    """
+
+    __tablename__ = "current_holdings"
+    user = db.Column(db.String, primary_key=True)
+    key = db.Column(db.String, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"))
+    key_id = db.Column(db.Integer, db.ForeignKey("keys.id"))
+    date_out = db.Column(db.Date)
+    user_record = db.relationship(User)
+    key_record = db.relationship(Key)
+
+    __table_args__ = (
+        db.Index("ix_current_holdings_key", "key"),
+        db.Index("ix_current_holdings_date_out", "date_out"),
+    )
+
+    def __repr__(self):
+        return f"<Holding {self.user} {self.key}>"
+
+
+class DataVersion(db.Model):
+    """
+    The data_versions table has a counter for each table which is
+    incremented on every write to it. It is used to invalidate caches.
+    """
+
+    __tablename__ = "data_versions"
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChangeEvent(db.Model):
+    """
+    The change_log table records the changes pushed to open dashboards. It is
+    tailed by the /events stream of every worker, see app.events.
+    """
+
+    __tablename__ = "change_log"
+    id = db.Column(db.Integer, primary_key=True)
+    created = db.Column(db.DateTime, nullable=False)
+    kind = db.Column(db.String, nullable=False)
+    data = db.Column(db.Text, nullable=False)
+
+
+class DailyRollup(db.Model):
+    """
+    The rollup_daily table counts the check-outs and check-ins of each day.
+    It and the other rollup tables are kept up to date by app.rollups.
+    """
+
+    __tablename__ = "rollup_daily"
+    day = db.Column(db.Date, primary_key=True)
+    checkouts = db.Column(db.Integer, nullable=False, default=0)
+    checkins = db.Column(db.Integer, nullable=False, default=0)
+
+
+class KeyRollup(db.Model):
+    """
+    The rollup_keys table counts the check-outs and returns of each key and
+    the total number of days it was out over all returned assignments.
+    """
+
+    __tablename__ = "rollup_keys"
+    key = db.Column(db.String, primary_key=True)
+    checkouts = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
+    days_out = db.Column(db.Integer, nullable=False, default=0)
+
 
+class UserRollup(db.Model):
+    """The rollup_users table counts the check-outs and returns of each user."""
 
-@login.user_loader
-def load_user(id):
-    return User.query.get(int(id))
+    __tablename__ = "rollup_users"
+    user = db.Column(db.String, primary_key=True)
+    checkouts = db.Column(db.Integer, nullable=False, default=0)
+    returns = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,210 @@
+"""pagination provides keyset (cursor) pagination for the listing pages"""
+
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import Date, and_, func, literal, or_
+
+
+class Page:
+    """A single page of results and the cursors to its neighbours"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class StreamedPage:
+    """
+    A page of keyset_query results which are loaded batch_size rows at a
+    time as the page is iterated, so they never all need to be in memory.
+    The cursors are only set once the rows have been iterated, which the
+    listing templates do before rendering the page navigation.
+    """
+
+    def __init__(
+        self, query, sort_attr, pk_attr, after=None, before=None, per_page=50, batch_size=100
+    ):
+        self.query = query.yield_per(batch_size)
+        self.sort_attr = sort_attr
+        self.pk_attr = pk_attr
+        self.after = after
+        self.before = before
+        self.per_page = per_page
+        self.next_cursor = self.prev_cursor = None
+
+    def __iter__(self):
+        if self.before is not None and self.after is None:
+            # A backwards page is read in reverse, so it has to be loaded
+            # before its first row is known
+            page = keyset_page(
+                self.query.all(), self.sort_attr, self.pk_attr,
+                self.after, self.before, self.per_page,
+            )
+            self.next_cursor, self.prev_cursor = page.next_cursor, page.prev_cursor
+            yield from page
+            return
+
+        item = None
+        for count, row in enumerate(self.query):
+            if count == self.per_page:
+                self.next_cursor = encode_cursor(item, self.sort_attr, self.pk_attr)
+                break
+            if count == 0 and self.after is not None:
+                self.prev_cursor = encode_cursor(row, self.sort_attr, self.pk_attr)
+            item = row
+            yield row
+
+
+def _column(attr):
+    """Returns the column of a mapped attribute, or attr if it is a column"""
+    return attr.property.columns[0] if hasattr(attr, "property") else attr
+
+
+def _sort_expression(attr):
+    """
+    Nullable columns are compared through COALESCE so that keyset
+    comparisons stay well defined. NULLs sort as the smallest value.
+    """
+    column = _column(attr)
+    if column.primary_key or not column.nullable:
+        return attr
+    sentinel = date.min if isinstance(column.type, Date) else ""
+    return func.coalesce(attr, literal(sentinel, type_=column.type))
+
+
+def _row_value(item, attr):
+    value = getattr(item, attr.key)
+    if value is None:
+        return date.min if isinstance(_column(attr).type, Date) else ""
+    return value
+
+
+def encode_cursor(item, sort_attr, pk_attr):
+    """Returns an opaque cursor string for the position of item"""
+    values = []
+    for attr in (sort_attr, pk_attr):
+        value = _row_value(item, attr)
+        values.append(value.isoformat() if isinstance(value, date) else value)
+    raw = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor, sort_attr, pk_attr):
+    """
+    Returns the (sort value, primary key) tuple stored in cursor. Raises
+    ValueError if the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        sort_value, pk_value = values
+        return _cursor_value(sort_value, sort_attr), _cursor_value(pk_value, pk_attr)
+    except (TypeError, ValueError, KeyError):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+
+
+def _cursor_value(value, attr):
+    """
+    Returns the value of attr read from a cursor. Raises ValueError unless
+    it is a scalar of the column's type. Cursors never hold None, as
+    encode_cursor writes the sentinel of _row_value instead.
+    """
+    column = _column(attr)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    # type() rather than isinstance(), as JSON booleans are ints too
+    if type(value) is not column.type.python_type:
+        raise ValueError(f"Invalid value {value!r} for {column.key}")
+    return value
+
+
+def keyset_paginate(
+    query, sort_attr, pk_attr, after=None, before=None, per_page=50, descending=False
+):
+    """
+    Returns a Page of at most per_page items from query ordered by sort_attr,
+    with pk_attr as the tie breaker.
+
+    `after` and `before` are cursors previously returned in Page.next_cursor
+    and Page.prev_cursor. Only the rows of the requested page are fetched
+    from the database, so the cost of a page does not depend on how deep
+    into the result set it is.
+    """
+    query = keyset_query(query, sort_attr, pk_attr, after, before, per_page, descending)
+    return keyset_page(query.all(), sort_attr, pk_attr, after, before, per_page)
+
+
+def keyset_stream(
+    query, sort_attr, pk_attr, after=None, before=None, per_page=50, descending=False,
+    batch_size=100,
+):
+    """
+    Returns the same page as keyset_paginate as a StreamedPage, which loads
+    its rows while it is iterated
+    """
+    query = keyset_query(query, sort_attr, pk_attr, after, before, per_page, descending)
+    return StreamedPage(query, sort_attr, pk_attr, after, before, per_page, batch_size)
+
+
+def keyset_query(
+    query, sort_attr, pk_attr, after=None, before=None, per_page=50, descending=False
+):
+    """
+    Returns query (a Query or a select()) limited to the rows of the page
+    described in keyset_paginate, plus one row to tell if there are more.
+    """
+    sort_expr = _sort_expression(sort_attr)
+    same_column = sort_attr is pk_attr
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+    # Walking backwards is a forwards walk in the opposite order
+    ascending = descending == backwards
+
+    if cursor is not None:
+        sort_value, pk_value = decode_cursor(cursor, sort_attr, pk_attr)
+        if ascending:
+            pk_cmp = pk_attr > pk_value
+            sort_cmp = sort_expr > sort_value
+        else:
+            pk_cmp = pk_attr < pk_value
+            sort_cmp = sort_expr < sort_value
+        if same_column:
+            query = query.filter(pk_cmp)
+        else:
+            query = query.filter(or_(sort_cmp, and_(sort_expr == sort_value, pk_cmp)))
+
+    if ascending:
+        order = [sort_expr.asc(), pk_attr.asc()]
+    else:
+        order = [sort_expr.desc(), pk_attr.desc()]
+    if same_column:
+        order = order[1:]
+
+    return query.order_by(*order).limit(per_page + 1)
+
+
+def keyset_page(rows, sort_attr, pk_attr, after=None, before=None, per_page=50):
+    """Returns the Page for the rows fetched with keyset_query"""
+    backwards = before is not None and after is None
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+    if backwards:
+        items.reverse()
+
+    if not items:
+        return Page(items)
+
+    next_cursor = prev_cursor = None
+    if has_more or backwards:
+        next_cursor = encode_cursor(items[-1], sort_attr, pk_attr)
+    if (has_more and backwards) or (after is not None and not backwards):
+        prev_cursor = encode_cursor(items[0], sort_attr, pk_attr)
+    return Page(items, next_cursor, prev_cursor)
@@ -0,0 +1,166 @@
+"""
+passwords hashes and checks passwords with the method and cost set in the
+config. PASSWORD_HASH_METHOD is one of pbkdf2, scrypt or argon2. Stored
+hashes made with a different method or cost are replaced when the user next
+logs in.
+
+Hashing runs on a small per-process thread pool. hashlib and argon2-cffi
+release the GIL while hashing, so other request threads keep running, and
+only PASSWORD_HASH_WORKERS hashes use the CPU at once. When more than
+PASSWORD_HASH_MAX_PENDING hashes are already waiting, HashingBusy is raised
+and the request is answered with a 503 instead of queueing behind them.
+"""
+
+import hashlib
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import render_template
+from werkzeug.security import check_password_hash, gen_salt, generate_password_hash
+
+from app import app
+
+SALT_LENGTH = 16
+SCRYPT_KEY_LENGTH = 64
+
+
+class HashingBusy(Exception):
+    """Raised when too many passwords are already waiting to be hashed"""
+
+
+class HashingPool:
+    """
+    A bounded thread pool for password hashing. The executor is created
+    lazily so that each gunicorn worker gets its own after forking.
+    """
+
+    def __init__(self, workers=2, max_pending=32):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="password-hash"
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        """Runs fn(*args) on the pool and returns its result"""
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            return self.executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+pool = HashingPool(
+    app.config["PASSWORD_HASH_WORKERS"], app.config["PASSWORD_HASH_MAX_PENDING"]
+)
+
+
+def current_method():
+    """
+    Returns the method string of the configured method and cost, as found
+    before the first "$" of the hashes it makes
+    """
+    config = app.config
+    method = config["PASSWORD_HASH_METHOD"]
+    if method == "pbkdf2":
+        return f"pbkdf2:sha256:{config['PASSWORD_PBKDF2_ITERATIONS']}"
+    if method == "scrypt":
+        return (
+            f"scrypt:{config['PASSWORD_SCRYPT_N']}:{config['PASSWORD_SCRYPT_R']}"
+            f":{config['PASSWORD_SCRYPT_P']}"
+        )
+    if method == "argon2":
+        return "argon2"
+    raise ValueError(f"Unknown password hash method '{method}'.")
+
+
+def argon2_hasher():
+    try:
+        from argon2 import PasswordHasher
+    except ImportError:
+        raise RuntimeError("Argon2 password hashes require the argon2-cffi package.")
+    return PasswordHasher(
+        time_cost=app.config["PASSWORD_ARGON2_TIME_COST"],
+        memory_cost=app.config["PASSWORD_ARGON2_MEMORY_COST"],
+        parallelism=app.config["PASSWORD_ARGON2_PARALLELISM"],
+    )
+
+
+def scrypt(password, salt, method):
+    """Returns the hex scrypt digest for a "scrypt:n:r:p" method string"""
+    n, r, p = (int(value) for value in method.split(":")[1:])
+    return hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=salt.encode("utf-8"),
+        n=n,
+        r=r,
+        p=p,
+        maxmem=132 * n * r * p,
+        dklen=SCRYPT_KEY_LENGTH,
+    ).hex()
+
+
+def _hash(password, method):
+    if method == "argon2":
+        return argon2_hasher().hash(password)
+    if method.startswith("scrypt:"):
+        salt = gen_salt(SALT_LENGTH)
+        return f"{method}${salt}${scrypt(password, salt, method)}"
+    return generate_password_hash(password, method=method, salt_length=SALT_LENGTH)
+
+
+def _check(pwhash, password):
+    if pwhash.startswith("$argon2"):
+        hasher = argon2_hasher()
+        from argon2.exceptions import InvalidHash, VerificationError
+
+        try:
+            return hasher.verify(pwhash, password)
+        except (InvalidHash, VerificationError):
+            return False
+    if pwhash.startswith("scrypt:"):
+        try:
+            method, salt, digest = pwhash.split("$", 2)
+            return hmac.compare_digest(scrypt(password, salt, method), digest)
+        except ValueError:
+            return False
+    return check_password_hash(pwhash, password)
+
+
+def hash_password(password):
+    """Hashes password with the configured method and cost"""
+    return pool.run(_hash, password, current_method())
+
+
+def verify_password(pwhash, password):
+    """Checks password against a hash made with any of the methods"""
+    if not pwhash:
+        return False
+    return pool.run(_check, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """True if pwhash was not made with the configured method and cost"""
+    method = current_method()
+    if method == "argon2":
+        return not pwhash.startswith("$argon2") or argon2_hasher().check_needs_rehash(
+            pwhash
+        )
+    return pwhash.split("$", 1)[0] != method
+
+
+@app.errorhandler(HashingBusy)
+def hashing_busy(error):
+    return render_template("503.html"), 503, {"Retry-After": "1"}
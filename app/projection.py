@@ -0,0 +1,66 @@
+"""
+projection reads just the columns a page or export shows, as rows rather
+than model objects. The rows are tuples whose values can also be read as
+attributes, so the templates use them like the models, but loading them
+skips the identity map and the per object bookkeeping of the ORM, which the
+read only listings do not need.
+"""
+
+from sqlalchemy import inspect
+
+from app import db
+
+
+def get_headings(heading_map=None, obj=None):
+    """
+    Returns a tuple of (headings, attributes) for the given heading_map, as
+    described in routes.get_headings_rows. attributes are the object
+    attributes to read for each heading. If heading_map is empty, the public
+    attributes of obj are used.
+    """
+    if isinstance(heading_map, (list, tuple)):
+        is_dict = False
+        headings = list(heading_map)
+    else:
+        is_dict = True
+        if heading_map:
+            headings = [v if v else k for k, v in heading_map.items()]
+        elif hasattr(obj, "_fields"):
+            headings = list(obj._fields)
+        else:
+            headings = [h for h in vars(obj).keys() if not str(h).startswith("_")]
+
+    if is_dict and heading_map:
+        eval_headings = list(heading_map.keys())
+    elif is_dict and not heading_map:
+        eval_headings = headings
+    elif not is_dict:
+        eval_headings = headings
+
+    return (headings, eval_headings)
+
+
+def iter_rows(objs, attributes):
+    """Yields a row list of the given attributes for each object in objs"""
+    for obj in objs:
+        yield [getattr(obj, attribute) for attribute in attributes]
+
+
+def columns(model, heading_map=None):
+    """
+    Returns a tuple of (headings, columns) with the columns of model to
+    select for heading_map, which has the same meaning as in get_headings.
+    If heading_map is empty, every column of model is selected.
+    """
+    if not heading_map:
+        heading_map = [attr.key for attr in inspect(model).column_attrs]
+    headings, attributes = get_headings(heading_map)
+    return headings, [getattr(model, attribute) for attribute in attributes]
+
+
+def project(model, heading_map=None):
+    """
+    Returns a query of rows of the heading_map columns of model. It can be
+    filtered, sorted and paginated like model.query.
+    """
+    return db.session.query(*columns(model, heading_map)[1])
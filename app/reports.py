@@ -0,0 +1,99 @@
+"""
+reports serves the /reports page. The reports only read the rollup tables
+maintained by app.rollups and the current_holdings projection, never the
+assignments table, so their cost does not grow with the history.
+"""
+
+from datetime import date, timedelta
+
+from flask import render_template, request
+from flask_login import login_required
+
+from app import app, db
+from app.models import DailyRollup, Holding, KeyRollup, UserRollup
+from app.routes import get_user_dict
+
+REPORT_LIMIT = 50
+# Longest overdue period, so the cutoff date stays within the date range
+MAX_REPORT_DAYS = 36500
+
+
+def average_durations(limit=REPORT_LIMIT):
+    """
+    Returns (key, returns, average days out) rows for the keys with the
+    longest average checkout duration
+    """
+    average = (KeyRollup.days_out * 1.0 / KeyRollup.returns).label("average")
+    rows = (
+        db.session.query(KeyRollup.key, KeyRollup.returns, average)
+        .filter(KeyRollup.returns > 0)
+        .order_by(average.desc(), KeyRollup.key)
+        .limit(limit)
+    )
+    return [(key, returns, round(avg, 1)) for key, returns, avg in rows]
+
+
+def overdue_keys(days, limit=REPORT_LIMIT):
+    """
+    Returns (user, key, date_out, days out) rows for the keys which have
+    been checked out for more than days days, longest first
+    """
+    today = date.today()
+    rows = (
+        db.session.query(Holding.user, Holding.key, Holding.date_out)
+        .filter(Holding.date_out < today - timedelta(days=days))
+        .order_by(Holding.date_out, Holding.key)
+        .limit(limit)
+    )
+    return [(user, key, out, (today - out).days) for user, key, out in rows]
+
+
+def monthly_checkouts():
+    """Returns (month, checkouts, checkins) rows, oldest month first"""
+    months = {}
+    for day, checkouts, checkins in db.session.query(
+        DailyRollup.day, DailyRollup.checkouts, DailyRollup.checkins
+    ).order_by(DailyRollup.day):
+        month = day.strftime("%Y-%m")
+        prev = months.get(month, (0, 0))
+        months[month] = (prev[0] + checkouts, prev[1] + checkins)
+    return [(month, out, in_) for month, (out, in_) in months.items() if out or in_]
+
+
+def user_counts(limit=REPORT_LIMIT):
+    """Returns (user, checkouts, returns) rows for the busiest users"""
+    rows = (
+        db.session.query(UserRollup.user, UserRollup.checkouts, UserRollup.returns)
+        .filter(UserRollup.checkouts > 0)
+        .order_by(UserRollup.checkouts.desc(), UserRollup.user)
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+def get_days(args, default=30):
+    """Returns the days argument of the overdue report"""
+    try:
+        return min(max(int(args.get("days", default)), 0), MAX_REPORT_DAYS)
+    except ValueError:
+        return default
+
+
+@app.route("/reports")
+@login_required
+def reports():
+    """
+    Page with the utilization, overdue and turnover reports
+    """
+    days = get_days(request.args)
+    overdue = overdue_keys(days)
+    busiest = user_counts()
+    names = get_user_dict([row[0] for row in overdue + busiest])
+    return render_template(
+        "reports.html",
+        days=days,
+        durations=average_durations(),
+        overdue=[(names.get(row[0], row[0]), *row[1:]) for row in overdue],
+        months=monthly_checkouts(),
+        busiest=[(names.get(row[0], row[0]), *row[1:]) for row in busiest],
+    )
@@ -0,0 +1,180 @@
+"""
+rollups maintains the pre-aggregated statistics of the assignment history
+used by the reports. Every write to the assignments table passes the rows
+it removed and added to update_rollups in the same transaction, which
+applies the difference to the rollup tables. rebuild_rollups recomputes
+them from scratch.
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db
+from app.archive import history_union
+from app.models import DailyRollup, KeyRollup, UserRollup
+
+# Keeps the IN clause of the existing row lookup under SQLite's parameter
+# limit
+LOOKUP_CHUNK_SIZE = 500
+
+
+class Deltas:
+    """Per-row changes to the columns of each rollup table"""
+
+    def __init__(self):
+        self.daily = {}
+        self.keys = {}
+        self.users = {}
+
+    def add(self, user, key, date_out, date_in, sign=1):
+        """Adds the contribution of one assignment, or removes it if sign is -1"""
+        returned = date_in is not None
+        self._add(self.daily, date_out, (sign, 0))
+        if returned:
+            self._add(self.daily, date_in, (0, sign))
+        days = (date_in - date_out).days if returned else 0
+        self._add(self.keys, key, (sign, sign * returned, sign * days))
+        self._add(self.users, user, (sign, sign * returned))
+
+    @staticmethod
+    def _add(table, pk, values):
+        current = table.get(pk)
+        table[pk] = values if current is None else tuple(map(sum, zip(current, values)))
+
+
+rollups = (
+    (DailyRollup, "daily", ("checkouts", "checkins")),
+    (KeyRollup, "keys", ("checkouts", "returns", "days_out")),
+    (UserRollup, "users", ("checkouts", "returns")),
+)
+
+
+# Backends which support INSERT ... ON CONFLICT DO UPDATE
+upsert_inserts = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def apply_deltas(model, columns, deltas):
+    """
+    Adds deltas, a dict of primary key to column values, to the rows of
+    model. Where the backend supports it this is a single bulk upsert.
+    Otherwise existing rows are found with one query per chunk and updated
+    with a bulk update, and the others are created with a bulk insert.
+    """
+    deltas = {pk: values for pk, values in deltas.items() if any(values)}
+    if not deltas:
+        return
+    table = model.__table__
+    pk_column = table.primary_key.columns.values()[0]
+    pks = list(deltas)
+
+    insert = upsert_inserts.get(db.engine.dialect.name)
+    if insert:
+        statement = insert(table)
+        db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[pk_column],
+                set_={c: table.c[c] + statement.excluded[c] for c in columns},
+            ),
+            [{pk_column.name: pk, **dict(zip(columns, deltas[pk]))} for pk in pks],
+        )
+        return
+
+    existing = set()
+    for i in range(0, len(pks), LOOKUP_CHUNK_SIZE):
+        existing.update(
+            pk
+            for (pk,) in db.session.query(pk_column).filter(
+                pk_column.in_(pks[i : i + LOOKUP_CHUNK_SIZE])
+            )
+        )
+
+    updates = [
+        {"_pk": pk, **{f"_{c}": v for c, v in zip(columns, deltas[pk])}}
+        for pk in pks
+        if pk in existing
+    ]
+    if updates:
+        db.session.execute(
+            table.update()
+            .where(pk_column == db.bindparam("_pk"))
+            .values({c: table.c[c] + db.bindparam(f"_{c}") for c in columns}),
+            updates,
+        )
+    inserts = [
+        {pk_column.name: pk, **dict(zip(columns, deltas[pk]))}
+        for pk in pks
+        if pk not in existing
+    ]
+    if inserts:
+        db.session.execute(table.insert(), inserts)
+
+
+def update_rollups(removed=(), added=()):
+    """
+    Updates the rollups for assignments which were removed and added, each
+    an iterable of (user, key, date_out, date_in) rows. An edit is the old
+    row removed and the new one added. The caller is responsible for
+    committing the session.
+    """
+    deltas = Deltas()
+    for row in removed:
+        deltas.add(*row, sign=-1)
+    for row in added:
+        deltas.add(*row)
+    for model, name, columns in rollups:
+        apply_deltas(model, columns, getattr(deltas, name))
+
+
+def compute_rollups():
+    """Returns the Deltas of all the live and archived assignments"""
+    deltas = Deltas()
+    rows = db.session.execute(
+        history_union(
+            lambda model: select(model.user, model.key, model.date_out, model.date_in)
+        ),
+        execution_options={
+            "stream_results": True,
+            "max_row_buffer": app.config["EXPORT_BATCH_SIZE"],
+        },
+    )
+    for row in rows:
+        deltas.add(*row)
+    return deltas
+
+
+def rebuild_rollups():
+    """Rebuilds the rollup tables from the assignments table"""
+    deltas = compute_rollups()
+    for model, name, columns in rollups:
+        model.query.delete()
+        pk_name = model.__table__.primary_key.columns.values()[0].name
+        rows = [
+            {pk_name: pk, **dict(zip(columns, values))}
+            for pk, values in getattr(deltas, name).items()
+        ]
+        if rows:
+            db.session.execute(model.__table__.insert(), rows)
+    db.session.commit()
+
+
+def verify_rollups():
+    """
+    Compares the rollup tables against the assignments table. Returns a list
+    of (table, primary key, expected, actual) mismatches.
+    """
+    deltas = compute_rollups()
+    mismatches = []
+    for model, name, columns in rollups:
+        pk_column = model.__table__.primary_key.columns.values()[0]
+        want = {pk: v for pk, v in getattr(deltas, name).items() if any(v)}
+        got = {
+            pk: tuple(values)
+            for pk, *values in db.session.query(
+                pk_column, *[model.__table__.c[c] for c in columns]
+            )
+            if any(values)
+        }
+        for pk in sorted(set(want) | set(got), key=str):
+            if want.get(pk) != got.get(pk):
+                mismatches.append((model.__tablename__, pk, want.get(pk), got.get(pk)))
+    return mismatches
@@ -1,12 +1,24 @@
 """ Handles routing in the app """
+from datetime import date
+
 from flask import flash, redirect, render_template, request, url_for
 from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy import literal, select
 
 from app import app, db
+from app.archive import history_union
+from app.cache import cache, cached_page
+from app.events import emit, latest_event_id
 from app.forms import (AssignKeyForm, ConfirmForm, EditAssignmentForm,
                        EditKeyForm, EditUserForm, LoginForm, NewKeyForm,
                        NewUserForm)
-from app.models import Assignment, Key, User
+from app.holdings import check_out_keys, refresh_holdings
+from app.ids import key_id_of, rename_user, user_id_of
+from app.models import Assignment, Holding, Key, User
+from app.pagination import keyset_paginate, keyset_query, keyset_stream
+from app.projection import columns, get_headings, iter_rows, project
+from app.rollups import update_rollups
+from app.streaming import stream_rows, stream_template
 
 ############################
 # Functions
@@ -14,24 +26,59 @@ from app.models import Assignment, Key, User
 
 types = {"key": Key, "user": User, "assignment": Assignment}
 
+# Columns each listing page can be sorted by
+assignment_sorts = {
+    "user": Assignment.user,
+    "key": Assignment.key,
+    "date_out": Assignment.date_out,
+    "date_in": Assignment.date_in,
+}
+key_sorts = {"name": Key.name, "description": Key.description, "status": Key.status}
+user_sorts = {
+    "username": User.username,
+    "display_name": User.display_name,
+    "email": User.email,
+}
+
+# The columns shown by the listing pages, see app.projection
+assignment_columns = ("id", "user", "key", "date_out", "date_in")
+key_columns = ("name", "description", "status")
+user_columns = ("id", "username", "display_name", "email")
+
 
 def add_form_choices(form):
-    """Creates form selection choices from the Users table and the Keys table"""
+    """
+    Creates form selection choices from the Users table and the Keys table.
+    Only the currently selected users and keys are loaded. Other choices are
+    fetched by the typeahead widgets from /search as the user types.
+    """
+
+    def selected(field):
+        if isinstance(field.data, (list, tuple)):
+            return list(field.data)
+        return [field.data] if field.data else []
+
+    users = selected(form.user)
     form.user.choices = [
-        (u.username, u.display_name or u.username)
-        for u in User.query.order_by(User.username).all()
-    ]
+        (username, display_name or username)
+        for username, display_name in db.session.query(User.username, User.display_name)
+        .filter(User.username.in_(users))
+        .order_by(User.username)
+    ] if users else []
+    keys = selected(form.key)
     form.key.choices = [
-        (k.name, k.name)
-        for k in Key.query.order_by(Key.name).filter_by(status="Active").all()
-    ]
+        (name, name)
+        for (name,) in db.session.query(Key.name)
+        .filter(Key.name.in_(keys), Key.status == "Active")
+        .order_by(Key.name)
+    ] if keys else []
     return form
 
 
 def get_headings_rows(obj_list, heading_map=None):
     """
     Generates a list of headings and a list of rows from a list of
-    SQLAlchemy objects
+    SQLAlchemy objects or rows
 
     heading_map can be used to select which object attributes should be
     added to the rows and optionally how the row heading for that
@@ -47,41 +94,33 @@ def get_headings_rows(obj_list, heading_map=None):
     `heading_map = {"obj_attribute1": "Heading Name1",
                     "obj_attribute2": None}`
     """
-    if isinstance(heading_map, (list, tuple)):
-        is_dict = False
-        headings = list(heading_map)
-    else:
-        is_dict = True
-        if heading_map:
-            headings = [v if v else k for k, v in heading_map.items()]
-        else:
-            headings = [
-                h for h in vars(obj_list[0]).keys() if not str(h).startswith("_")
-            ]
-
-    if is_dict and heading_map:
-        eval_headings = list(heading_map.keys())
-    elif is_dict and not heading_map:
-        eval_headings = headings
-    elif not is_dict:
-        eval_headings = headings
-
-    rows = []
-    for obj in obj_list:
-        row = []
-        for heading in eval_headings:
-            row.append(getattr(obj, heading))
-        rows.append(row)
+    headings, eval_headings = get_headings(
+        heading_map, obj_list[0] if not heading_map else None
+    )
+    rows = list(iter_rows(obj_list, eval_headings))
     return (headings, rows)
 
 
-def get_user_dict():
+def get_user_dict(usernames=None):
     """
     Returns dictionary of {username: display_name} for all users in
-    the Users tables.
-    """
-    user_list = User.query.all()
-    return {user.username: user.display_name for user in user_list if user.display_name}
+    the Users tables. If usernames is given, only those users are included.
+    The dictionary is cached until the Users table changes.
+    """
+    user_dict = cache.get(
+        "user_dict",
+        ("users",),
+        lambda: {
+            username: display_name
+            for username, display_name in db.session.query(
+                User.username, User.display_name
+            )
+            if display_name
+        },
+    )
+    if usernames is None:
+        return dict(user_dict)
+    return {u: user_dict[u] for u in set(usernames) if u in user_dict}
 
 
 def get_display_name(username):
@@ -93,6 +132,206 @@ def get_display_name(username):
     return display_name or username
 
 
+def group_open_assignments(by_user=True):
+    """
+    Returns a row for each user (or each key if by_user is False) holding a
+    key. Display names are resolved with a single joined query so the cost
+    does not grow with the number of rows. See group_assignments.
+    """
+    return group_assignments(
+        db.session.execute(open_assignments_statement(by_user)), by_user
+    )
+
+
+def open_assignments_statement(by_user=True):
+    """
+    Returns the select() of (user, key, display name, key status) rows for
+    group_open_assignments
+    """
+    if by_user:
+        order = (Holding.user, Holding.key)
+    else:
+        order = (Holding.key, Holding.user)
+
+    return (
+        select(Holding.user, Holding.key, User.display_name, Key.status)
+        .outerjoin(User, User.id == Holding.user_id)
+        .outerjoin(Key, Key.id == Holding.key_id)
+        .order_by(*order)
+    )
+
+
+def group_assignments(assignment_list, by_user=True):
+    """
+    Groups the rows of open_assignments_statement into dicts of the group's
+    id and label, its items as {id: label} and whether it is an inactive
+    key. The ids are the usernames and key names the dashboard patches the
+    rows by, see app.events.
+    """
+    return list(iter_groups(assignment_list, by_user))
+
+
+def iter_groups(assignment_list, by_user=True):
+    """
+    Yields the groups of group_assignments one at a time. The rows are
+    ordered by their group, so each group is complete when the next starts.
+    """
+    current = None
+    for username, key, display_name, status in assignment_list:
+        name = display_name or username
+        if by_user:
+            group, label, item, item_label = username, name, key, key
+        else:
+            group, label, item, item_label = key, key, username, name
+        if current is None or current["id"] != group:
+            if current is not None:
+                yield current
+            current = {
+                "id": group,
+                "label": label,
+                "items": {},
+                "inactive": not by_user and status == "Inactive",
+            }
+        current["items"][item] = item_label
+    if current is not None:
+        yield current
+
+
+def parse_date(value):
+    """Returns the date for an ISO formatted string or None if it is invalid"""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def filter_assignments(query, args, model=Assignment):
+    """
+    Applies the user, key, status (open/closed) and date range filters in
+    args to a query of model (Assignment or ArchivedAssignment).
+    """
+    if args.get("user"):
+        query = query.filter(model.user_id == user_id_of(args["user"]))
+    if args.get("key"):
+        query = query.filter(model.key_id == key_id_of(args["key"]))
+    if args.get("status") == "open":
+        query = query.filter(model.date_in.is_(None))
+    elif args.get("status") == "closed":
+        query = query.filter(model.date_in.isnot(None))
+    date_from = parse_date(args.get("date_from"))
+    if date_from:
+        query = query.filter(model.date_out >= date_from)
+    date_to = parse_date(args.get("date_to"))
+    if date_to:
+        query = query.filter(model.date_out <= date_to)
+    return query
+
+
+def assignment_listing(args):
+    """
+    Returns (rows, sorts) for the assignments listing. rows is a subquery of
+    the listing columns and an archived flag of the live and archived
+    assignments matching the filters in args, and sorts are the
+    assignment_sorts over its columns. Each table is filtered, sorted and
+    cut to the requested page through its own indexes before the two are
+    merged, so the archive does not slow the page down. Raises ValueError
+    for an invalid cursor.
+    """
+
+    def build(model):
+        query = filter_assignments(
+            select(
+                *columns(model, assignment_columns)[1],
+                literal(model.archived).label("archived"),
+            ),
+            args,
+            model,
+        )
+        sorts = {name: getattr(model, attr.key) for name, attr in assignment_sorts.items()}
+        options = listing_options(sorts, model.id, args, "date_out", "desc")
+        return select(keyset_query(query, **options).subquery())
+
+    rows = history_union(build).subquery()
+    return rows, {name: rows.c[name] for name in assignment_sorts}
+
+
+def paginate_listing(query, sorts, pk_attr, args, default_sort, default_dir="asc"):
+    """
+    Returns a page of query based on the sort, dir, after, before and
+    per_page request arguments. Raises ValueError for an invalid cursor.
+    """
+    return keyset_paginate(
+        query, **listing_options(sorts, pk_attr, args, default_sort, default_dir)
+    )
+
+
+def listing_page(query, sorts, pk_attr, args, default_sort, default_dir="asc"):
+    """
+    Returns the page of paginate_listing for a listing page. When
+    STREAM_PAGES is on, the page loads its rows while it is rendered.
+    """
+    if not app.config["STREAM_PAGES"]:
+        return paginate_listing(query, sorts, pk_attr, args, default_sort, default_dir)
+    return keyset_stream(
+        query,
+        batch_size=app.config["STREAM_BATCH_SIZE"],
+        **listing_options(sorts, pk_attr, args, default_sort, default_dir),
+    )
+
+
+def render_listing(template_name, **context):
+    """Renders a listing page, as it is sent when STREAM_PAGES is on"""
+    if app.config["STREAM_PAGES"]:
+        return stream_template(template_name, **context)
+    return render_template(template_name, **context)
+
+
+def listing_options(sorts, pk_attr, args, default_sort, default_dir="asc"):
+    """Returns the keyset_paginate keyword arguments for paginate_listing"""
+    sort = args.get("sort") if args.get("sort") in sorts else default_sort
+    descending = args.get("dir", default_dir) == "desc"
+    try:
+        per_page = int(args.get("per_page", app.config["PER_PAGE"]))
+    except ValueError:
+        per_page = app.config["PER_PAGE"]
+    per_page = min(max(per_page, 1), app.config["MAX_PER_PAGE"])
+
+    return {
+        "sort_attr": sorts[sort],
+        "pk_attr": pk_attr,
+        "after": args.get("after"),
+        "before": args.get("before"),
+        "per_page": per_page,
+        "descending": descending,
+    }
+
+
+@app.template_global()
+def url_with_args(**changes):
+    """
+    Returns the URL of the current page with its query arguments updated by
+    changes. Arguments set to None are removed.
+    """
+    args = request.args.to_dict()
+    args.update(changes)
+    args = {k: v for k, v in args.items() if v is not None}
+    return url_for(request.endpoint, **args)
+
+
+def summarize_pairs(pairs, names=None, limit=10):
+    """
+    Returns a single line describing a list of (user, key) pairs, e.g.
+    '"key1" to Mike, "key2" to Mike and 3 more'. Usernames are
+    replaced with their display name from names where available.
+    """
+    names = names or {}
+    items = [f'"{key}" to {names.get(user, user)}' for user, key in pairs[:limit]]
+    summary = ", ".join(items)
+    if len(pairs) > limit:
+        summary += f" and {len(pairs) - limit} more"
+    return summary
+
+
 def get_request_details(request):
     return f"{request.environ.get('HTTP_X_REAL_IP', request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr))} - {request.user_agent}"
 
@@ -105,6 +344,7 @@ def get_request_details(request):
 @app.route("/")
 @app.route("/index")
 @login_required
+@cached_page("assignments", "keys", "users", stream=True)
 def index():
     """
     Main home page
@@ -113,52 +353,26 @@ def index():
 
     sort_method = request.args.get("sort")
 
-    if sort_method == "by_user":
-        assignment_list = (
-            Assignment.query.filter_by(date_in=None)
-            .order_by(Assignment.user, Assignment.key)
-            .all()
-        )
-
-        data = {}
-        for assignment in assignment_list:
-            username = get_display_name(assignment.user)
-            if data.get(username):
-                data[username] += f", {assignment.key}"
-            else:
-                data[username] = str(assignment.key)
-        rows = [[k, v] for k, v in data.items()]
-
-        headings = ["User", "Assigned Keys"]
-
-        return render_template(
-            "index.html",
-            headings=headings,
-            rows=rows,
-        )
-
-    if sort_method == "by_key":
-        assignment_list = (
-            Assignment.query.filter_by(date_in=None)
-            .order_by(Assignment.key, Assignment.user)
-            .all()
-        )
-
-        data = {}
-        for assignment in assignment_list:
-            username = get_display_name(assignment.user)
-            if data.get(assignment.key):
-                data[assignment.key] += f", {username}"
-            else:
-                data[assignment.key] = str(username)
-        rows = [[k, v] for k, v in data.items()]
-
-        headings = ["Key", "Users Assigned"]
+    if sort_method in ("by_user", "by_key"):
+        by_user = sort_method == "by_user"
+        # Read before the rows, so a change committed in between is replayed
+        # by /events rather than missed
+        last_event_id = latest_event_id()
+        if app.config["STREAM_PAGES"]:
+            rows = iter_groups(stream_rows(open_assignments_statement(by_user)), by_user)
+        else:
+            rows = group_open_assignments(by_user)
+        if by_user:
+            headings = ["User", "Assigned Keys"]
+        else:
+            headings = ["Key", "Users Assigned"]
 
-        return render_template(
+        return render_listing(
             "index.html",
             headings=headings,
             rows=rows,
+            group="user" if by_user else "key",
+            last_event_id=last_event_id,
         )
 
     return redirect(url_for("index", sort="by_user"))
@@ -188,6 +402,8 @@ def login():
             )
             return redirect(url_for("login"))
 
+        # Saves the password hash if check_password upgraded it
+        db.session.commit()
         login_user(user)
         app.logger.info(
             f"Successful login for user {user.username} from {get_request_details(request)}"
@@ -202,10 +418,8 @@ def logout():
     """
     Logout page
     """
-    user_id = current_user.get_id()
-    user = User.query.filter_by(id=user_id).first()
     app.logger.info(
-        f"User {user.username} logged out. {get_request_details(request)}"
+        f"User {current_user.username} logged out. {get_request_details(request)}"
     )
     logout_user()
     return redirect(url_for("login"))
@@ -213,12 +427,18 @@ def logout():
 
 @app.route("/keys")
 @login_required
+@cached_page("keys", stream=True)
 def keys():
     """
     Key list page
     """
-    key_list = Key.query.all()
-    return render_template("keys.html", keys=key_list)
+    try:
+        page = listing_page(
+            project(Key, key_columns), key_sorts, Key.name, request.args, "name"
+        )
+    except ValueError:
+        return render_template("404.html"), 404
+    return render_listing("keys.html", keys=page, page=page)
 
 
 @app.route("/add_key", methods=["GET", "POST"])
@@ -236,7 +456,7 @@ def add_key():
     if form.validate_on_submit():
 
         if form.submit.data:
-            if Key.query.get(form.name.data):
+            if Key.query.filter_by(name=form.name.data).first():
                 flash(f'Key "{form.name.data}" already exists.', "danger")
             else:
                 key = Key(name=form.name.data, description=form.description.data)
@@ -270,6 +490,8 @@ def edit_key():
             return redirect(url_for("confirm_delete", item=key_name, model="key"))
 
         key.description = form.description.data
+        if key.status != form.status.data:
+            emit([("key_status", {"key": key.name, "status": form.status.data})])
         key.status = form.status.data
         db.session.commit()
         flash(f'Key "{key.name}" updated')
@@ -282,14 +504,25 @@ def edit_key():
 
 @app.route("/assignments", methods=["GET", "POST"])
 @login_required
+@cached_page("assignments", "users", stream=True)
 def assignments():
     """
-    List of key assignments.
+    List of the live and archived key assignments.
     """
-    assignment_list = Assignment.query.all()
-    user_dict = get_user_dict()
-    return render_template(
-        "assignments.html", assignments=assignment_list, users=user_dict
+    try:
+        rows, sorts = assignment_listing(request.args)
+        page = listing_page(
+            db.session.query(rows), sorts, rows.c.id, request.args, "date_out", "desc"
+        )
+    except ValueError:
+        return render_template("404.html"), 404
+    if app.config["STREAM_PAGES"]:
+        # The users of a streamed page are not known before it is rendered
+        user_dict = get_user_dict()
+    else:
+        user_dict = get_user_dict(a.user for a in page)
+    return render_listing(
+        "assignments.html", assignments=page, users=user_dict, page=page
     )
 
 
@@ -306,21 +539,19 @@ def assign_key():
             return redirect(url_for("assignments"))
 
     if form.validate_on_submit():
-        for user in form.user.data:
-            for key in form.key.data:
-                # Check if key is currently assigned to user
-                if Assignment.query.filter_by(user=user, key=key, date_in=None).first():
-                    flash(
-                        f'Key "{key}" already assigned to {get_display_name(user)}',
-                        "danger",
-                    )
-                else:
-                    assignment = Assignment(
-                        user=user, key=key, date_out=form.date_out.data
-                    )
-                    db.session.add(assignment)
-                    flash(f'Key "{key}" assigned to {user}')
+        assigned, already_assigned = check_out_keys(
+            form.user.data, form.key.data, form.date_out.data
+        )
         db.session.commit()
+
+        names = get_user_dict(form.user.data)
+        if already_assigned:
+            flash(
+                "Already assigned: " + summarize_pairs(already_assigned, names),
+                "danger",
+            )
+        if assigned:
+            flash(f"Assigned {len(assigned)} key(s): " + summarize_pairs(assigned, names))
         return redirect(url_for("assignments"))
 
     return render_template("quick_form.html", form=form, title="Assign Key")
@@ -356,10 +587,28 @@ def edit_assignment():
                 url_for("confirm_delete", item=assignment_id, model="assignment")
             )
 
+        old_row = (
+            assignment.user,
+            assignment.key,
+            assignment.date_out,
+            assignment.date_in,
+        )
         assignment.user = form.user.data
         assignment.key = form.key.data
         assignment.date_out = form.date_out.data
         assignment.date_in = form.date_in.data
+        refresh_holdings([old_row[:2], (assignment.user, assignment.key)])
+        update_rollups(
+            removed=[old_row],
+            added=[
+                (
+                    assignment.user,
+                    assignment.key,
+                    assignment.date_out,
+                    assignment.date_in,
+                )
+            ],
+        )
         db.session.commit()
         flash("Assignment updated")
         return redirect(url_for("assignments"))
@@ -369,12 +618,18 @@ def edit_assignment():
 
 @app.route("/users")
 @login_required
+@cached_page("users")
 def users():
     """
     List of users.
     """
-    user_list = User.query.order_by(User.username).all()
-    return render_template("users.html", users=user_list)
+    try:
+        page = paginate_listing(
+            project(User, user_columns), user_sorts, User.id, request.args, "username"
+        )
+    except ValueError:
+        return render_template("404.html"), 404
+    return render_template("users.html", users=page, page=page)
 
 
 @app.route("/add_user", methods=["GET", "POST"])
@@ -430,10 +685,14 @@ def edit_user():
         if form.delete.data:
             return redirect(url_for("confirm_delete", item=user_id, model="user"))
 
+        old_username = user.username
         user.username = form.username.data
         user.email = form.email.data
         user.display_name = form.display_name.data
         user.can_login = form.can_login.data
+        if user.username != old_username:
+            rename_user(user, old_username)
+            emit([("reload", {})])
         db.session.commit()
         flash(f'User "{user.username}" updated.')
         return redirect(url_for("users"))
@@ -452,7 +711,10 @@ def confirm_delete():
     model_name = request.args.get("model")
     item_name = request.args.get("item")
     model = types.get(model_name)
-    item = model.query.get(item_name)
+    if model is Key:
+        item = Key.query.filter_by(name=item_name).first()
+    else:
+        item = model.query.get(item_name)
     if model_name == "user":
         item_name = item.display_name if item.display_name else item.username
 
@@ -463,7 +725,7 @@ def confirm_delete():
         if form.yes.data:
             if model_name == "key":
                 # Check if key is currently assigned to users
-                if Assignment.query.filter_by(date_in=None, key=item_name).all():
+                if Holding.query.filter_by(key=item_name).first():
                     flash(
                         f'Key "{item_name}" is still checked out to users and cannot be deleted.',
                         "danger",
@@ -475,7 +737,7 @@ def confirm_delete():
 
             elif model_name == "user":
                 # Check if user has any keys checked out
-                if Assignment.query.filter_by(date_in=None, user=item_name).all():
+                if Holding.query.filter_by(user=item.username).first():
                     flash(
                         f'User "{item_name}" still has keys checked out and cannot be deleted.',
                         "danger",
@@ -487,6 +749,10 @@ def confirm_delete():
             elif model_name == "assignment":
                 flash("Assignment deleted.")
                 db.session.delete(item)
+                refresh_holdings([(item.user, item.key)])
+                update_rollups(
+                    removed=[(item.user, item.key, item.date_out, item.date_in)]
+                )
                 db.session.commit()
 
             else:
@@ -0,0 +1,150 @@
+"""
+search provides prefix and substring search over keys and users for the
+typeahead widgets. On SQLite the search is backed by an FTS5 trigram index
+which is kept up to date by triggers on the keys and users tables. Other
+backends fall back to LIKE queries.
+"""
+
+from flask import jsonify, request
+from flask_login import login_required
+from sqlalchemy import DDL, event, or_, text
+
+from app import app, db
+from app.models import Key, User
+
+# Trigram queries need at least this many characters
+MIN_TRIGRAM_LENGTH = 3
+
+# The ident column is UNINDEXED, so updating or deleting a row scans the
+# index. Keys and users are edited rarely enough for this not to matter.
+search_ddl = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ident UNINDEXED, label, detail, tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ai AFTER INSERT ON keys BEGIN
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_au
+    AFTER UPDATE OF name, description ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ad AFTER DELETE ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('user', new.username, new.username, coalesce(new.display_name, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_au
+    AFTER UPDATE OF username, display_name ON users BEGIN
+        DELETE FROM search_index WHERE kind = 'user' AND ident = old.username;
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('user', new.username, new.username, coalesce(new.display_name, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM search_index WHERE kind = 'user' AND ident = old.username;
+    END""",
+]
+
+for statement in search_ddl:
+    event.listen(
+        db.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    db.metadata,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS search_index").execute_if(dialect="sqlite"),
+)
+
+
+def use_fts(query):
+    return db.engine.dialect.name == "sqlite" and len(query) >= MIN_TRIGRAM_LENGTH
+
+
+def fts_search(kind, query, limit, join=""):
+    """
+    Returns (ident, label, detail) rows of kind matching query in the
+    trigram index. Prefix matches of the label are listed first.
+    """
+    match = '{label detail}: "' + query.replace('"', '""') + '"'
+    return db.session.execute(
+        text(
+            f"""SELECT s.ident, s.label, s.detail FROM search_index s {join}
+            WHERE search_index MATCH :match AND s.kind = :kind
+            ORDER BY s.label LIKE :prefix ESCAPE '\\' DESC, rank
+            LIMIT :limit"""
+        ),
+        {"match": match, "kind": kind, "prefix": f"{escape_like(query)}%", "limit": limit},
+    ).fetchall()
+
+
+def escape_like(query):
+    """Escapes the LIKE wildcards in query with backslashes"""
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def like_filter(columns, query):
+    """Prefix search for short queries and substring search otherwise"""
+    pattern = escape_like(query)
+    pattern = f"{pattern}%" if len(query) < MIN_TRIGRAM_LENGTH else f"%{pattern}%"
+    return or_(*[column.ilike(pattern, escape="\\") for column in columns])
+
+
+def search_keys(query, limit=20):
+    """Returns (name, name) choices for active keys matching query"""
+    if use_fts(query):
+        rows = fts_search(
+            "key",
+            query,
+            limit,
+            join="JOIN keys k ON k.name = s.ident AND k.status = 'Active'",
+        )
+        return [(name, name) for name, _, _ in rows]
+    rows = (
+        db.session.query(Key.name)
+        .filter(Key.status == "Active")
+        .filter(like_filter((Key.name, Key.description), query))
+        .order_by(Key.name)
+        .limit(limit)
+    )
+    return [(name, name) for (name,) in rows]
+
+
+def search_users(query, limit=20):
+    """Returns (username, display name) choices for users matching query"""
+    if use_fts(query):
+        rows = fts_search("user", query, limit)
+        return [(username, display or username) for username, _, display in rows]
+    rows = (
+        db.session.query(User.username, User.display_name)
+        .filter(like_filter((User.username, User.display_name), query))
+        .order_by(User.username)
+        .limit(limit)
+    )
+    return [(username, display or username) for username, display in rows]
+
+
+searches = {"keys": search_keys, "users": search_users}
+
+
+@app.route("/search")
+@login_required
+def search():
+    """
+    Typeahead search. Takes the type ("keys" or "users") and q arguments and
+    returns {"results": [{"value": ..., "label": ...}, ...]}.
+    """
+    query = request.args.get("q", "").strip()
+    search_type = request.args.get("type")
+    if search_type not in searches:
+        return jsonify({"error": "type must be one of 'keys' or 'users'"}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 20)), 1), 100)
+    except ValueError:
+        limit = 20
+
+    results = searches[search_type](query, limit) if query else []
+    return jsonify({"results": [{"value": v, "label": l} for v, l in results]})
@@ -0,0 +1,81 @@
+// Patches the rows of the index table from the /events stream, so the
+// dashboard stays current without reloading. Each row holds its items as
+// {id: label} in data-items; an event adds or removes one item and the row
+// is re-rendered, added or removed in sorted position.
+(function () {
+    var table = document.querySelector("table[data-events-url]");
+    if (!table || !window.EventSource) {
+        return;
+    }
+    var byUser = table.dataset.group === "user";
+    var body = table.tBodies[0];
+
+    function findRow(id) {
+        return Array.prototype.find.call(body.rows, function (row) {
+            return row.dataset.id === id;
+        });
+    }
+
+    function render(row, items) {
+        var ids = Object.keys(items).sort();
+        if (ids.length === 0) {
+            row.remove();
+            return;
+        }
+        row.dataset.items = JSON.stringify(items);
+        row.cells[1].textContent = ids.map(function (id) {
+            return items[id];
+        }).join(", ");
+    }
+
+    function insertRow(id, label) {
+        var row = document.createElement("tr");
+        row.dataset.id = id;
+        row.dataset.items = "{}";
+        row.insertCell().textContent = label;
+        row.insertCell();
+        var next = Array.prototype.find.call(body.rows, function (r) {
+            return r.dataset.id > id;
+        });
+        body.insertBefore(row, next || null);
+        return row;
+    }
+
+    function update(data, add) {
+        var group = byUser ? data.user : data.key;
+        var item = byUser ? data.key : data.user;
+        var row = findRow(group);
+        if (!row) {
+            if (!add) {
+                return;
+            }
+            row = insertRow(group, byUser ? data.name : data.key);
+        }
+        var items = JSON.parse(row.dataset.items);
+        if (add) {
+            items[item] = byUser ? data.key : data.name;
+        } else {
+            delete items[item];
+        }
+        render(row, items);
+    }
+
+    var source = new EventSource(table.dataset.eventsUrl);
+    source.addEventListener("checkout", function (e) {
+        update(JSON.parse(e.data), true);
+    });
+    source.addEventListener("checkin", function (e) {
+        update(JSON.parse(e.data), false);
+    });
+    source.addEventListener("key_status", function (e) {
+        var data = JSON.parse(e.data);
+        var row = !byUser && findRow(data.key);
+        if (row) {
+            row.classList.toggle("text-muted", data.status === "Inactive");
+        }
+    });
+    source.addEventListener("reload", function () {
+        source.close();
+        location.reload();
+    });
+})();
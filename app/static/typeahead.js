@@ -0,0 +1,78 @@
+// Turns every <select data-search="users|keys"> into a typeahead. The select
+// only holds the selected options; matches are fetched from /search as the
+// user types and added to the select when picked.
+(function () {
+    var searchUrl = document.currentScript.dataset.searchUrl;
+
+    function typeahead(select) {
+        var input = document.createElement("input");
+        input.type = "text";
+        input.className = "form-control mb-1";
+        input.placeholder = "Search...";
+        input.autocomplete = "off";
+
+        var results = document.createElement("div");
+        results.className = "list-group position-absolute w-100";
+        results.style.zIndex = 1000;
+
+        var wrapper = document.createElement("div");
+        wrapper.className = "position-relative";
+        select.parentNode.insertBefore(wrapper, select);
+        wrapper.appendChild(input);
+        wrapper.appendChild(results);
+        if (!select.multiple && select.options.length === 0) {
+            select.appendChild(new Option("", ""));
+        }
+
+        function pick(value, label) {
+            var option = Array.prototype.find.call(select.options, function (o) {
+                return o.value === value;
+            });
+            if (!option) {
+                if (!select.multiple) {
+                    select.innerHTML = "";
+                }
+                option = new Option(label, value);
+                select.appendChild(option);
+            }
+            option.selected = true;
+            input.value = "";
+            results.innerHTML = "";
+        }
+
+        var timer = null;
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            var query = input.value.trim();
+            if (!query) {
+                results.innerHTML = "";
+                return;
+            }
+            timer = setTimeout(function () {
+                var url = searchUrl + "?type=" + select.dataset.search +
+                    "&q=" + encodeURIComponent(query);
+                fetch(url, { credentials: "same-origin" })
+                    .then(function (response) { return response.json(); })
+                    .then(function (data) {
+                        if (input.value.trim() !== query) {
+                            return;
+                        }
+                        results.innerHTML = "";
+                        data.results.forEach(function (result) {
+                            var item = document.createElement("button");
+                            item.type = "button";
+                            item.className = "list-group-item list-group-item-action list-group-item-dark";
+                            item.textContent = result.label === result.value ?
+                                result.value : result.label + " (" + result.value + ")";
+                            item.addEventListener("click", function () {
+                                pick(result.value, result.label);
+                            });
+                            results.appendChild(item);
+                        });
+                    });
+            }, 200);
+        });
+    }
+
+    document.querySelectorAll("select[data-search]").forEach(typeahead);
+})();
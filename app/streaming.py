@@ -0,0 +1,54 @@
+"""
+streaming renders the listing pages as they are sent rather than building
+the whole page in memory first. The rows are read from the database in
+batches while the template renders them, and the output is sent in chunks
+of STREAM_CHUNK_SIZE characters, starting with the document head.
+"""
+
+from flask import Response, stream_with_context
+
+from app import app, db
+
+
+def stream_template(template_name, **context):
+    """
+    Returns a response which renders the given template as it is sent.
+    Flask 2.0 does not have flask.stream_template, so this does the same.
+    """
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    chunks = chunked(template.generate(context), app.config["STREAM_CHUNK_SIZE"])
+    return Response(stream_with_context(chunks))
+
+
+def chunked(texts, size):
+    """
+    Joins texts into chunks of at least size characters. The first text,
+    which holds the page's head, is sent on its own so the browser can start
+    loading the stylesheets before the rows are read.
+    """
+    texts = iter(texts)
+    yield next(texts, "")
+    buffer = []
+    buffered = 0
+    for text in texts:
+        buffer.append(text)
+        buffered += len(text)
+        if buffered >= size:
+            yield "".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_rows(statement):
+    """
+    Returns the rows of statement fetched STREAM_BATCH_SIZE at a time from a
+    server side cursor where the database has one
+    """
+    return db.session.execute(
+        statement.execution_options(
+            stream_results=True, max_row_buffer=app.config["STREAM_BATCH_SIZE"]
+        )
+    )
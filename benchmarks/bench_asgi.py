@@ -0,0 +1,147 @@
+"""
+Compares the listing page throughput of the gunicorn sync workers with the
+ASGI entry point under uvicorn, with and without slow exports running at the
+same time. Both servers run 4 workers on the same seeded SQLite database.
+
+Usage: python -m benchmarks.bench_asgi [concurrency] [requests]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + db_file
+# Keeps the servers from logging every request of the load as slow
+os.environ["SLOW_REQUEST_THRESHOLD"] = "60"
+
+from flask import session
+from flask_login import login_user
+
+from app import app, db
+from app.models import User
+from benchmarks.seed import seed_database
+
+ADDRESS = "127.0.0.1:8765"
+USER_AGENT = "bench-asgi"
+WORKERS = "4"
+
+servers = {
+    "gunicorn sync": ["gunicorn", "--workers", WORKERS, "--bind", ADDRESS, "keymaster:app"],
+    "uvicorn asgi": [
+        "uvicorn",
+        "--workers",
+        WORKERS,
+        "--host",
+        ADDRESS.split(":")[0],
+        "--port",
+        ADDRESS.split(":")[1],
+        "--log-level",
+        "warning",
+        "keymaster_asgi:application",
+    ],
+}
+
+paths = [
+    "/index?sort=by_user",
+    "/index?sort=by_key",
+    "/assignments",
+    "/assignments?status=open&sort=user",
+    "/keys",
+    "/users",
+]
+
+
+def session_cookie():
+    """Returns a session cookie logged in as the seeded admin user"""
+    with app.test_request_context(
+        headers={"User-Agent": USER_AGENT}, environ_base={"REMOTE_ADDR": "127.0.0.1"}
+    ):
+        login_user(User.query.filter_by(username="admin").first())
+        value = app.session_interface.get_signing_serializer(app).dumps(dict(session))
+    return f"{app.config.get('SESSION_COOKIE_NAME', 'session')}={value}"
+
+
+def get(path, cookie):
+    request = urllib.request.Request(
+        f"http://{ADDRESS}{path}", headers={"Cookie": cookie, "User-Agent": USER_AGENT}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+        assert response.status == 200, path
+    return time.perf_counter() - start
+
+
+def wait_for_server(cookie):
+    for _ in range(100):
+        try:
+            get("/keys", cookie)
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start.")
+
+
+def export_loop(stop, cookie):
+    while not stop.is_set():
+        get("/export/assignments.csv", cookie)
+
+
+def run_load(cookie, concurrency, n_requests, exports):
+    stop = threading.Event()
+    exporters = [
+        threading.Thread(target=export_loop, args=(stop, cookie)) for _ in range(exports)
+    ]
+    for exporter in exporters:
+        exporter.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        timings = list(
+            executor.map(lambda i: get(paths[i % len(paths)], cookie), range(n_requests))
+        )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for exporter in exporters:
+        exporter.join()
+    percentiles = statistics.quantiles(timings, n=100)
+    return n_requests / elapsed, percentiles[49] * 1000, percentiles[94] * 1000
+
+
+def main(concurrency, n_requests):
+    with app.app_context():
+        db.create_all()
+        seed_database(n_users=1000, n_keys=5000, n_assignments=200000)
+        admin = User(username="admin", can_login=True)
+        admin.set_password("admin")
+        db.session.add(admin)
+        db.session.commit()
+        cookie = session_cookie()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{concurrency} concurrent clients, {n_requests} requests")
+    print(f"{'server':<16}{'exports':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, command in servers.items():
+        server = subprocess.Popen(command, cwd=root, env=os.environ.copy())
+        try:
+            wait_for_server(cookie)
+            for exports in (0, 4):
+                rate, p50, p95 = run_load(cookie, concurrency, n_requests, exports)
+                print(f"{name:<16}{exports:>8}{rate:>10.1f}{p50:>10.1f}{p95:>10.1f}")
+        finally:
+            server.terminate()
+            server.wait()
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 32,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000,
+    )
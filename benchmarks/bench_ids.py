@@ -0,0 +1,157 @@
+"""
+Compares the assignment indexes and joins on the user and key names with
+the ones on the integer user_id and key_id columns, on a seeded SQLite
+database. Reports the size of each set of indexes and times the index
+dashboard and history queries both ways.
+
+Usage: python -m benchmarks.bench_ids [n_assignments]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + db_file
+
+from sqlalchemy import bindparam, select, text
+
+from app import app, db
+from app.history import overlapping
+from app.ids import key_id_of, user_id_of
+from app.models import Assignment, Holding, Key, User
+from benchmarks.seed import seed_database
+
+N_USERS = 1000
+N_KEYS = 5000
+REPEAT = 20
+
+# The name indexes the id indexes replaced. They are created with DDL, as an
+# Index on the model's columns would be added to the table's own indexes.
+name_indexes = {
+    "ix_bench_key_date_in": '"key", date_in',
+    "ix_bench_user_date_in": '"user", date_in',
+    "ix_bench_key_period": '"key", date_out, date_in',
+    "ix_bench_user_period": '"user", date_out, date_in',
+}
+id_indexes = [
+    index for index in Assignment.__table__.indexes if index.name != "ix_assignments_open"
+]
+
+
+def create_name_indexes():
+    for name, columns in name_indexes.items():
+        db.session.execute(text(f"CREATE INDEX {name} ON assignments ({columns})"))
+
+
+def drop_name_indexes():
+    for name in name_indexes:
+        db.session.execute(text(f"DROP INDEX {name}"))
+
+
+def index_size(indexes):
+    """Returns the size in bytes of the indexes of the given names"""
+    return db.session.execute(
+        text("SELECT SUM(pgsize) FROM dbstat WHERE name IN :names").bindparams(
+            db.bindparam("names", expanding=True)
+        ),
+        {"names": list(indexes)},
+    ).scalar()
+
+
+def dashboard(by_ids):
+    if by_ids:
+        joins = (User.id == Holding.user_id, Key.id == Holding.key_id)
+    else:
+        joins = (User.username == Holding.user, Key.name == Holding.key)
+    statement = (
+        select(Holding.user, Holding.key, User.display_name, Key.status)
+        .outerjoin(User, joins[0])
+        .outerjoin(Key, joins[1])
+        .order_by(Holding.user, Holding.key)
+    )
+    return db.session.execute(statement).all()
+
+
+def history(by_ids, keys, users):
+    """
+    Runs the history lookups of app.history for keys and users. The same
+    columns are read both ways, and the statements are built once, so only
+    the index lookups differ.
+    """
+    columns = (Assignment.id, Assignment.user, Assignment.key, Assignment.date_out)
+    if by_ids:
+        by_key = Assignment.key_id == key_id_of(bindparam("key"))
+        by_user = Assignment.user_id == user_id_of(bindparam("user"))
+    else:
+        by_key = Assignment.key == bindparam("key")
+        by_user = Assignment.user == bindparam("user")
+    when = date(2015, 6, 1)
+    holders = select(*columns).where(by_key, *overlapping(when, when))
+    held = select(*columns).where(
+        by_user, *overlapping(date(2014, 1, 1), date(2014, 12, 31))
+    )
+    for key in keys:
+        db.session.execute(holders, {"key": key}).all()
+    for user in users:
+        db.session.execute(held, {"user": user}).all()
+
+
+def timed(f, *args):
+    """Returns the best of REPEAT runs in ms, the least disturbed by other load"""
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        f(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main(n_assignments):
+    rng = random.Random(0)
+    keys = [f"key{rng.randrange(N_KEYS)}" for _ in range(200)]
+    users = [f"user{rng.randrange(N_USERS)}" for _ in range(50)]
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed_database(n_users=N_USERS, n_keys=N_KEYS, n_assignments=n_assignments)
+        print(f"Seeded {n_assignments} assignments in {time.perf_counter() - start:.1f}s")
+
+        # The id indexes were filled in by the backfill, so they are rebuilt
+        # to be as compact as the freshly made name indexes
+        for index in id_indexes:
+            index.drop(db.engine)
+        create_name_indexes()
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        results = {
+            "names": (
+                index_size(name_indexes),
+                timed(dashboard, False),
+                timed(history, False, keys, users),
+            )
+        }
+        drop_name_indexes()
+        for index in id_indexes:
+            index.create(db.engine)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        results["ids"] = (
+            index_size(index.name for index in id_indexes),
+            timed(dashboard, True),
+            timed(history, True, keys, users),
+        )
+
+    print(f"{'columns':<10}{'indexes (MiB)':>16}{'dashboard (ms)':>16}{'history (ms)':>16}")
+    for name, (size, dashboard_ms, history_ms) in results.items():
+        size /= 1024 * 1024
+        print(f"{name:<10}{size:>16.1f}{dashboard_ms:>16.2f}{history_ms:>16.2f}")
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,83 @@
+"""
+Times the hot assignment queries on a seeded SQLite database before and
+after the assignment indexes are created. The listings, filters and history
+look assignments up by user_id and key_id, through the ix_assignments_*_id_*
+indexes, and check-outs look for an open (user, key) pair through
+ix_assignments_open.
+
+Usage: python -m benchmarks.bench_indexes [n_assignments]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + db_file
+
+from sqlalchemy import text
+
+from app import app, db
+from app.history import holders_at, keys_held
+from app.ids import key_id_of, user_id_of
+from app.models import Assignment
+from app.routes import group_open_assignments
+from benchmarks.seed import seed_database
+
+REPEAT = 20
+
+queries = {
+    "open assignments for a user": lambda: Assignment.query.filter(
+        Assignment.user_id == user_id_of("user7"), Assignment.date_in.is_(None)
+    ).all(),
+    "open assignments for a key": lambda: Assignment.query.filter(
+        Assignment.key_id == key_id_of("key42"), Assignment.date_in.is_(None)
+    ).all(),
+    "holders of a key on a date": lambda: holders_at("key42", date(2015, 1, 1)),
+    "keys held by a user in 2015": lambda: keys_held(
+        "user7", date(2015, 1, 1), date(2015, 12, 31)
+    ),
+    "user/key pair is open": lambda: Assignment.query.filter_by(
+        user="user7", key="key42", date_in=None
+    ).first(),
+    "index dashboard (by_user)": lambda: group_open_assignments(by_user=True),
+}
+
+
+def time_queries():
+    results = {}
+    for name, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            query()
+        results[name] = (time.perf_counter() - start) / REPEAT * 1000
+    return results
+
+
+def main(n_assignments):
+    with app.app_context():
+        db.create_all()
+        indexes = list(Assignment.__table__.indexes)
+        for index in indexes:
+            index.drop(db.engine)
+
+        start = time.perf_counter()
+        seed_database(n_assignments=n_assignments)
+        print(f"Seeded {n_assignments} assignments in {time.perf_counter() - start:.1f}s")
+
+        before = time_queries()
+        for index in indexes:
+            index.create(db.engine)
+        db.session.execute(text("ANALYZE"))
+        after = time_queries()
+
+    print(f"{'query':<32}{'before (ms)':>14}{'after (ms)':>14}")
+    for name in queries:
+        print(f"{name:<32}{before[name]:>14.2f}{after[name]:>14.2f}")
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,110 @@
+"""
+Measures login throughput under a burst of concurrent logins for each
+password hash method, and the latency of a page requested by another client
+during the burst.
+
+Usage: python -m benchmarks.bench_login [concurrency] [logins]
+"""
+
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + db_file
+
+from app import app, db, passwords
+from app.models import User
+from benchmarks.seed import seed_database
+
+N_USERS = 50
+
+methods = ["pbkdf2", "scrypt"]
+try:
+    import argon2  # noqa: F401
+
+    methods.append("argon2")
+except ImportError:
+    pass
+
+
+def login(i):
+    with app.test_client() as client:
+        start = time.perf_counter()
+        resp = client.post(
+            "/api/v1/tokens",
+            json={"username": f"login{i % N_USERS}", "password": "secret"},
+        )
+        return resp.status_code, time.perf_counter() - start
+
+
+def browse(stop, timings):
+    with app.test_client() as client:
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get("/keys")
+            timings.append(time.perf_counter() - start)
+
+
+def burst(concurrency, logins):
+    stop, page_timings = threading.Event(), []
+    browser = threading.Thread(target=browse, args=(stop, page_timings))
+    browser.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    browser.join()
+
+    ok = sorted(t for status, t in results if status == 200)
+    busy = sum(1 for status, _ in results if status == 503)
+    return {
+        "rate": len(ok) / elapsed,
+        "p95": statistics.quantiles(ok, n=20)[18] * 1000 if len(ok) > 1 else 0,
+        "busy": busy,
+        "page_p95": statistics.quantiles(page_timings, n=20)[18] * 1000
+        if len(page_timings) > 1
+        else 0,
+    }
+
+
+def main(concurrency, logins):
+    app.config.update(TESTING=True, LOGIN_DISABLED=True)
+    # Every burst login is a slow request
+    app.logger.setLevel(logging.ERROR)
+    with app.app_context():
+        db.create_all()
+        seed_database(n_users=100, n_keys=1000, n_assignments=10000)
+
+        print(f"{concurrency} concurrent clients, {logins} logins, "
+              f"{app.config['PASSWORD_HASH_WORKERS']} hashing threads")
+        print(f"{'method':<10}{'logins/s':>10}{'p95 ms':>10}{'503s':>8}{'/keys p95 ms':>14}")
+        for method in methods:
+            app.config["PASSWORD_HASH_METHOD"] = method
+            hashed = passwords.hash_password("secret")
+            db.session.query(User).filter(User.username.like("login%")).delete(
+                synchronize_session=False
+            )
+            db.session.add_all(
+                User(username=f"login{i}", password_hash=hashed, can_login=True)
+                for i in range(N_USERS)
+            )
+            db.session.commit()
+
+            result = burst(concurrency, logins)
+            print(f"{method:<10}{result['rate']:>10.1f}{result['p95']:>10.1f}"
+                  f"{result['busy']:>8}{result['page_p95']:>14.1f}")
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
@@ -0,0 +1,48 @@
+"""Benchmarks of each route in app/routes.py through the Flask test client"""
+
+import pytest
+
+get_routes = [
+    "/index?sort=by_user",
+    "/index?sort=by_key",
+    "/login",
+    "/keys",
+    "/keys?sort=description&dir=desc",
+    "/add_key",
+    "/edit_key?name=key1",
+    "/assignments",
+    "/assignments?status=open&sort=user",
+    "/assignments?user=user1&date_from=2011-01-01",
+    "/assign_key",
+    "/edit_assignment?id=1",
+    "/users",
+    "/add_user",
+    "/edit_user?id=1",
+    "/confirm_delete?model=key&item=key1",
+    "/search?type=keys&q=key12",
+    "/search?type=users&q=User 1",
+]
+
+
+@pytest.mark.parametrize("cache", ["cold", "warm"])
+@pytest.mark.parametrize("url", get_routes)
+def test_get(bench_client, measure, url, cache):
+    measure(f"GET {url} ({cache})", lambda: bench_client.get(url), cold=cache == "cold")
+
+
+def test_next_page(bench_client, measure):
+    from app.models import Assignment
+    from app.pagination import keyset_paginate
+
+    page = keyset_paginate(Assignment.query, Assignment.date_out, Assignment.id, per_page=50)
+    url = f"/assignments?sort=date_out&after={page.next_cursor}"
+    measure("GET /assignments (page 2)", lambda: bench_client.get(url), cold=True)
+
+
+def test_assign_key(bench_client, measure):
+    data = {
+        "user": [f"user{u}" for u in range(5)],
+        "key": [f"key{k}" for k in range(10)],
+        "date_out": "2030-01-01",
+    }
+    measure("POST /assign_key (5x10)", lambda: bench_client.post("/assign_key", data=data))
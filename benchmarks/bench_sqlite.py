@@ -0,0 +1,110 @@
+"""
+Runs a mixed read and write load from several worker processes against a
+SQLite database, first without the SQLITE_* pragmas (SQLite's defaults) and
+then with them, and reports the throughput and "database is locked" errors.
+
+Usage: python -m benchmarks.bench_sqlite [workers] [seconds] [write_ratio]
+"""
+
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(db_dir, "bench.db")
+# Keeps the workers from logging every request of the load as slow
+os.environ["SLOW_REQUEST_THRESHOLD"] = "60"
+
+from sqlalchemy.exc import OperationalError
+
+from app import app, db
+from app.database import sqlite_pragmas
+from benchmarks.seed import seed_database
+
+N_USERS = 200
+N_KEYS = 2000
+
+read_paths = [
+    "/index?sort=by_user",
+    "/assignments",
+    "/assignments?status=open&sort=user",
+    "/keys",
+    "/users",
+]
+
+
+def worker(index, seconds, write_ratio, results):
+    # The forked engine's connections belong to the parent
+    db.engine.dispose()
+    client = app.test_client()
+    rng = random.Random(index)
+    reads = writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        try:
+            if rng.random() < write_ratio:
+                client.post(
+                    "/assign_key",
+                    data={
+                        "user": [f"user{rng.randrange(N_USERS)}"],
+                        "key": [f"key{rng.randrange(N_KEYS)}"],
+                        "date_out": "2030-01-01",
+                    },
+                )
+                writes += 1
+            else:
+                client.get(rng.choice(read_paths))
+                reads += 1
+        except OperationalError:
+            errors += 1
+    results.put((reads, writes, errors))
+
+
+def run(name, n_workers, seconds, write_ratio):
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(
+        db_dir, f"{name}.db"
+    )
+    with app.app_context():
+        db.create_all()
+        seed_database(n_users=N_USERS, n_keys=N_KEYS, n_assignments=50000)
+        db.engine.dispose()
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(i, seconds, write_ratio, results))
+        for i in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [sum(values) for values in zip(*(results.get() for _ in processes))]
+    for process in processes:
+        process.join()
+    reads, writes, errors = totals
+    print(
+        f"{name:<10}{reads / seconds:>10.1f}{writes / seconds:>10.1f}"
+        f"{(reads + writes) / seconds:>10.1f}{errors:>10}"
+    )
+
+
+def main(n_workers, seconds, write_ratio):
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, LOGIN_DISABLED=True)
+    tuned = {setting: app.config[setting] for setting in sqlite_pragmas.values()}
+
+    print(f"{n_workers} workers, {seconds}s, {write_ratio:.0%} writes")
+    print(f"{'pragmas':<10}{'reads/s':>10}{'writes/s':>10}{'total/s':>10}{'locked':>10}")
+    app.config.update({setting: None for setting in tuned})
+    run("default", n_workers, seconds, write_ratio)
+    app.config.update(tuned)
+    run("tuned", n_workers, seconds, write_ratio)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.2,
+    )
@@ -0,0 +1,144 @@
+"""
+Measures how long the app takes to start. Reports the import time of
+keymaster from `python -X importtime` with the heaviest imports of the app
+package, then starts gunicorn with and without preload_app (see
+gunicorn.conf.py) and reports the time until it first answers and the
+resident (RSS) and proportional (PSS, which splits the pages shared with the
+master and the other workers) memory of each worker. The memory is read from
+/proc, so that part only runs on Linux.
+
+Usage: python -m benchmarks.bench_startup [workers]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+db_file = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = "sqlite:///" + db_file
+
+from app import app, db
+
+ADDRESS = "127.0.0.1:8766"
+REPEAT = 5
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times():
+    """
+    Returns the cumulative import time of keymaster and the {module: time}
+    of the modules the app package imports directly, in µs, from the
+    fastest of REPEAT runs
+    """
+    best = None
+    for _ in range(REPEAT):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import keymaster"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Each module is listed after the modules it imports, indented by
+        # two spaces more
+        pending = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cumulative, name = line.split("|")
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            if depth == 2:
+                pending[name.strip()] = int(cumulative)
+            elif depth == 1:
+                if name.strip() == "app":
+                    imports = pending
+                pending = {}
+            elif name.strip() == "keymaster":
+                total = int(cumulative)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    return best
+
+
+def memory(pid):
+    """Returns the (RSS, PSS) of the process in MiB"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss"):
+                values[name] = int(value.split()[0]) / 1024
+    return values["Rss"], values["Pss"]
+
+
+def worker_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run_gunicorn(workers, preload):
+    env = dict(os.environ, GUNICORN_PRELOAD="true" if preload else "false")
+    command = [
+        "gunicorn",
+        "--workers",
+        str(workers),
+        "--bind",
+        ADDRESS,
+        "--log-level",
+        "warning",
+        "keymaster:app",
+    ]
+    start = time.perf_counter()
+    server = subprocess.Popen(command, cwd=root, env=env)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://{ADDRESS}/login") as response:
+                    response.read()
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("The server did not start.")
+                time.sleep(0.01)
+        ready = time.perf_counter() - start
+        # Every worker serves some requests before it is measured
+        for _ in range(workers * 20):
+            with urllib.request.urlopen(f"http://{ADDRESS}/login") as response:
+                response.read()
+        usage = [memory(pid) for pid in worker_pids(server.pid)]
+        return ready, usage
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(workers):
+    with app.app_context():
+        db.create_all()
+
+    total, imports = import_times()
+    print(f"import keymaster: {total / 1000:.1f} ms")
+    for name in sorted(imports, key=imports.get, reverse=True)[:10]:
+        print(f"  {name:<24}{imports[name] / 1000:>8.1f} ms")
+
+    print(f"\ngunicorn, {workers} workers")
+    print(
+        f"{'preload_app':<14}{'ready (s)':>10}{'RSS/worker':>12}{'PSS/worker':>12}"
+        f"{'PSS total':>12}"
+    )
+    for preload in (False, True):
+        ready, usage = run_gunicorn(workers, preload)
+        rss = sum(r for r, p in usage) / len(usage)
+        pss = sum(p for r, p in usage)
+        print(
+            f"{str(preload):<14}{ready:>10.2f}{rss:>10.1f}MB{pss / len(usage):>10.1f}MB"
+            f"{pss:>10.1f}MB"
+        )
+    os.remove(db_file)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,113 @@
+"""
+Fixtures for the route benchmarks in bench_routes.py. Run them with
+
+    python -m pytest benchmarks/bench_routes.py
+
+The dataset size is set with the BENCH_USERS, BENCH_KEYS and
+BENCH_ASSIGNMENTS environment variables.
+"""
+
+import os
+import resource
+import statistics
+
+import pytest
+
+results = []
+
+
+@pytest.fixture(scope="session")
+def bench_app(tmp_path_factory):
+    # The app is only imported here so that collecting this directory does
+    # not create it with the wrong database for the unit tests
+    from app import app, db
+    from benchmarks.seed import seed_database
+
+    db_file = tmp_path_factory.mktemp("bench") / "bench.db"
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_file}",
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        LOGIN_DISABLED=True,
+    )
+    with app.app_context():
+        db.create_all()
+        seed_database(
+            n_users=int(os.environ.get("BENCH_USERS", 1000)),
+            n_keys=int(os.environ.get("BENCH_KEYS", 10000)),
+            n_assignments=int(os.environ.get("BENCH_ASSIGNMENTS", 200000)),
+        )
+        yield app
+
+
+@pytest.fixture
+def bench_client(bench_app):
+    return bench_app.test_client()
+
+
+@pytest.fixture
+def measure(benchmark, bench_app):
+    """
+    Benchmarks a callable returning a response and records its latency
+    percentiles, the number of SQL statements it runs and the peak RSS of
+    the process. With cold=True the page and query caches are cleared
+    before every round, otherwise every round after a first untimed request
+    is served from them.
+    """
+    from sqlalchemy import event
+
+    from app import db
+    from app.cache import cache, page_cache
+
+    def clear_caches():
+        cache.clear()
+        page_cache.clear()
+
+    def run(name, request, cold=False):
+        statements = []
+
+        def count(*args):
+            statements.append(args[2])
+
+        clear_caches()
+        if not cold:
+            request()
+        event.listen(db.engine, "before_cursor_execute", count)
+        response = request()
+        event.remove(db.engine, "before_cursor_execute", count)
+        assert response.status_code < 400, response.status
+
+        benchmark.pedantic(
+            request,
+            setup=clear_caches if cold else None,
+            rounds=int(os.environ.get("BENCH_ROUNDS", 50)),
+        )
+        timings = sorted(benchmark.stats.stats.data)
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        result = {
+            "name": name,
+            "p50": percentiles[49] * 1000,
+            "p95": percentiles[94] * 1000,
+            "p99": percentiles[98] * 1000,
+            "queries": len(statements),
+            "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+        benchmark.extra_info.update(result)
+        results.append(result)
+
+    return run
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    terminalreporter.section("route latency")
+    terminalreporter.write_line(
+        f"{'route':<52}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        f"{'queries':>10}{'peak RSS MB':>14}"
+    )
+    for r in results:
+        terminalreporter.write_line(
+            f"{r['name']:<52}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}"
+            f"{r['queries']:>10}{r['peak_rss']:>14.1f}"
+        )
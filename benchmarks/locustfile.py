@@ -0,0 +1,69 @@
+"""
+A locust load test scenario against a running instance, e.g.
+
+    python -m benchmarks.seed --admin-password admin
+    gunicorn --workers 4 keymaster:app
+    locust -f benchmarks/locustfile.py --host http://localhost:8000 \\
+        --users 50 --spawn-rate 10 --run-time 1m --headless
+
+Locust reports the p50/p95/p99 latency of each request type. The login
+credentials are read from BENCH_USERNAME and BENCH_PASSWORD.
+"""
+
+import os
+import random
+import re
+
+from locust import HttpUser, between, task
+
+cursor_re = re.compile(r'href="[^"]*after=([^"&]+)')
+
+
+class OfficeUser(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.client.post(
+            "/login",
+            data={
+                "username": os.environ.get("BENCH_USERNAME", "admin"),
+                "password": os.environ.get("BENCH_PASSWORD", "admin"),
+            },
+        )
+
+    @task(10)
+    def dashboard(self):
+        self.client.get(f"/index?sort={random.choice(['by_user', 'by_key'])}", name="/index")
+
+    @task(5)
+    def browse_assignments(self):
+        response = self.client.get("/assignments")
+        for _ in range(random.randrange(3)):
+            match = cursor_re.search(response.text)
+            if not match:
+                break
+            response = self.client.get(
+                f"/assignments?after={match.group(1)}", name="/assignments?after"
+            )
+
+    @task(3)
+    def user_history(self):
+        user = f"user{random.randrange(1000)}"
+        self.client.get(f"/assignments?user={user}", name="/assignments?user")
+
+    @task(2)
+    def keys(self):
+        self.client.get("/keys")
+
+    @task(2)
+    def users(self):
+        self.client.get("/users")
+
+    @task(3)
+    def typeahead(self):
+        query = f"key{random.randrange(1000)}"
+        self.client.get(f"/search?type=keys&q={query}", name="/search")
+
+    @task(1)
+    def assign_form(self):
+        self.client.get("/assign_key")
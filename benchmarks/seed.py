@@ -0,0 +1,132 @@
+"""
+seed generates synthetic data for benchmarking
+
+Usage: python -m benchmarks.seed [--users N] [--keys N] [--assignments N]
+
+The database is taken from DATABASE_URL like the app itself.
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app import app, db
+from app.holdings import rebuild_holdings
+from app.ids import backfill_ids
+from app.models import Assignment, Key, User
+from app.rollups import rebuild_rollups
+
+CHUNK_SIZE = 10000
+
+
+def insert_chunked(table, rows):
+    """Inserts an iterable of row dicts into table in executemany chunks"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+
+
+def seed_database(
+    n_users=1000, n_keys=5000, n_assignments=1000000, seed=0, start=date(2010, 1, 1)
+):
+    """
+    Fills the database with n_users users, n_keys keys and n_assignments
+    assignments.
+
+    Each key has a history of check-outs and check-ins to randomly chosen
+    users, with a skew so that some users hold many more keys than others.
+    Loans last from a day to a few months with gaps in between, and about a
+    third of the keys are still checked out at the end of their history.
+    About 5% of the keys are inactive.
+    """
+    rng = random.Random(seed)
+
+    insert_chunked(
+        User.__table__,
+        (
+            {
+                "username": f"user{u}",
+                "display_name": f"User {u}" if rng.random() < 0.8 else None,
+                "email": f"user{u}@example.com" if rng.random() < 0.5 else None,
+            }
+            for u in range(n_users)
+        ),
+    )
+    insert_chunked(
+        Key.__table__,
+        (
+            {
+                "name": f"key{k}",
+                "description": f"Room {rng.randrange(1000)}",
+                "status": "Inactive" if rng.random() < 0.05 else "Active",
+            }
+            for k in range(n_keys)
+        ),
+    )
+
+    def random_user():
+        return f"user{int(n_users * rng.random() ** 2)}"
+
+    def assignments():
+        remaining = n_assignments
+        for k in range(n_keys):
+            # Spread the assignments over the keys with some variation
+            turns = remaining // (n_keys - k)
+            if k < n_keys - 1:
+                turns = min(remaining, int(turns * rng.uniform(0.5, 1.5)))
+            remaining -= turns
+
+            day = start + timedelta(days=rng.randrange(30))
+            for turn in range(turns):
+                duration = max(1, int(rng.expovariate(1 / 14)))
+                is_open = turn == turns - 1 and rng.random() < 0.33
+                yield {
+                    "user": random_user(),
+                    "key": f"key{k}",
+                    "date_out": day,
+                    "date_in": None if is_open else day + timedelta(days=duration),
+                }
+                day += timedelta(days=duration + rng.randrange(5))
+
+    insert_chunked(Assignment.__table__, assignments())
+    backfill_ids(Assignment.__table__)
+    db.session.commit()
+    rebuild_holdings()
+    rebuild_rollups()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic data.")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--assignments", type=int, default=2000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--admin-password",
+        help="Also create a user 'admin' with this password that can log in.",
+    )
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed_database(args.users, args.keys, args.assignments, args.seed)
+        if args.admin_password:
+            admin = User(username="admin", can_login=True)
+            admin.set_password(args.admin_password)
+            db.session.add(admin)
+            db.session.commit()
+    print(
+        f"Seeded {args.users} users, {args.keys} keys and {args.assignments} "
+        f"assignments in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -6,6 +7,22 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 load_dotenv()
 
 
+def engine_options(uri):
+    """
+    Returns the SQLAlchemy engine options for the database at uri. SQLite
+    connections are tuned with the SQLITE_* pragmas instead, see app.database.
+    """
+    if uri.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE") or 5),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW") or 10),
+        "pool_pre_ping": (os.environ.get("DB_POOL_PRE_PING") or "true").lower()
+        in ("1", "true", "yes"),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE") or 1800),
+    }
+
+
 class Config(object):
     SECRET_KEY = (
         os.environ.get("SECRET_KEY") or "{JCsu0@oCQl_ԛCX}o,I-WF>~i?ߤW]?6Fߍ^im`#yʽMF"
@@ -14,3 +31,61 @@ class Config(object):
         "DATABASE_URL"
     ) or "sqlite:///" + os.path.join(basedir, "app.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Pragmas set on every SQLite connection. An empty value leaves the
+    # SQLite default.
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT = os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")
+    SQLITE_MMAP_SIZE = os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+    # Negative values are in KiB
+    SQLITE_CACHE_SIZE = os.environ.get("SQLITE_CACHE_SIZE", "-65536")
+    PER_PAGE = int(os.environ.get("PER_PAGE") or 50)
+    MAX_PER_PAGE = int(os.environ.get("MAX_PER_PAGE") or 500)
+    # Render the listing pages as they are sent instead of caching them whole
+    STREAM_PAGES = (os.environ.get("STREAM_PAGES") or "false").lower() in ("1", "true", "yes")
+    STREAM_BATCH_SIZE = int(os.environ.get("STREAM_BATCH_SIZE") or 200)
+    STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE") or 16384)
+    API_TOKEN_EXPIRES = int(os.environ.get("API_TOKEN_EXPIRES") or 3600)
+    API_MAX_BULK_ITEMS = int(os.environ.get("API_MAX_BULK_ITEMS") or 1000)
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE") or 1000)
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE") or 5000)
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES") or 128)
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES") or 256)
+    # Seconds a logged in user is cached before it is read again
+    USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL") or 30)
+    METRICS_DIR = os.environ.get("METRICS_DIR") or os.path.join(
+        tempfile.gettempdir(), "keymaster_metrics"
+    )
+    # Closed assignments are moved to the archive table this many days after
+    # they were checked in, ARCHIVE_BATCH_SIZE at a time
+    ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS") or 365)
+    ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE") or 1000)
+    ARCHIVE_BATCH_PAUSE = float(os.environ.get("ARCHIVE_BATCH_PAUSE") or 0.1)
+    # Seconds between the change log polls of each open /events stream
+    EVENTS_POLL_INTERVAL = float(os.environ.get("EVENTS_POLL_INTERVAL") or 1)
+    # Seconds an /events stream is held open before the browser reconnects
+    EVENTS_STREAM_SECONDS = float(os.environ.get("EVENTS_STREAM_SECONDS") or 60)
+    # Open /events streams per gunicorn worker, each of which holds a thread.
+    # Dashboards beyond this are told to reconnect after EVENTS_BUSY_RETRY
+    # seconds. Streams served by the ASGI entry point are not limited.
+    EVENTS_MAX_STREAMS = int(os.environ.get("EVENTS_MAX_STREAMS") or 2)
+    EVENTS_BUSY_RETRY = float(os.environ.get("EVENTS_BUSY_RETRY") or 30)
+    # Changes of more rows than this are pushed as a single page reload
+    EVENTS_MAX_BATCH = int(os.environ.get("EVENTS_MAX_BATCH") or 100)
+    # Events kept in the change log for reconnecting dashboards
+    EVENTS_KEEP = int(os.environ.get("EVENTS_KEEP") or 10000)
+    # Threads of each ASGI worker for the requests which are not async views
+    ASGI_THREADS = int(os.environ.get("ASGI_THREADS") or 8)
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get("SLOW_REQUEST_THRESHOLD") or 0.5)
+    # pbkdf2, scrypt or argon2. Existing hashes are upgraded on login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD") or "pbkdf2"
+    PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get("PASSWORD_PBKDF2_ITERATIONS") or 260000)
+    PASSWORD_SCRYPT_N = int(os.environ.get("PASSWORD_SCRYPT_N") or 2 ** 15)
+    PASSWORD_SCRYPT_R = int(os.environ.get("PASSWORD_SCRYPT_R") or 8)
+    PASSWORD_SCRYPT_P = int(os.environ.get("PASSWORD_SCRYPT_P") or 1)
+    PASSWORD_ARGON2_TIME_COST = int(os.environ.get("PASSWORD_ARGON2_TIME_COST") or 3)
+    PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get("PASSWORD_ARGON2_MEMORY_COST") or 65536)
+    PASSWORD_ARGON2_PARALLELISM = int(os.environ.get("PASSWORD_ARGON2_PARALLELISM") or 4)
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS") or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING") or 32)
@@ -0,0 +1,87 @@
+"""
+gunicorn settings for keymaster:app. gunicorn reads them from the working
+directory, and deployment/systemd/keymaster.service passes the other options
+on the command line.
+
+With preload_app the app is imported once by the master before the workers
+are forked, so the workers start without importing it again and share its
+memory copy-on-write. Set GUNICORN_PRELOAD=false to import it in each worker
+instead, which `kill -HUP` needs to pick up new code.
+"""
+
+import json
+import os
+
+preload_app = (os.environ.get("GUNICORN_PRELOAD") or "true").lower() in ("1", "true", "yes")
+
+
+def post_fork(server, worker):
+    """
+    Drops the database connections a preloaded app may have opened in the
+    master, so workers do not share them. They are left open for the master.
+    """
+    if server.cfg.preload_app:
+        from app import db
+
+        db.engine.dispose(close=False)
+
+
+# The hooks below run in the master, which only imports the app when it is
+# preloaded, so they work on the metrics files of app.metrics directly
+
+
+def metrics_dir():
+    from config import Config
+
+    return Config.METRICS_DIR
+
+
+def on_starting(server):
+    """Removes the metrics files of the workers of earlier runs"""
+    directory = metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.endswith((".json", ".tmp")):
+            os.remove(os.path.join(directory, filename))
+
+
+def merge_metrics(totals, data):
+    """Adds the counters and histograms of data to totals"""
+    counters = {json.dumps(c[:2]): c for c in totals["counters"]}
+    for name, labels, value in data["counters"]:
+        counters.setdefault(json.dumps([name, labels]), [name, labels, 0])[2] += value
+    histograms = {json.dumps(h[:2]): h for h in totals["histograms"]}
+    for name, labels, buckets, total, count in data["histograms"]:
+        key = json.dumps([name, labels])
+        if key not in histograms:
+            histograms[key] = [name, labels, [0] * len(buckets), 0, 0]
+        merged = histograms[key]
+        merged[2] = [a + b for a, b in zip(merged[2], buckets)]
+        merged[3] += total
+        merged[4] += count
+    return {"counters": list(counters.values()), "histograms": list(histograms.values())}
+
+
+def child_exit(server, worker):
+    """
+    Moves the metrics of an exited worker into dead.json, which /metrics
+    keeps adding to the totals. This keeps one file per live worker, and a
+    new worker given the same pid does not overwrite them.
+    """
+    directory = metrics_dir()
+    path = os.path.join(directory, f"{worker.pid}.json")
+    dead = os.path.join(directory, "dead.json")
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    totals = {"counters": [], "histograms": []}
+    if os.path.exists(dead):
+        with open(dead) as f:
+            totals = json.load(f)
+    with open(dead + ".tmp", "w") as f:
+        json.dump(merge_metrics(totals, data), f)
+    os.replace(dead + ".tmp", dead)
+    os.remove(path)
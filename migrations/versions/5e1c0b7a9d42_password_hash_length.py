@@ -0,0 +1,39 @@
+"""password hash length
+
+Revision ID: 5e1c0b7a9d42
+Revises: 234dada5b7b5
+Create Date: 2026-10-18 17:22:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e1c0b7a9d42'
+down_revision = '234dada5b7b5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # scrypt hashes are longer than 128 characters. SQLite does not enforce
+    # the length, and rebuilding the users table would drop its search index
+    # triggers.
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=128),
+               type_=sa.String(length=256),
+               existing_nullable=True)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.alter_column('password_hash',
+               existing_type=sa.String(length=256),
+               type_=sa.String(length=128),
+               existing_nullable=True)
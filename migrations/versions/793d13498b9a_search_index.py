@@ -0,0 +1,71 @@
+"""search index
+
+Revision ID: 793d13498b9a
+Revises: 829f858dd5ba
+Create Date: 2026-10-18 17:11:45.526033
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '793d13498b9a'
+down_revision = '829f858dd5ba'
+branch_labels = None
+depends_on = None
+
+
+# The trigram index is only used on SQLite. Other backends search with LIKE.
+statements = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        kind UNINDEXED, ident UNINDEXED, label, detail, tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ai AFTER INSERT ON keys BEGIN
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_au
+    AFTER UPDATE OF name, description ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ad AFTER DELETE ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('user', new.username, new.username, coalesce(new.display_name, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_au
+    AFTER UPDATE OF username, display_name ON users BEGIN
+        DELETE FROM search_index WHERE kind = 'user' AND ident = old.username;
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('user', new.username, new.username, coalesce(new.display_name, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN
+        DELETE FROM search_index WHERE kind = 'user' AND ident = old.username;
+    END""",
+    """DELETE FROM search_index""",
+    """INSERT INTO search_index (kind, ident, label, detail)
+    SELECT 'key', name, name, coalesce(description, '') FROM keys""",
+    """INSERT INTO search_index (kind, ident, label, detail)
+    SELECT 'user', username, username, coalesce(display_name, '') FROM users""",
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for trigger in ("keys_search_ai", "keys_search_au", "keys_search_ad",
+                    "users_search_ai", "users_search_au", "users_search_ad"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS search_index")
@@ -0,0 +1,34 @@
+"""assignment indexes
+
+Revision ID: 9877d79103dd
+Revises: 6c41a6f7daa6
+Create Date: 2026-10-18 17:03:32.160048
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9877d79103dd'
+down_revision = '6c41a6f7daa6'
+branch_labels = None
+depends_on = None
+
+
+# Backends that support partial indexes
+PARTIAL_INDEX_DIALECTS = ("sqlite", "postgresql")
+
+
+def upgrade():
+    op.create_index('ix_assignments_key_date_in', 'assignments', ['key', 'date_in'], unique=False)
+    op.create_index('ix_assignments_user_date_in', 'assignments', ['user', 'date_in'], unique=False)
+    if op.get_bind().dialect.name in PARTIAL_INDEX_DIALECTS:
+        op.create_index('ix_assignments_open', 'assignments', ['user', 'key'], unique=False, sqlite_where=sa.text('date_in IS NULL'), postgresql_where=sa.text('date_in IS NULL'))
+
+
+def downgrade():
+    if op.get_bind().dialect.name in PARTIAL_INDEX_DIALECTS:
+        op.drop_index('ix_assignments_open', table_name='assignments')
+    op.drop_index('ix_assignments_user_date_in', table_name='assignments')
+    op.drop_index('ix_assignments_key_date_in', table_name='assignments')
@@ -0,0 +1,26 @@
+"""assignment period indexes
+
+Revision ID: c9fa82288af0
+Revises: 793d13498b9a
+Create Date: 2026-10-18 17:14:59.004237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9fa82288af0'
+down_revision = '793d13498b9a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_assignments_key_period', 'assignments', ['key', 'date_out', 'date_in'], unique=False)
+    op.create_index('ix_assignments_user_period', 'assignments', ['user', 'date_out', 'date_in'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_assignments_user_period', table_name='assignments')
+    op.drop_index('ix_assignments_key_period', table_name='assignments')
@@ -0,0 +1,71 @@
+"""assignment autoincrement
+
+Revision ID: d70111556a1a
+Revises: f2b8d4a61c57
+Create Date: 2026-10-18 21:14:05.512930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd70111556a1a'
+down_revision = 'f2b8d4a61c57'
+branch_labels = None
+depends_on = None
+
+
+# Without AUTOINCREMENT SQLite reuses the ids of the deleted rows with the
+# highest ids, which the archive already holds. Other backends take the ids
+# from a sequence, which never goes back.
+indexes = [
+    ('ix_assignments_key_id_date_in', ['key_id', 'date_in']),
+    ('ix_assignments_user_id_date_in', ['user_id', 'date_in']),
+    ('ix_assignments_key_id_period', ['key_id', 'date_out', 'date_in']),
+    ('ix_assignments_user_id_period', ['user_id', 'date_out', 'date_in']),
+]
+
+
+def rebuild(autoincrement):
+    op.create_table('_assignments_new',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user', sa.String(), nullable=True),
+    sa.Column('key', sa.String(), nullable=True),
+    sa.Column('date_out', sa.Date(), nullable=True),
+    sa.Column('date_in', sa.Date(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('key_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['key_id'], ['keys.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=autoincrement
+    )
+    op.execute(
+        'INSERT INTO _assignments_new (id, "user", "key", date_out, date_in, user_id, key_id) '
+        'SELECT id, "user", "key", date_out, date_in, user_id, key_id FROM assignments'
+    )
+    op.drop_table('assignments')
+    op.rename_table('_assignments_new', 'assignments')
+    for name, columns in indexes:
+        op.create_index(name, 'assignments', columns, unique=False)
+    op.create_index('ix_assignments_open', 'assignments', ['user', 'key'], unique=False, sqlite_where=sa.text('date_in IS NULL'))
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    rebuild(autoincrement=True)
+    # New ids continue after the highest id of either table
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'assignments'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'assignments', max("
+        "(SELECT coalesce(max(id), 0) FROM assignments), "
+        "(SELECT coalesce(max(id), 0) FROM assignments_archive))"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    rebuild(autoincrement=False)
@@ -0,0 +1,147 @@
+"""surrogate ids
+
+Revision ID: e4a1c9b27f30
+Revises: b3f7e2c41d96
+Create Date: 2026-10-18 18:20:41.385207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a1c9b27f30'
+down_revision = 'b3f7e2c41d96'
+branch_labels = None
+depends_on = None
+
+
+# The keys table is rebuilt on SQLite, which drops its search triggers
+key_search_triggers = [
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ai AFTER INSERT ON keys BEGIN
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_au
+    AFTER UPDATE OF name, description ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+        INSERT INTO search_index (kind, ident, label, detail)
+        VALUES ('key', new.name, new.name, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS keys_search_ad AFTER DELETE ON keys BEGIN
+        DELETE FROM search_index WHERE kind = 'key' AND ident = old.name;
+    END""",
+]
+
+# Foreign keys on the names, which renames would violate on PostgreSQL.
+# SQLite does not enforce them, so they are left there rather than
+# rebuilding the assignments table.
+name_foreign_keys = [
+    ('assignments', 'assignments_user_fkey'),
+    ('assignments', 'assignments_key_fkey'),
+    ('current_holdings', 'current_holdings_user_fkey'),
+    ('current_holdings', 'current_holdings_key_fkey'),
+]
+
+old_indexes = [
+    ('ix_assignments_key_date_in', ['key', 'date_in']),
+    ('ix_assignments_user_date_in', ['user', 'date_in']),
+    ('ix_assignments_key_period', ['key', 'date_out', 'date_in']),
+    ('ix_assignments_user_period', ['user', 'date_out', 'date_in']),
+]
+
+new_indexes = [
+    ('ix_assignments_key_id_date_in', ['key_id', 'date_in']),
+    ('ix_assignments_user_id_date_in', ['user_id', 'date_in']),
+    ('ix_assignments_key_id_period', ['key_id', 'date_out', 'date_in']),
+    ('ix_assignments_user_id_period', ['user_id', 'date_out', 'date_in']),
+]
+
+
+def upgrade():
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        op.create_table('_keys_new',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+        op.execute(
+            'INSERT INTO _keys_new (name, description, status) '
+            'SELECT name, description, status FROM keys ORDER BY name'
+        )
+        op.drop_table('keys')
+        op.rename_table('_keys_new', 'keys')
+        for statement in key_search_triggers:
+            op.execute(statement)
+    else:
+        for table, constraint in name_foreign_keys:
+            op.drop_constraint(constraint, table, type_='foreignkey')
+        op.add_column('keys', sa.Column('id', sa.Integer(), sa.Identity(), nullable=False))
+        op.drop_constraint('keys_pkey', 'keys', type_='primary')
+        op.create_primary_key('keys_pkey', 'keys', ['id'])
+        op.create_unique_constraint('keys_name_key', 'keys', ['name'])
+
+    # Adding nullable columns does not rewrite the tables. The assignments
+    # are given their ids afterwards with `flask ids backfill`.
+    for table in ('assignments', 'current_holdings'):
+        for column, parent in (('user_id', 'users'), ('key_id', 'keys')):
+            if sqlite:
+                op.execute(
+                    f'ALTER TABLE {table} ADD COLUMN {column} INTEGER REFERENCES {parent} (id)'
+                )
+            else:
+                op.add_column(table, sa.Column(column, sa.Integer(), nullable=True))
+                op.create_foreign_key(
+                    f'{table}_{column}_fkey', table, parent, [column], ['id']
+                )
+    op.execute(
+        'UPDATE current_holdings SET '
+        'user_id = (SELECT id FROM users WHERE username = current_holdings."user"), '
+        'key_id = (SELECT id FROM keys WHERE name = current_holdings."key")'
+    )
+    for name, columns in old_indexes:
+        op.drop_index(name, table_name='assignments')
+    for name, columns in new_indexes:
+        op.create_index(name, 'assignments', columns, unique=False)
+
+
+def downgrade():
+    for name, columns in new_indexes:
+        op.drop_index(name, table_name='assignments')
+    for name, columns in old_indexes:
+        op.create_index(name, 'assignments', columns, unique=False)
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table in ('assignments', 'current_holdings'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('key_id')
+            batch_op.drop_column('user_id')
+    if sqlite:
+        op.create_table('_keys_old',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+        op.execute(
+            'INSERT INTO _keys_old (name, description, status) '
+            'SELECT name, description, status FROM keys'
+        )
+        op.drop_table('keys')
+        op.rename_table('_keys_old', 'keys')
+        for statement in key_search_triggers:
+            op.execute(statement)
+    else:
+        op.drop_constraint('keys_name_key', 'keys', type_='unique')
+        op.drop_constraint('keys_pkey', 'keys', type_='primary')
+        op.create_primary_key('keys_pkey', 'keys', ['name'])
+        op.drop_column('keys', 'id')
+        for table, constraint in name_foreign_keys:
+            column = constraint.split('_')[-2]
+            op.create_foreign_key(
+                constraint, table, 'users' if column == 'user' else 'keys',
+                [column], ['username' if column == 'user' else 'name'],
+            )
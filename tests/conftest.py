@@ -0,0 +1,46 @@
+import os
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app
+from app import db
+from app.cache import cache, page_cache, user_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    flask_app.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        LOGIN_DISABLED=True,
+        METRICS_DIR=str(tmp_path / "metrics"),
+    )
+    cache.clear()
+    user_cache.clear()
+    page_cache.clear()
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def query_counter(app):
+    """Counts the SQL statements executed while the fixture is active"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", count)
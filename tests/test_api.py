@@ -0,0 +1,107 @@
+from app import db
+from app.holdings import verify_holdings
+from app.models import Assignment, Key, User
+
+
+def auth_headers(client):
+    user = User(username="admin", can_login=True)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    resp = client.post(
+        "/api/v1/tokens", json={"username": "admin", "password": "secret"}
+    )
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.get_json()['token']}"}
+
+
+def test_token_required(client):
+    assert client.get("/api/v1/keys").status_code == 401
+    resp = client.get("/api/v1/keys", headers={"Authorization": "Bearer nope"})
+    assert resp.status_code == 401
+    resp = client.post("/api/v1/tokens", json={"username": "x", "password": "y"})
+    assert resp.status_code == 401
+
+
+def test_keys(client):
+    headers = auth_headers(client)
+    resp = client.post("/api/v1/keys", json={"name": "key1"}, headers=headers)
+    assert resp.status_code == 201
+    resp = client.post("/api/v1/keys", json={"name": "key1"}, headers=headers)
+    assert resp.status_code == 400
+    assert "name" in resp.get_json()["errors"]
+
+    resp = client.get("/api/v1/keys", headers=headers)
+    assert resp.get_json()["items"] == [
+        {"name": "key1", "description": "", "status": "Active"}
+    ]
+    assert client.get("/api/v1/keys/nope", headers=headers).status_code == 404
+
+
+def test_bulk_checkout_checkin(client):
+    headers = auth_headers(client)
+    db.session.add_all([User(username=f"user{u}") for u in range(3)])
+    db.session.add_all([Key(name=f"key{k}") for k in range(100)])
+    db.session.add(Key(name="retired", status="Inactive"))
+    db.session.commit()
+
+    items = [
+        {"user": f"user{u}", "key": f"key{k}", "date_out": "2021-01-01"}
+        for u in range(3)
+        for k in range(100)
+    ]
+    items.append({"user": "user0", "key": "retired", "date_out": "2021-01-01"})
+    items.append({"user": "user0", "key": "key0"})
+    resp = client.post(
+        "/api/v1/assignments/checkout", json={"items": items}, headers=headers
+    )
+    body = resp.get_json()
+    assert body["summary"] == {"assigned": 300, "invalid": 2}
+    assert "key" in body["results"][300]["errors"]
+    assert "date_out" in body["results"][301]["errors"]
+    assert Assignment.query.count() == 300
+
+    resp = client.post(
+        "/api/v1/assignments/checkout", json={"items": items[:1]}, headers=headers
+    )
+    assert resp.get_json()["results"][0]["status"] == "already_assigned"
+
+    item = {"user": "user1", "key": "key0", "date_in": "2020-12-31"}
+    resp = client.post(
+        "/api/v1/assignments/checkin", json={"items": [item]}, headers=headers
+    )
+    result = resp.get_json()["results"][0]
+    assert result["status"] == "invalid" and "date_in" in result["errors"]
+    assert Assignment.query.filter_by(user="user1", key="key0", date_in=None).count() == 1
+
+    items = [
+        {"user": "user0", "key": f"key{k}", "date_in": "2021-02-01"} for k in range(101)
+    ]
+    resp = client.post(
+        "/api/v1/assignments/checkin", json={"items": items}, headers=headers
+    )
+    assert resp.get_json()["summary"] == {"checked_in": 100, "not_checked_out": 1}
+    assert Assignment.query.filter_by(date_in=None).count() == 200
+    assert verify_holdings() == (set(), set())
+
+    resp = client.get("/api/v1/assignments?status=open&per_page=150", headers=headers)
+    body = resp.get_json()
+    assert len(body["items"]) == 150 and body["next"]
+
+
+def test_bulk_requires_items(client):
+    headers = auth_headers(client)
+    resp = client.post("/api/v1/assignments/checkout", json={}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_create_requires_object(client):
+    headers = auth_headers(client)
+    for body in ([1, 2], "mike", 5):
+        for url in ("/api/v1/users", "/api/v1/keys"):
+            resp = client.post(url, json=body, headers=headers)
+            assert resp.status_code == 400
+    resp = client.post(
+        "/api/v1/users", json={"username": "mike", "password": "pw"}, headers=headers
+    )
+    assert resp.status_code == 201
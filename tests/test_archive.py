@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app import db
+from app.archive import archive_assignments
+from app.history import holders_at, keys_held
+from app.models import ArchivedAssignment, Assignment, Key, User
+from app.rollups import rebuild_rollups, verify_rollups
+from app.routes import assignment_listing, paginate_listing
+
+
+@pytest.fixture
+def seed(app, monkeypatch):
+    monkeypatch.setitem(app.config, "ARCHIVE_BATCH_PAUSE", 0)
+    recent = date.today() - timedelta(days=10)
+    db.session.add_all([User(username="mike"), Key(name="key1"), Key(name="key2")])
+    for key, date_out, date_in in [
+        ("key1", date(2020, 1, 1), date(2020, 2, 1)),
+        ("key2", date(2020, 1, 5), date(2020, 3, 1)),
+        ("key1", date(2020, 6, 1), recent),
+        ("key2", date(2021, 1, 1), None),
+    ]:
+        db.session.add(Assignment(user="mike", key=key, date_out=date_out, date_in=date_in))
+    db.session.commit()
+    rebuild_rollups()
+
+
+def test_archive_moves_old_closed_assignments(seed):
+    assert archive_assignments(days=30, batch_size=1) == 2
+    assert [a.id for a in Assignment.query.order_by(Assignment.id)] == [3, 4]
+    archived = ArchivedAssignment.query.order_by(ArchivedAssignment.id).all()
+    assert [(a.id, a.key) for a in archived] == [(1, "key1"), (2, "key2")]
+    assert archived[0].key_id == Key.query.filter_by(name="key1").first().id
+    assert archive_assignments(days=30) == 0
+
+
+def test_history_reads_archive(seed, client):
+    archive_assignments(days=30)
+
+    assert [a.id for a in holders_at("key1", date(2020, 1, 15))] == [1]
+    assert [(a.id, a.archived) for a in keys_held("mike", date.min, date.today())] == [
+        (1, True),
+        (2, True),
+        (3, False),
+        (4, False),
+    ]
+    resp = client.get("/history?key=key1&at=2020-01-15")
+    assert b"Archived" in resp.data
+    assert b"edit_assignment" not in resp.data
+
+    lines = client.get("/export/assignments.csv").data.decode().splitlines()
+    assert [line.split(",")[0] for line in lines[1:]] == ["1", "2", "3", "4"]
+    lines = client.get("/export/assignments.csv?key=key1").data.decode().splitlines()
+    assert [line.split(",")[0] for line in lines[1:]] == ["1", "3"]
+
+    assert verify_rollups() == []
+
+
+def test_rename_rewrites_archive(seed, client):
+    archive_assignments(days=30)
+    mike = User.query.filter_by(username="mike").first()
+    client.post(
+        f"/edit_user?id={mike.id}",
+        data={"username": "michael", "email": "", "display_name": ""},
+    )
+    assert {a.user for a in ArchivedAssignment.query} == {"michael"}
+
+
+def test_archived_ids_are_not_reused(seed):
+    old = date(2020, 1, 1), date(2020, 2, 1)
+    db.session.add(Assignment(user="mike", key="key1", date_out=old[0], date_in=old[1]))
+    db.session.commit()
+    assert archive_assignments(days=30) == 3
+
+    db.session.add(Assignment(user="mike", key="key1", date_out=old[0], date_in=old[1]))
+    db.session.commit()
+    assert archive_assignments(days=30) == 1
+    assert [a.id for a in ArchivedAssignment.query.order_by(ArchivedAssignment.id)] == [
+        1, 2, 5, 6
+    ]
+
+
+def test_assignments_page_reads_archive(seed, client):
+    archive_assignments(days=30)
+
+    args = {"sort": "date_out", "dir": "asc", "per_page": "3"}
+    pages = []
+    while True:
+        rows, sorts = assignment_listing(args)
+        page = paginate_listing(db.session.query(rows), sorts, rows.c.id, args, "date_out")
+        pages.append([(a.id, a.archived) for a in page])
+        if not page.next_cursor:
+            break
+        args["after"] = page.next_cursor
+    assert pages == [[(1, True), (2, True), (3, False)], [(4, False)]]
+
+    resp = client.get("/assignments")
+    assert resp.data.count(b"Archived") == 2
+    assert resp.data.count(b"edit_assignment?id=") == 2
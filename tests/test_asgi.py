@@ -0,0 +1,115 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from app import aio, db
+from app.asgi import application
+from app.models import Assignment, Holding, Key, User
+
+
+@pytest.fixture
+def file_db(app, tmp_path, monkeypatch):
+    """The async engine cannot share the in-memory database of the tests"""
+    monkeypatch.setitem(app.config, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/asgi.db")
+    db.create_all()
+    db.session.add_all(
+        [
+            User(username="mike", display_name="Mike", can_login=True),
+            Key(name="key1"),
+            Assignment(user="mike", key="key1", date_out=date(2021, 1, 1)),
+            Holding(user="mike", key="key1", date_out=date(2021, 1, 1)),
+        ]
+    )
+    db.session.commit()
+    yield app
+    db.session.remove()
+    db.drop_all()
+
+
+def call(method, path, query=b"", body=b"", headers=()):
+    """Runs one request through the ASGI app and returns (status, headers, body)"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "http_version": "1.1",
+        "headers": [(b"host", b"localhost"), *headers],
+        "client": ("127.0.0.1", 1234),
+    }
+    messages = [{"type": "http.request", "body": body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        await application(scope, receive, send)
+        await aio.dispose()
+
+    asyncio.run(run())
+    headers = dict(sent[0]["headers"])
+    return sent[0]["status"], headers, b"".join(m.get("body", b"") for m in sent[1:])
+
+
+@pytest.mark.parametrize(
+    "path, query, expected",
+    [
+        ("/index", b"sort=by_user", b"<td>key1</td>"),
+        ("/index", b"sort=by_key", b"<td>Mike</td>"),
+        ("/keys", b"", b"<td>key1</td>"),
+        ("/assignments", b"user=mike", b"<td>Mike</td>"),
+        ("/users", b"", b"<td>Mike</td>"),
+    ],
+)
+def test_async_views(file_db, path, query, expected):
+    status, _, body = call("GET", path, query)
+    assert status == 200
+    assert expected in body
+
+
+def test_async_view_requires_login(file_db, monkeypatch):
+    monkeypatch.setitem(file_db.config, "LOGIN_DISABLED", False)
+    status, headers, _ = call("GET", "/keys")
+    assert status == 302
+    assert b"/login" in headers[b"location"]
+
+
+def test_other_routes_use_flask(file_db):
+    status, _, body = call("GET", "/export/assignments.csv")
+    assert status == 200
+    assert b"mike,key1,2021-01-01" in body
+
+    status, _, _ = call(
+        "POST",
+        "/add_key",
+        body=b"name=key2&submit=y",
+        headers=[(b"content-type", b"application/x-www-form-urlencoded")],
+    )
+    assert status == 302
+    assert Key.query.filter_by(name="key2").first()
+
+
+def test_events_stream(file_db, monkeypatch):
+    monkeypatch.setitem(file_db.config, "EVENTS_STREAM_SECONDS", 0)
+    call(
+        "POST",
+        "/edit_key",
+        query=b"name=key1",
+        body=b"description=&status=Inactive",
+        headers=[(b"content-type", b"application/x-www-form-urlencoded")],
+    )
+    status, headers, body = call("GET", "/events", b"after=0")
+    assert status == 200
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert b'event: key_status\ndata: {"key": "key1", "status": "Inactive"}' in body
+
+    monkeypatch.setitem(file_db.config, "LOGIN_DISABLED", False)
+    status, _, _ = call("GET", "/events")
+    assert status == 302
@@ -0,0 +1,154 @@
+import io
+from datetime import date
+
+from flask import g
+
+from app import db
+from app.cache import (TTLCache, VersionedCache, cache, current_versions,
+                       page_cache, user_cache)
+from app.importer import import_csv
+from app.models import Assignment, Key, User
+
+
+def test_user_dict_cached_until_write(client, query_counter):
+    db.session.add(User(username="mike", display_name="Mike"))
+    db.session.add(Assignment(user="mike", key="key1", date_out=date(2021, 1, 1)))
+    db.session.commit()
+
+    client.get("/assignments")
+    page_cache.clear()
+    query_counter.clear()
+    resp = client.get("/assignments")
+    assert b"<td>Mike</td>" in resp.data
+    # The version counters and the page of assignments
+    assert len(query_counter) == 2
+    assert cache.stats()["hits"] == 1
+
+    user = User.query.first()
+    client.post(
+        f"/edit_user?id={user.id}",
+        data={"username": "mike", "email": "", "display_name": "Michael"},
+    )
+    resp = client.get("/assignments")
+    assert b"<td>Michael</td>" in resp.data
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_bulk_import_bumps_version(app):
+    versions = dict(current_versions())
+    import_csv("users", io.StringIO("username,display_name\nmike,Mike\n"))
+    db.session.commit()
+    assert current_versions()["users"] == versions.get("users", 0) + 1
+
+
+def test_unmodified_objects_do_not_bump(app):
+    db.session.add(User(username="mike"))
+    db.session.commit()
+    version = current_versions()["users"]
+    user = User.query.first()
+    user.username = "mike"
+    db.session.commit()
+    g.pop("data_versions")
+    assert current_versions()["users"] == version
+
+
+def test_lru_eviction(app):
+    lru = VersionedCache(max_entries=2)
+    for name in ("a", "b", "a", "c"):
+        lru.get(name, ("users",), lambda: name)
+    assert lru.stats()["evictions"] == 1
+    assert lru.get("a", ("users",), lambda: "reloaded") == "a"
+    assert lru.get("b", ("users",), lambda: "reloaded") == "reloaded"
+
+
+def login(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "LOGIN_DISABLED", False)
+    monkeypatch.setitem(app.config, "PASSWORD_PBKDF2_ITERATIONS", 1000)
+    user = User(username="admin", can_login=True)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    client.post("/login", data={"username": "admin", "password": "secret"})
+    return user.id
+
+
+def test_logged_in_user_cached(app, client, query_counter, monkeypatch):
+    login(app, client, monkeypatch)
+    client.get("/keys")
+    hits = user_cache.stats()["hits"]
+    query_counter.clear()
+    resp = client.get("/keys")
+    assert resp.status_code == 200
+    assert not any("FROM users" in statement for statement in query_counter)
+    assert user_cache.stats()["hits"] == hits + 1
+
+
+def test_disabled_user_logged_out(app, client, monkeypatch):
+    id = login(app, client, monkeypatch)
+    assert client.get("/keys").status_code == 200
+    invalidations = user_cache.stats()["invalidations"]
+    user = User.query.get(id)
+    user.can_login = False
+    db.session.commit()
+    assert user_cache.stats()["invalidations"] == invalidations + 1
+    assert client.get("/keys").status_code == 302
+
+
+def test_rolled_back_changes_keep_cache(app, client, monkeypatch):
+    id = login(app, client, monkeypatch)
+    client.get("/keys")
+    invalidations = user_cache.stats()["invalidations"]
+    User.query.get(id).can_login = False
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()
+    assert user_cache.stats()["invalidations"] == invalidations
+
+
+def test_ttl_expiry(monkeypatch):
+    ttl = TTLCache(ttl=30)
+    assert ttl.get("a", lambda: None) is None
+    assert ttl.get("a", lambda: 1) == 1
+    assert ttl.get("a", lambda: 2) == 1
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: float("inf"))
+    assert ttl.get("a", lambda: 3) == 3
+
+
+def test_conditional_get(client, query_counter):
+    db.session.add(Key(name="key1"))
+    db.session.commit()
+
+    resp = client.get("/keys")
+    etag = resp.headers["ETag"]
+    assert resp.headers["Cache-Control"] == "private, no-cache"
+
+    query_counter.clear()
+    resp = client.get("/keys", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert not resp.data
+    # Only the version counters
+    assert len(query_counter) == 1
+
+    # The flash message is shown by the redirect to /keys
+    client.post("/add_key", data={"name": "key2", "submit": "y"}, follow_redirects=True)
+    resp = client.get("/keys", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+    assert b"key2" in resp.data
+
+
+def test_page_cache_invalidated_by_bulk_writes(client):
+    db.session.add_all([User(username="mike"), Key(name="key1")])
+    db.session.commit()
+    resp = client.get("/index?sort=by_user")
+    assert b"key1" not in resp.data
+
+    etag = resp.headers["ETag"]
+    client.post(
+        "/assign_key",
+        data={"user": ["mike"], "key": ["key1"], "date_out": "2021-01-01"},
+        follow_redirects=True,
+    )
+    resp = client.get("/index?sort=by_user", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert b"key1" in resp.data
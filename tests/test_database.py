@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from config import engine_options
+
+
+def test_sqlite_pragmas(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/pragmas.db")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+    engine.dispose()
+
+
+def test_engine_options():
+    assert engine_options("sqlite:///app.db") == {}
+    options = engine_options("postgresql://keymaster@localhost/keymaster")
+    assert options["pool_pre_ping"]
+    assert {"pool_size", "max_overflow", "pool_recycle"} <= set(options)
+
+
+def test_readers_and_writers_do_not_block(app, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/writers.db")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (n INTEGER)"))
+    errors = []
+    reads = []
+
+    def write():
+        try:
+            for n in range(20):
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO t VALUES (:n)"), {"n": n})
+        except Exception as e:
+            errors.append(e)
+
+    def read():
+        try:
+            for _ in range(20):
+                with engine.connect() as conn:
+                    reads.append(conn.execute(text("SELECT count(*) FROM t")).scalar())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=f) for f in (write, read) * 4]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(reads) == 80
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 80
+    engine.dispose()
+
+
+def test_writer_commits_during_read_transaction(app, tmp_path, monkeypatch):
+    """
+    In WAL mode a write commits while another connection is reading, and the
+    reader keeps the snapshot it started with. With the rollback journal the
+    commit waits for the reader and gives up after busy_timeout.
+    """
+    monkeypatch.setitem(app.config, "SQLITE_BUSY_TIMEOUT", "100")
+    for journal_mode in ("WAL", "DELETE"):
+        monkeypatch.setitem(app.config, "SQLITE_JOURNAL_MODE", journal_mode)
+        engine = create_engine(f"sqlite:///{tmp_path}/{journal_mode}.db")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE t (n INTEGER)"))
+        reader = engine.raw_connection()
+        cursor = reader.cursor()
+        cursor.execute("BEGIN")
+        assert cursor.execute("SELECT count(*) FROM t").fetchone() == (0,)
+
+        if journal_mode == "WAL":
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO t VALUES (1)"))
+            assert cursor.execute("SELECT count(*) FROM t").fetchone() == (0,)
+        else:
+            with pytest.raises(OperationalError, match="locked"):
+                with engine.begin() as conn:
+                    conn.execute(text("INSERT INTO t VALUES (1)"))
+        cursor.execute("COMMIT")
+        reader.close()
+        engine.dispose()
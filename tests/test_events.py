@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from app import db
+from app.models import Assignment, ChangeEvent, Key, User
+
+
+@pytest.fixture
+def stream(app, client, monkeypatch):
+    """Reads the /events stream after the given id for a single poll"""
+    monkeypatch.setitem(app.config, "EVENTS_STREAM_SECONDS", 0)
+
+    def read(after=0):
+        resp = client.get(f"/events?after={after}")
+        assert resp.mimetype == "text/event-stream"
+        events = []
+        for message in resp.get_data(as_text=True).split("\n\n"):
+            fields = dict(
+                line.split(": ", 1) for line in message.splitlines() if ": " in line
+            )
+            if "event" in fields:
+                events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    return read
+
+
+def setup_data():
+    db.session.add_all([User(username="mike", display_name="Mike"), User(username="aaron")])
+    db.session.add_all([Key(name="key1"), Key(name="key2")])
+    db.session.commit()
+
+
+def test_write_paths_emit_events(client, stream):
+    setup_data()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike", "aaron"], "key": ["key1"], "date_out": "2021-01-01"},
+    )
+    assert stream() == [
+        ("checkout", {"user": "mike", "name": "Mike", "key": "key1"}),
+        ("checkout", {"user": "aaron", "name": "aaron", "key": "key1"}),
+    ]
+
+    last_id = db.session.query(db.func.max(ChangeEvent.id)).scalar()
+    assignment = Assignment.query.filter_by(user="mike").first()
+    client.post(
+        f"/edit_assignment?id={assignment.id}",
+        data={"user": "mike", "key": "key2", "date_out": "2021-01-01", "date_in": ""},
+    )
+    client.post("/edit_key?name=key2", data={"description": "", "status": "Inactive"})
+    assert stream(last_id) == [
+        ("checkout", {"user": "mike", "name": "Mike", "key": "key2"}),
+        ("checkin", {"user": "mike", "key": "key1"}),
+        ("key_status", {"key": "key2", "status": "Inactive"}),
+    ]
+
+
+def test_large_changes_emit_reload(app, client, stream, monkeypatch):
+    monkeypatch.setitem(app.config, "EVENTS_MAX_BATCH", 1)
+    setup_data()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike", "aaron"], "key": ["key1"], "date_out": "2021-01-01"},
+    )
+    assert stream() == [("reload", {})]
+
+
+def test_pruned_events_reload(client, stream):
+    setup_data()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike"], "key": ["key1", "key2"], "date_out": "2021-01-01"},
+    )
+    ChangeEvent.query.filter(ChangeEvent.id == 1).delete()
+    db.session.commit()
+    assert stream() == [("reload", {})]
+    assert [kind for kind, _ in stream(1)] == ["checkout"]
+
+
+def test_index_rows_carry_ids(client):
+    setup_data()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike"], "key": ["key1", "key2"], "date_out": "2021-01-01"},
+    )
+    client.post("/edit_key?name=key1", data={"description": "", "status": "Inactive"})
+    html = client.get("/index?sort=by_user").get_data(as_text=True)
+    assert 'data-id="mike"' in html
+    assert "<td>Mike</td>" in html
+    assert "/events?after=3" in html
+    html = client.get("/index?sort=by_key").get_data(as_text=True)
+    assert '<tr data-id="key1" data-items=\'{"mike": "Mike"}\' class="text-muted">' in html
+
+
+def test_busy_worker_asks_to_retry(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "EVENTS_MAX_STREAMS", 1)
+    monkeypatch.setitem(app.config, "EVENTS_BUSY_RETRY", 30)
+    setup_data()
+    client.post("/edit_key?name=key1", data={"description": "", "status": "Inactive"})
+
+    first = client.get("/events", buffered=False)
+    assert b"event: key_status" in next(iter(first.response))
+    assert client.get("/events").get_data(as_text=True) == "retry: 30000\n\n"
+    first.close()
+    monkeypatch.setitem(app.config, "EVENTS_STREAM_SECONDS", 0)
+    assert b"event: key_status" in client.get("/events").data
@@ -0,0 +1,60 @@
+import json
+from datetime import date
+
+from app import db
+from app.models import Assignment, Key, User
+
+
+def seed():
+    db.session.add_all([User(username=f"user{i}") for i in range(2)])
+    db.session.add_all([Key(name=f"key{i}") for i in range(25)])
+    for i in range(25):
+        db.session.add(
+            Assignment(
+                user=f"user{i % 2}",
+                key=f"key{i}",
+                date_out=date(2021, 1, 1 + i),
+                date_in=date(2021, 2, 1) if i % 5 else None,
+            )
+        )
+    db.session.commit()
+
+
+def test_export_csv(app, client):
+    seed()
+    app.config["EXPORT_BATCH_SIZE"] = 10
+    resp = client.get("/export/assignments.csv")
+    assert resp.is_streamed
+    lines = resp.data.decode().splitlines()
+    assert lines[0] == "ID,User,Key,Date Out,Date In"
+    assert lines[1] == "1,user0,key0,2021-01-01,"
+    assert lines[2] == "2,user1,key1,2021-01-02,2021-02-01"
+    assert len(lines) == 26
+
+
+def test_export_ndjson_filters(client):
+    seed()
+    resp = client.get("/export/assignments.ndjson?user=user0&status=open")
+    rows = [json.loads(line) for line in resp.data.decode().splitlines()]
+    assert [r["key"] for r in rows] == ["key0", "key10", "key20"]
+    assert rows[0] == {
+        "id": 1,
+        "user": "user0",
+        "key": "key0",
+        "date_out": "2021-01-01",
+        "date_in": None,
+    }
+
+    assert client.get("/export/assignments.xml").status_code == 404
+
+
+def test_export_cli(app):
+    seed()
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["export", "--status", "open", "--date-to", "2021-01-15"])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[1:] == [
+        "1,user0,key0,2021-01-01,",
+        "6,user1,key5,2021-01-06,",
+        "11,user0,key10,2021-01-11,",
+    ]
@@ -0,0 +1,71 @@
+from datetime import date
+
+from app import db
+from app.history import holders_at, keys_held
+from app.models import Assignment, Key, User
+from tests.test_api import auth_headers
+
+
+def seed_history():
+    db.session.add_all([User(username="alice"), User(username="bob")])
+    db.session.add_all([Key(name="key1"), Key(name="key2")])
+    db.session.add_all(
+        [
+            Assignment(
+                user="alice",
+                key="key1",
+                date_out=date(2021, 1, 1),
+                date_in=date(2021, 1, 31),
+            ),
+            Assignment(user="bob", key="key1", date_out=date(2021, 2, 1)),
+            Assignment(
+                user="alice",
+                key="key2",
+                date_out=date(2021, 3, 1),
+                date_in=date(2021, 3, 10),
+            ),
+        ]
+    )
+    db.session.commit()
+
+
+def test_holders_at(app):
+    seed_history()
+    assert [a.user for a in holders_at("key1", date(2021, 1, 15))] == ["alice"]
+    assert [a.user for a in holders_at("key1", date(2021, 1, 31))] == ["alice"]
+    assert holders_at("key1", date(2020, 12, 31)) == []
+    assert [a.user for a in holders_at("key1", date(2030, 1, 1))] == ["bob"]
+
+
+def test_keys_held(app):
+    seed_history()
+    held = keys_held("alice", date(2021, 1, 20), date(2021, 3, 1))
+    assert [a.key for a in held] == ["key1", "key2"]
+    assert keys_held("alice", date(2021, 2, 1), date(2021, 2, 28)) == []
+    assert [a.key for a in keys_held("bob", date.min, date(2021, 2, 1))] == ["key1"]
+
+
+def test_history_page(client):
+    seed_history()
+    resp = client.get("/history?key=key1&at=2021-02-15")
+    assert resp.status_code == 200
+    assert b"bob" in resp.data and b"alice" not in resp.data
+    resp = client.get("/history?user=alice&date_from=2021-03-05")
+    assert b"key2" in resp.data and b"key1" not in resp.data
+
+
+def test_history_api(client):
+    headers = auth_headers(client)
+    seed_history()
+    resp = client.get(
+        "/api/v1/history/holders?key=key1&at=2021-01-10", headers=headers
+    )
+    assert [a["user"] for a in resp.get_json()["items"]] == ["alice"]
+    resp = client.get(
+        "/api/v1/history/keys?user=alice&from=2021-01-01&to=2021-12-31",
+        headers=headers,
+    )
+    assert [a["key"] for a in resp.get_json()["items"]] == ["key1", "key2"]
+    resp = client.get("/api/v1/history/holders?key=key1&at=nope", headers=headers)
+    assert resp.status_code == 400
+    assert client.get("/api/v1/history/keys", headers=headers).status_code == 400
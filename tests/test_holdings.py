@@ -0,0 +1,101 @@
+from datetime import date
+
+from app import db
+from app.holdings import rebuild_holdings, verify_holdings
+from app.models import Assignment, Holding, Key, User
+
+
+def setup_data():
+    db.session.add_all([User(username="mike"), User(username="aaron")])
+    db.session.add_all([Key(name="key1"), Key(name="key2")])
+    db.session.commit()
+
+
+def holdings():
+    return {(h.user, h.key) for h in Holding.query.all()}
+
+
+def test_holdings_follow_write_paths(client):
+    setup_data()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike", "aaron"], "key": ["key1"], "date_out": "2021-01-01"},
+    )
+    assert holdings() == {("mike", "key1"), ("aaron", "key1")}
+
+    assignment = Assignment.query.filter_by(user="mike").first()
+    client.post(
+        f"/edit_assignment?id={assignment.id}",
+        data={
+            "user": "mike",
+            "key": "key2",
+            "date_out": "2021-01-01",
+            "date_in": "",
+        },
+    )
+    assert holdings() == {("mike", "key2"), ("aaron", "key1")}
+
+    client.post(
+        f"/edit_assignment?id={assignment.id}",
+        data={
+            "user": "mike",
+            "key": "key2",
+            "date_out": "2021-01-01",
+            "date_in": "2021-01-05",
+        },
+    )
+    assert holdings() == {("aaron", "key1")}
+
+    assignment = Assignment.query.filter_by(user="aaron").first()
+    client.post(
+        f"/confirm_delete?model=assignment&item={assignment.id}", data={"yes": True}
+    )
+    assert holdings() == set()
+    assert verify_holdings() == (set(), set())
+
+
+def test_rebuild_and_verify(app):
+    setup_data()
+    db.session.add_all(
+        [
+            Assignment(user="mike", key="key1", date_out=date(2021, 1, 1)),
+            Assignment(user="mike", key="key2", date_out=date(2021, 1, 1)),
+            Assignment(
+                user="aaron",
+                key="key1",
+                date_out=date(2021, 1, 1),
+                date_in=date(2021, 1, 2),
+            ),
+        ]
+    )
+    db.session.commit()
+    missing, extra = verify_holdings()
+    assert len(missing) == 2 and not extra
+
+    rebuild_holdings()
+    assert holdings() == {("mike", "key1"), ("mike", "key2")}
+    assert verify_holdings() == (set(), set())
+
+
+def test_assign_key_query_count(client, query_counter):
+    users = [f"user{u}" for u in range(20)]
+    keys = [f"key{k}" for k in range(30)]
+    db.session.add_all([User(username=u) for u in users])
+    db.session.add_all([Key(name=k) for k in keys])
+    db.session.add(Assignment(user="user0", key="key0", date_out=date(2021, 1, 1)))
+    db.session.commit()
+    rebuild_holdings()
+
+    query_counter.clear()
+    resp = client.post(
+        "/assign_key",
+        data={"user": users, "key": keys, "date_out": "2021-01-02"},
+        follow_redirects=True,
+    )
+    # One upsert per rollup table, the user and key id lookups and the
+    # assignments version bump on top of the check-out itself
+    assert len(query_counter) < 17
+    assert b'Already assigned: &#34;key0&#34; to user0' in resp.data
+    assert b"Assigned 599 key(s)" in resp.data
+    assert Assignment.query.count() == 600
+    assert verify_holdings() == (set(), set())
@@ -0,0 +1,55 @@
+from datetime import date
+
+from app import db
+from app.history import keys_held
+from app.ids import backfill_ids
+from app.models import Assignment, Holding, Key, User, UserRollup
+
+
+def setup_data(client):
+    db.session.add_all([User(username="mike"), Key(name="key1"), Key(name="key2")])
+    db.session.commit()
+    client.post(
+        "/assign_key",
+        data={"user": ["mike"], "key": ["key1", "key2"], "date_out": "2021-01-01"},
+    )
+
+
+def test_rows_get_ids(client):
+    setup_data(client)
+    mike = User.query.filter_by(username="mike").first()
+    key1 = Key.query.filter_by(name="key1").first()
+    assignment = Assignment.query.filter_by(key="key1").first()
+    assert (assignment.user_id, assignment.key_id) == (mike.id, key1.id)
+    holding = Holding.query.filter_by(key="key1").first()
+    assert (holding.user_id, holding.key_id) == (mike.id, key1.id)
+
+    db.session.add(Key(name="key3"))
+    assignment.key = "key3"
+    db.session.commit()
+    assert assignment.key_id == Key.query.filter_by(name="key3").first().id
+
+
+def test_rename_rewrites_history(client):
+    setup_data(client)
+    mike = User.query.filter_by(username="mike").first()
+    client.post(
+        f"/edit_user?id={mike.id}",
+        data={"username": "michael", "email": "", "display_name": ""},
+    )
+    assert {a.user for a in Assignment.query} == {"michael"}
+    assert {h.user for h in Holding.query} == {"michael"}
+    assert UserRollup.query.get("michael").checkouts == 2
+    assert len(keys_held("michael", date.min, date.today())) == 2
+    assert b"michael" in client.get("/index?sort=by_key").data
+
+
+def test_backfill_in_batches(client):
+    setup_data(client)
+    db.session.execute(Assignment.__table__.update().values(user_id=None, key_id=None))
+    db.session.commit()
+    assert keys_held("mike", date.min, date.today()) == []
+
+    assert backfill_ids(Assignment.__table__, batch_size=1) == 2
+    assert len(keys_held("mike", date.min, date.today())) == 2
+    assert backfill_ids(Assignment.__table__, batch_size=1) == 0
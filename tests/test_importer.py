@@ -0,0 +1,103 @@
+import io
+
+from app import db
+from app.holdings import verify_holdings
+from app.importer import import_csv
+from app.models import Assignment, Key, User
+
+
+def test_import_keys(app):
+    db.session.add(Key(name="existing"))
+    db.session.commit()
+    file = io.StringIO(
+        "name,description,status\n"
+        "key1,Front door,\n"
+        "existing,,\n"
+        "key2,,inactive\n"
+        "key1,,\n"
+        ",,\n"
+        "key3,,Lost\n"
+    )
+    result = import_csv("keys", file)
+    db.session.commit()
+
+    assert result.imported == 2
+    assert [line for line, _ in result.errors] == [3, 5, 6, 7]
+    assert Key.query.filter_by(name="key2").first().status == "Inactive"
+
+
+def test_import_users(app):
+    file = io.StringIO(
+        "username,email,display_name,password,can_login\n"
+        "mike,mike@example.com,Mike,secret,yes\n"
+        "aaron,mike@example.com,,,\n"
+        "aaron,,,,\n"
+    )
+    result = import_csv("users", file)
+    db.session.commit()
+
+    assert result.imported == 2
+    assert result.errors == [(3, "Email address 'mike@example.com' is already in use.")]
+    mike = User.query.filter_by(username="mike").first()
+    assert mike.can_login and mike.check_password("secret")
+
+
+def test_import_assignments(app):
+    db.session.add_all([User(username="mike"), Key(name="key1"), Key(name="key2")])
+    db.session.commit()
+    file = io.StringIO(
+        "user,key,date_out,date_in\n"
+        "mike,key1,2021-01-01,2021-01-05\n"
+        "mike,key1,2021-02-01,\n"
+        "mike,key2,2021-02-01,2021-01-01\n"
+        "nobody,key2,2021-02-01,\n"
+        "mike,key2,yesterday,\n"
+    )
+    result = import_csv("assignments", file)
+    db.session.commit()
+
+    assert result.imported == 2
+    assert [line for line, _ in result.errors] == [4, 5, 6]
+    assert Assignment.query.count() == 2
+    assert verify_holdings() == (set(), set())
+
+
+def test_import_open_assignment_once(app):
+    db.session.add_all([User(username="mike"), Key(name="key1"), Key(name="key2")])
+    db.session.commit()
+    import_csv("assignments", io.StringIO("user,key,date_out,date_in\nmike,key1,2021-01-01,\n"))
+    db.session.commit()
+
+    file = io.StringIO(
+        "user,key,date_out,date_in\n"
+        "mike,key1,2021-02-01,\n"
+        "mike,key1,2020-01-01,2020-01-05\n"
+        "mike,key2,2021-02-01,\n"
+        "mike,key2,2021-03-01,\n"
+    )
+    result = import_csv("assignments", file)
+    db.session.commit()
+
+    assert result.imported == 2
+    assert result.errors == [
+        (2, "Key 'key1' is already assigned to 'mike'."),
+        (5, "Key 'key2' is already assigned to 'mike'."),
+    ]
+    assert Assignment.query.filter_by(date_in=None).count() == 2
+    assert verify_holdings() == (set(), set())
+
+
+def test_import_cli_and_upload(app, client, tmp_path):
+    path = tmp_path / "keys.csv"
+    path.write_text("name\n" + "".join(f"key{i}\n" for i in range(12000)))
+    result = app.test_cli_runner().invoke(args=["import", "keys", str(path)])
+    assert result.exit_code == 0
+    assert Key.query.count() == 12000
+
+    resp = client.post(
+        "/import",
+        data={"kind": "keys", "file": (io.BytesIO(b"name\nkey0\nnew\n"), "keys.csv")},
+        follow_redirects=True,
+    )
+    assert b"Imported 1 keys." in resp.data
+    assert b"line 2: Key &#39;key0&#39; already exists." in resp.data
@@ -0,0 +1,102 @@
+import importlib.util
+import json
+import os
+from types import SimpleNamespace
+
+import config
+from app import db
+from app.metrics import store
+from app.models import Key
+
+
+def metric(body, line_prefix):
+    for line in body.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+
+
+def test_metrics_endpoint(app, client):
+    db.session.add(Key(name="key1"))
+    db.session.commit()
+    store.counters.clear()
+    store.histograms.clear()
+
+    for _ in range(3):
+        client.get("/keys")
+    body = client.get("/metrics").data.decode()
+
+    assert "# TYPE keymaster_request_duration_seconds histogram" in body
+    assert metric(body, 'keymaster_requests_total{endpoint="keys",method="GET",status="200"}') == 3
+    assert metric(body, 'keymaster_request_duration_seconds_count{endpoint="keys"}') == 3
+    assert metric(body, 'keymaster_request_duration_seconds_bucket{endpoint="keys",le="+Inf"}') == 3
+    # The versions on each request and the keys once, as the page is then
+    # served from the page cache
+    assert metric(body, 'keymaster_sql_queries_total{endpoint="keys"}') == 4
+    assert metric(body, 'keymaster_template_render_seconds_total{endpoint="keys"}') > 0
+    assert metric(body, 'keymaster_response_bytes_total{endpoint="keys"}') > 0
+
+
+def test_metrics_summed_across_workers(app, client):
+    store.counters.clear()
+    store.histograms.clear()
+    other_worker = {
+        "counters": [
+            [
+                "keymaster_requests_total",
+                [["endpoint", "keys"], ["method", "GET"], ["status", 200]],
+                5,
+            ]
+        ],
+        "histograms": [],
+    }
+    os.makedirs(app.config["METRICS_DIR"], exist_ok=True)
+    with open(os.path.join(app.config["METRICS_DIR"], "1.json"), "w") as f:
+        json.dump(other_worker, f)
+
+    client.get("/keys")
+    body = client.get("/metrics").data.decode()
+    assert metric(body, 'keymaster_requests_total{endpoint="keys",method="GET",status="200"}') == 6
+
+
+def test_slow_request_logged(app, client, caplog):
+    app.config["SLOW_REQUEST_THRESHOLD"] = 0
+    try:
+        client.get("/keys")
+    finally:
+        app.config["SLOW_REQUEST_THRESHOLD"] = 0.5
+    assert "Slow request GET /keys?" in caplog.text
+    assert "Slowest statements: " in caplog.text and "FROM keys" in caplog.text
+
+
+def test_gunicorn_hooks_keep_exited_workers(app, client, monkeypatch):
+    spec = importlib.util.spec_from_file_location(
+        "gunicorn_conf", os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+    )
+    conf = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(conf)
+    directory = app.config["METRICS_DIR"]
+    monkeypatch.setattr(config.Config, "METRICS_DIR", directory)
+    store.counters.clear()
+    store.histograms.clear()
+    os.makedirs(directory, exist_ok=True)
+    labels = [["endpoint", "keys"], ["method", "GET"], ["status", 200]]
+    # Two workers which exit in turn with the same pid
+    for value in (5, 2):
+        data = {
+            "counters": [["keymaster_requests_total", labels, value]],
+            "histograms": [
+                ["keymaster_request_duration_seconds", labels[:1], [value] + [0] * 11, 1, value]
+            ],
+        }
+        with open(os.path.join(directory, "1.json"), "w") as f:
+            json.dump(data, f)
+        conf.child_exit(None, SimpleNamespace(pid=1))
+    assert sorted(os.listdir(directory)) == ["dead.json"]
+
+    client.get("/keys")
+    body = client.get("/metrics").data.decode()
+    assert metric(body, 'keymaster_requests_total{endpoint="keys",method="GET",status="200"}') == 8
+    assert metric(body, 'keymaster_request_duration_seconds_count{endpoint="keys"}') == 8
+
+    conf.on_starting(None)
+    assert os.listdir(directory) == []
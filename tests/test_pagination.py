@@ -0,0 +1,99 @@
+import base64
+import json
+from datetime import date
+
+from app import db
+from app.models import Assignment, Key, User
+from app.pagination import keyset_paginate
+
+
+def seed(n):
+    db.session.add_all([User(username=f"user{i}") for i in range(3)])
+    db.session.add_all([Key(name=f"key{i}") for i in range(n)])
+    for i in range(n):
+        db.session.add(
+            Assignment(
+                user=f"user{i % 3}",
+                key=f"key{i}",
+                date_out=date(2021, 1, 1 + i % 4),
+                date_in=None if i % 2 else date(2021, 2, 1 + i % 5),
+            )
+        )
+    db.session.commit()
+
+
+def walk(sort_attr, descending=False, per_page=4):
+    """Returns every page walking forwards and then backwards again"""
+    forward = []
+    page = keyset_paginate(
+        Assignment.query, sort_attr, Assignment.id, per_page=per_page, descending=descending
+    )
+    forward.append([a.id for a in page])
+    while page.next_cursor:
+        page = keyset_paginate(
+            Assignment.query,
+            sort_attr,
+            Assignment.id,
+            after=page.next_cursor,
+            per_page=per_page,
+            descending=descending,
+        )
+        forward.append([a.id for a in page])
+
+    backward = [[a.id for a in page]]
+    while page.prev_cursor:
+        page = keyset_paginate(
+            Assignment.query,
+            sort_attr,
+            Assignment.id,
+            before=page.prev_cursor,
+            per_page=per_page,
+            descending=descending,
+        )
+        backward.insert(0, [a.id for a in page])
+    return forward, backward
+
+
+def test_keyset_paginate(app):
+    seed(18)
+    for attr in (Assignment.id, Assignment.user, Assignment.date_in):
+        for descending in (False, True):
+            want = [
+                a.id
+                for a in sorted(
+                    Assignment.query.all(),
+                    key=lambda a: (getattr(a, attr.key) or date.min, a.id),
+                    reverse=descending,
+                )
+            ]
+            forward, backward = walk(attr, descending)
+            assert [i for p in forward for i in p] == want
+            assert forward == backward
+            assert [len(p) for p in forward] == [4, 4, 4, 4, 2]
+
+
+def test_assignments_filters(client):
+    seed(18)
+    resp = client.get("/assignments?user=user1&status=open&per_page=100")
+    assert resp.status_code == 200
+    rows = resp.data.count(b"edit_assignment?id=")
+    want = Assignment.query.filter_by(user="user1", date_in=None).count()
+    assert rows == want
+
+    resp = client.get("/assignments?date_from=2021-01-02&date_to=2021-01-03")
+    assert resp.data.count(b"edit_assignment?id=") == 9
+
+    resp = client.get("/assignments?after=garbage")
+    assert resp.status_code == 404
+
+    # Well formed cursors holding values of the wrong type
+    for values in ([5, 1], [None, 1], [["2021-01-01"], 1], "x"):
+        cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+        resp = client.get(f"/assignments?sort=date_out&after={cursor}")
+        assert resp.status_code == 404
+    # and on string sort columns
+    for values in ([["x"], 1], [None, 1], ["a", ["x"]], ["a", True], ["a", 1.5]):
+        cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+        for url in ("/assignments?sort=user", "/keys?sort=description", "/users?sort=email"):
+            resp = client.get(f"{url}&after={cursor}")
+            assert resp.status_code == 404
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from app import db
+from app.models import User
+from app.passwords import (HashingBusy, HashingPool, hash_password, needs_rehash,
+                           verify_password)
+
+
+@pytest.fixture
+def cheap_hashes(app, monkeypatch):
+    monkeypatch.setitem(app.config, "PASSWORD_PBKDF2_ITERATIONS", 1000)
+    monkeypatch.setitem(app.config, "PASSWORD_SCRYPT_N", 2 ** 10)
+    return app.config
+
+
+@pytest.mark.parametrize("method", ["pbkdf2", "scrypt"])
+def test_hash_and_verify(cheap_hashes, monkeypatch, method):
+    monkeypatch.setitem(cheap_hashes, "PASSWORD_HASH_METHOD", method)
+    pwhash = hash_password("secret")
+    assert pwhash.startswith(method)
+    assert verify_password(pwhash, "secret")
+    assert not verify_password(pwhash, "wrong")
+    assert not needs_rehash(pwhash)
+    assert not verify_password(None, "secret")
+
+
+def test_rehash_on_login(client, cheap_hashes, monkeypatch):
+    user = User(username="admin", can_login=True)
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    old_hash = user.password_hash
+
+    monkeypatch.setitem(cheap_hashes, "PASSWORD_HASH_METHOD", "scrypt")
+    assert needs_rehash(old_hash)
+    resp = client.post("/api/v1/tokens", json={"username": "admin", "password": "wrong"})
+    assert resp.status_code == 401
+    assert User.query.first().password_hash == old_hash
+
+    resp = client.post("/api/v1/tokens", json={"username": "admin", "password": "secret"})
+    assert resp.status_code == 200
+    db.session.expire_all()
+    new_hash = User.query.first().password_hash
+    assert new_hash.startswith("scrypt:1024:8:1$")
+    assert verify_password(new_hash, "secret")
+
+
+def test_pool_busy(client, monkeypatch):
+    pool = HashingPool(workers=1, max_pending=0)
+    started, release = threading.Event(), threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    thread = threading.Thread(target=pool.run, args=(block,))
+    thread.start()
+    started.wait()
+    try:
+        with pytest.raises(HashingBusy):
+            pool.run(block)
+
+        monkeypatch.setattr("app.passwords.pool", pool)
+        user = User(username="admin", password_hash="pbkdf2:sha256:1$x$y", can_login=True)
+        db.session.add(user)
+        db.session.commit()
+        resp = client.post(
+            "/api/v1/tokens", json={"username": "admin", "password": "secret"}
+        )
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        thread.join()
+    assert pool.run(sum, [1, 2]) == 3
@@ -0,0 +1,113 @@
+from datetime import date, timedelta
+
+from app import db
+from app.holdings import check_in, check_out
+from app.models import Assignment, Key, User
+from app.reports import (average_durations, monthly_checkouts, overdue_keys,
+                         user_counts)
+from app.rollups import rebuild_rollups, verify_rollups
+from tests.test_api import auth_headers
+
+
+def seed_keys():
+    db.session.add_all([User(username="alice"), User(username="bob")])
+    db.session.add_all([Key(name=f"key{k}") for k in range(3)])
+    db.session.commit()
+
+
+def test_rollups_follow_writes(client):
+    seed_keys()
+    check_out(
+        [
+            ("alice", "key0", date(2021, 1, 1)),
+            ("alice", "key1", date(2021, 1, 5)),
+            ("bob", "key2", date(2021, 2, 1)),
+        ]
+    )
+    check_in([("alice", "key0", date(2021, 1, 11)), ("bob", "key2", date(2021, 2, 5))])
+    db.session.commit()
+    assert verify_rollups() == []
+
+    assert average_durations() == [("key0", 1, 10.0), ("key2", 1, 4.0)]
+    assert monthly_checkouts() == [("2021-01", 2, 1), ("2021-02", 1, 1)]
+    assert user_counts() == [("alice", 2, 1), ("bob", 1, 1)]
+
+    assignment = Assignment.query.filter_by(key="key0").first()
+    client.post(
+        f"/edit_assignment?id={assignment.id}",
+        data={
+            "user": "bob",
+            "key": "key0",
+            "date_out": "2021-03-01",
+            "date_in": "2021-03-21",
+            "submit": True,
+        },
+    )
+    assert verify_rollups() == []
+    assert average_durations()[0] == ("key0", 1, 20.0)
+    assert user_counts() == [("bob", 2, 2), ("alice", 1, 0)]
+
+    client.post(
+        f"/confirm_delete?model=assignment&item={assignment.id}", data={"yes": True}
+    )
+    assert verify_rollups() == []
+    assert monthly_checkouts() == [("2021-01", 1, 0), ("2021-02", 1, 1)]
+
+
+def test_rebuild_rollups(app):
+    seed_keys()
+    db.session.add(
+        Assignment(
+            user="alice",
+            key="key0",
+            date_out=date(2021, 1, 1),
+            date_in=date(2021, 1, 3),
+        )
+    )
+    db.session.commit()
+    assert verify_rollups() != []
+    rebuild_rollups()
+    assert verify_rollups() == []
+    assert average_durations() == [("key0", 1, 2.0)]
+
+
+def test_overdue_keys(app):
+    seed_keys()
+    today = date.today()
+    check_out(
+        [
+            ("alice", "key0", today - timedelta(days=40)),
+            ("bob", "key1", today - timedelta(days=5)),
+        ]
+    )
+    db.session.commit()
+    assert overdue_keys(30) == [("alice", "key0", today - timedelta(days=40), 40)]
+    assert len(overdue_keys(1)) == 2
+
+
+def test_reports_page_and_api(client):
+    headers = auth_headers(client)
+    seed_keys()
+    check_out([("alice", "key0", date(2021, 1, 1))])
+    db.session.commit()
+
+    resp = client.get("/reports?days=10")
+    assert resp.status_code == 200
+    assert b"Keys Out Longer Than 10 Days" in resp.data
+    assert b"2021-01" in resp.data
+
+    resp = client.get("/api/v1/reports/overdue?days=10", headers=headers)
+    assert resp.get_json()["items"][0]["key"] == "key0"
+    resp = client.get("/api/v1/reports/monthly", headers=headers)
+    assert resp.get_json()["items"] == [
+        {"month": "2021-01", "checkouts": 1, "checkins": 0}
+    ]
+    resp = client.get("/api/v1/reports/users", headers=headers)
+    assert resp.get_json()["items"] == [{"user": "alice", "checkouts": 1, "returns": 0}]
+    resp = client.get("/api/v1/reports/durations", headers=headers)
+    assert resp.get_json()["items"] == []
+
+    resp = client.get("/reports?days=99999999")
+    assert resp.status_code == 200
+    resp = client.get("/api/v1/reports/overdue?days=99999999", headers=headers)
+    assert resp.get_json()["days"] == 36500
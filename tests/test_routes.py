@@ -1,5 +1,10 @@
+from datetime import date
+
+from app.projection import project
 from app.routes import get_headings_rows
-from app.models import Assignment, Key
+from app import db
+from app.holdings import rebuild_holdings
+from app.models import Assignment, Holding, Key, User
 
 
 def test_get_headings_rows():
@@ -49,3 +54,58 @@ def test_get_headings_rows():
 
     got = get_headings_rows(assignments)
     assert (want_headings, want_rows) == got
+
+
+def test_get_headings_rows_projection(app):
+    seed_assignments(2, 1)
+    heading_map = {"user": "User", "key": "Keys Assigned"}
+    rows = project(Assignment, heading_map).order_by(Assignment.user).all()
+    assert not any(isinstance(row, Assignment) for row in rows)
+
+    want_rows = [["user0", "key0"], ["user1", "key0"]]
+    assert get_headings_rows(rows, heading_map) == (["User", "Keys Assigned"], want_rows)
+    assert get_headings_rows(rows) == (["user", "key"], want_rows)
+
+
+def seed_assignments(n_users, n_keys):
+    for k in range(n_keys):
+        db.session.add(Key(name=f"key{k}"))
+    for u in range(n_users):
+        db.session.add(User(username=f"user{u}", display_name=f"User {u}"))
+        for k in range(n_keys):
+            db.session.add(
+                Assignment(user=f"user{u}", key=f"key{k}", date_out=date(2021, 1, 1))
+            )
+    db.session.commit()
+    rebuild_holdings()
+
+
+def test_index_query_count(client, query_counter):
+    seed_assignments(2, 2)
+    counts = {}
+    for sort in ("by_user", "by_key"):
+        query_counter.clear()
+        client.get(f"/index?sort={sort}")
+        counts[sort] = len(query_counter)
+
+    db.session.query(Holding).delete()
+    db.session.query(Assignment).delete()
+    db.session.query(User).delete()
+    db.session.query(Key).delete()
+    seed_assignments(30, 20)
+
+    for sort in ("by_user", "by_key"):
+        query_counter.clear()
+        resp = client.get(f"/index?sort={sort}")
+        assert resp.status_code == 200
+        assert len(query_counter) == counts[sort]
+
+
+def test_index_grouping(client):
+    seed_assignments(2, 2)
+    resp = client.get("/index?sort=by_user")
+    assert b"<td>User 0</td>" in resp.data
+    assert b"<td>key0, key1</td>" in resp.data
+
+    resp = client.get("/index?sort=by_key")
+    assert b"<td>User 0, User 1</td>" in resp.data
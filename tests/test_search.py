@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+
+from app import db
+from app.models import Key, User
+from app.search import search_keys, search_users
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def search(client, type, q):
+    resp = client.get(f"/search?type={type}&q={q}")
+    return [(r["value"], r["label"]) for r in resp.get_json()["results"]]
+
+
+def test_search_keys(client):
+    db.session.add_all(
+        [
+            Key(name="A1", description="Front door"),
+            Key(name="B12", description="Back door"),
+            Key(name="DOOR7"),
+            Key(name="C3", description="Garage door", status="Inactive"),
+        ]
+    )
+    db.session.commit()
+
+    assert search(client, "keys", "door") == [("DOOR7", "DOOR7"), ("A1", "A1"), ("B12", "B12")]
+    assert search(client, "keys", "b") == [("B12", "B12")]
+    assert search(client, "keys", "garage") == []
+
+    key = Key.query.filter_by(name="A1").first()
+    key.description = "Side gate"
+    db.session.delete(Key.query.filter_by(name="B12").first())
+    db.session.commit()
+    assert search(client, "keys", "door") == [("DOOR7", "DOOR7")]
+
+
+def test_search_users(client):
+    db.session.add_all(
+        [User(username="mike", display_name="Mike Lloyd"), User(username="aaron")]
+    )
+    db.session.commit()
+
+    assert search(client, "users", "lloyd") == [("mike", "Mike Lloyd")]
+    assert search(client, "users", "aar") == [("aaron", "aaron")]
+    assert search(client, "users", "a") == [("aaron", "aaron")]
+    assert client.get("/search?type=nope&q=x").status_code == 400
+
+    # LIKE wildcards are matched literally
+    assert search(client, "users", "%") == []
+    assert search(client, "users", "_") == []
+    db.session.add(User(username="a_b"))
+    db.session.commit()
+    assert search(client, "users", "a_") == [("a_b", "a_b")]
+
+    for limit, count in ((-1, 1), (0, 1), (2, 2)):
+        assert len(search(client, "users", f"a&limit={limit}")) == count
+
+
+def test_assign_form_only_loads_selected_choices(client):
+    db.session.add_all([User(username=f"user{i}") for i in range(50)])
+    db.session.add_all([Key(name=f"key{i}") for i in range(50)])
+    db.session.commit()
+
+    resp = client.get("/assign_key")
+    assert b"<option" not in resp.data
+
+    resp = client.post(
+        "/assign_key",
+        data={"user": ["user1", "nobody"], "key": ["key1"], "date_out": "2021-01-01"},
+    )
+    assert resp.status_code == 200
+    assert b'<option selected value="user1">' in resp.data
+    assert b"&#39;nobody&#39; is not a valid choice" in resp.data
+
+
+def test_search_after_migrations(monkeypatch, tmp_path):
+    from app import app
+
+    uri = f"sqlite:///{tmp_path / 'migrated.db'}"
+    subprocess.run(
+        [sys.executable, "-m", "flask", "db", "upgrade"],
+        cwd=root,
+        env=dict(os.environ, DATABASE_URL=uri, FLASK_APP="keymaster.py"),
+        capture_output=True,
+        check=True,
+    )
+    monkeypatch.setitem(app.config, "SQLALCHEMY_DATABASE_URI", uri)
+    with app.app_context():
+        db.session.add(User(username="zelda"))
+        db.session.add(Key(name="zephyr"))
+        db.session.commit()
+        assert search_users("zel") == [("zelda", "zelda")]
+        assert [k for k, _ in search_keys("zep")] == ["zephyr"]
+        db.session.remove()
+        db.engine.dispose()
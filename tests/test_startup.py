@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_workers_do_not_import_migrations():
+    modules = ("alembic", "flask_migrate", "jwt")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            f"import sys, keymaster; print([m for m in {modules} if m in sys.modules])",
+        ],
+        cwd=root,
+        env=dict(os.environ, DATABASE_URL="sqlite://"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == "[]"